@@ -0,0 +1,68 @@
+
+#@title Benchmark do backtest walk-forward (folds em série x em paralelo)
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.benchmarks.dados_sinteticos import gerar_dados_transformados
+from scripts.modelagem_machine_learning.backtest_walk_forward import (
+    RegressaoLinear, amostras_candles, executar_backtest
+)
+
+"""
+Backtest walk-forward sobre dados transformados sintéticos (amostras por candle, retreino diário) com
+1, 2 e 4 processos, conferindo que as métricas não dependem do paralelismo e que as previsões de um
+fold são as de um modelo treinado só com os dias anteriores (refeito aqui com filtros do DataFrame).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_backtest
+"""
+
+FEATURES = [
+    "abertura", "minimo", "maximo", "fechamento", "SMA_10", "EMA_10",
+    "rsi", "MACD", "Signal_Line", "OBV", "fechamento_lag1", "fechamento_lag2", "fechamento_lag3",
+    "retorno_lag1", "retorno_lag2", "retorno_lag3", "volume_lag1", "volume_lag2", "volume_lag3"
+]
+TARGETS = ['minimo', 'maximo', 'fechamento', 'volume']
+
+
+def executar_benchmark(n_dias=400, dias_teste=120, processos=(1, 2, 4)):
+    df = gerar_dados_transformados(n_dias=n_dias).dropna(subset=FEATURES + TARGETS)
+    print(f"\nBacktest walk-forward: {len(df):,} candles, {dias_teste} dias de teste, retreino diário "
+          f"({os.cpu_count()} CPUs)\n")
+
+    referencia = None
+    for n in processos:
+        inicio = time.perf_counter()
+        por_dia, resumo, previsoes = executar_backtest(
+            df, FEATURES, TARGETS, modelo='linear', amostragem='candles',
+            dias_teste=dias_teste, retreinar_a_cada=1, max_processos=n
+        )
+        duracao = time.perf_counter() - inicio
+        print(f"  {n} processo(s): {duracao:6.2f} s")
+        if referencia is None:
+            referencia = (por_dia, previsoes)
+        else:
+            pd.testing.assert_frame_equal(por_dia, referencia[0])
+
+    print()
+    print(resumo.to_string(index=False))
+    # PnL e acerto só onde a saída é executável (fechamento); mínima, máxima e volume ficam sem PnL
+    assert resumo.set_index('target')['pnl'].notna().to_dict() == {
+        'minimo': False, 'maximo': False, 'fechamento': True, 'volume': False
+    }
+
+    # Último fold refeito à mão: treino com todos os dias anteriores ao dia de teste
+    amostras, datas = amostras_candles(df, FEATURES, TARGETS)
+    ultimo = len(datas) - 1
+    treino, teste = amostras['dia'] < ultimo, amostras['dia'] == ultimo
+    esperado = RegressaoLinear().fit(amostras['X'][treino], amostras['Y'][treino]).predict(amostras['X'][teste])
+    np.testing.assert_allclose(referencia[1]['P'][referencia[1]['dia'] == ultimo], esperado, rtol=1e-9)
+    print("\nMétricas iguais com qualquer número de processos; previsões conferidas com um treino feito à parte.")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,160 @@
+
+#@title Benchmark da busca de hiperparâmetros (successive halving x treinar todas as configurações)
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from scripts.modelagem_machine_learning.busca_hiperparametros import busca_hiperparametros
+from scripts.modelagem_machine_learning.dataset_mmap import abrir_dataset, limites_divisao, salvar_dataset
+
+"""
+Compara, com o mesmo espaço e as mesmas configurações sorteadas, o successive halving com parada
+antecipada contra treinar todas as configurações até o orçamento máximo: tempo total, épocas
+executadas e melhor métrica de validação. O objetivo é uma regressão linear treinada por SGD em NumPy
+(uma época = uma passada pelo treino), lendo o dataset mapeável compartilhado, para o benchmark rodar
+sem TensorFlow/XGBoost; o protocolo (checkpoint, passos, métrica, parada) é o mesmo de `ObjetivoLSTM`.
+
+Confere também que um trial com parada antecipada não volta a treinar nas rodadas seguintes e que
+`tempo_max_s` limita o tempo total mesmo com trials ainda em andamento (os processos são encerrados),
+e que trials com métrica NaN ficam atrás dos demais na seleção das rodadas.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_busca_hiperparametros
+"""
+
+ESPACO = {
+    'taxa_aprendizado': (1e-4, 0.3, 'log'),
+    'tamanho_lote': [32, 128, 512],
+    'l2': (1e-6, 1e-1, 'log'),
+}
+
+
+class ObjetivoSGD:
+    """MSE de validação de uma regressão linear por SGD; continua dos pesos salvos no checkpoint."""
+
+    def __init__(self, caminho_dataset, paciencia=3):
+        self.caminho_dataset = caminho_dataset
+        self.paciencia = paciencia
+
+    def __call__(self, config, orcamento, checkpoint):
+        arrays, manifesto = abrir_dataset(self.caminho_dataset)
+        treino, validacao = (slice(*manifesto['divisoes'][nome]) for nome in ('treino', 'validacao'))
+        X, Y = arrays['X'][treino], arrays['Y'][treino]
+        X_val, Y_val = arrays['X'][validacao], arrays['Y'][validacao]
+
+        arquivo = f"{checkpoint}.npz"
+        if os.path.exists(arquivo):
+            estado = dict(np.load(arquivo))
+        else:
+            estado = {'W': np.zeros((X.shape[1], Y.shape[1])), 'b': np.zeros(Y.shape[1]),
+                      'passos': np.array(0), 'melhor': np.array(np.inf), 'sem_melhora': np.array(0)}
+        W, b = estado['W'], estado['b']
+        rng = np.random.default_rng(int(estado['passos']))
+
+        passos, melhor, sem_melhora = int(estado['passos']), float(estado['melhor']), int(estado['sem_melhora'])
+        while passos < orcamento and sem_melhora < self.paciencia:
+            ordem = rng.permutation(len(X))
+            for inicio in range(0, len(X), config['tamanho_lote']):
+                lote = ordem[inicio:inicio + config['tamanho_lote']]
+                erro = X[lote] @ W + b - Y[lote]
+                W -= config['taxa_aprendizado'] * (X[lote].T @ erro / len(lote) + config['l2'] * W)
+                b -= config['taxa_aprendizado'] * erro.mean(axis=0)
+            passos += 1
+            mse = float(((X_val @ W + b - Y_val) ** 2).mean())
+            if not np.isfinite(mse):
+                melhor, sem_melhora = np.inf, self.paciencia
+                break
+            melhor, sem_melhora = (mse, 0) if mse < melhor else (melhor, sem_melhora + 1)
+
+        np.savez(arquivo, W=W, b=b, passos=passos, melhor=melhor, sem_melhora=sem_melhora)
+        return {'metrica': melhor, 'passos': passos, 'parado': sem_melhora >= self.paciencia}
+
+
+class ObjetivoLento:
+    """Trial que demora `segundos` (para medir o corte por `tempo_max_s`)."""
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+
+    def __call__(self, config, orcamento, checkpoint):
+        time.sleep(self.segundos)
+        return {'metrica': 0.0, 'passos': orcamento, 'parado': False}
+
+
+class ObjetivoComFalhas:
+    """Métrica NaN para um dos tamanhos de lote (trial divergente ou sem histórico); `l2` nos demais."""
+
+    def __call__(self, config, orcamento, checkpoint):
+        metrica = float('nan') if config['tamanho_lote'] == 32 else config['l2']
+        return {'metrica': metrica, 'passos': orcamento, 'parado': False}
+
+
+def gerar_dataset(diretorio, n=20_000, n_features=20, n_targets=4, semente=0):
+    rng = np.random.default_rng(semente)
+    X = rng.normal(0, 1, (n, n_features))
+    Y = X @ rng.normal(0, 1, (n_features, n_targets)) + rng.normal(0, 0.5, (n, n_targets))
+    return salvar_dataset({'X': X, 'Y': Y}, 'busca_sintetico', diretorio, divisoes=limites_divisao(n))
+
+
+def executar_benchmark(n_configs=27, eta=3, orcamento_max=27):
+    print(f"\nBusca de hiperparâmetros: {n_configs} configurações, até {orcamento_max} épocas ({os.cpu_count()} CPUs)\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        objetivo = ObjetivoSGD(gerar_dataset(tmp))
+
+        inicio = time.perf_counter()
+        completa, melhor_completa = busca_hiperparametros(
+            objetivo, ESPACO, n_configs, orcamento_min=orcamento_max, n_rodadas=1
+        )
+        tempo_completa = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        halving, melhor_halving = busca_hiperparametros(
+            objetivo, ESPACO, n_configs, orcamento_min=1, eta=eta,
+            arquivo_log=os.path.join(tmp, 'trials.jsonl')
+        )
+        tempo_halving = time.perf_counter() - inicio
+
+        # Épocas efetivas: no halving os passos são cumulativos por trial (retomados do checkpoint)
+        epocas_completa = completa['passos'].sum()
+        epocas_halving = halving.groupby('trial')['passos'].max().sum()
+        with open(os.path.join(tmp, 'trials.jsonl')) as f:
+            linhas_log = sum(1 for _ in f)
+
+    print(f"\n{'estratégia':<22} {'tempo':>8} {'épocas':>8} {'melhor MSE val.':>16}")
+    print(f"{'todas até o fim':<22} {tempo_completa:>7.2f}s {epocas_completa:>8} {melhor_completa['metrica']:>16.6f}")
+    print(f"{'successive halving':<22} {tempo_halving:>7.2f}s {epocas_halving:>8} {melhor_halving['metrica']:>16.6f}")
+    print(f"\nMelhor config (halving): {melhor_halving['config']}")
+    print(f"Log: {linhas_log} linhas (uma por avaliação + a melhor)")
+
+    # O melhor do halving fica próximo do melhor da busca completa, com uma fração das épocas
+    assert melhor_halving['metrica'] <= melhor_completa['metrica'] * 1.05
+    assert epocas_halving < epocas_completa
+
+    # Depois da parada antecipada o trial só aparece reaproveitado (não é reenviado)
+    primeira_parada = halving[halving['parado'] == True].groupby('trial')['rodada'].min()
+    depois = halving[halving['trial'].map(primeira_parada) < halving['rodada']]
+    assert depois['reaproveitada'].all()
+    print(f"Trials com parada antecipada: {len(primeira_parada)} "
+          f"({len(depois)} avaliações reaproveitadas nas rodadas seguintes, sem treino)")
+
+    # Corte por tempo: trials de 30 s com limite de 2 s terminam a busca em poucos segundos
+    inicio = time.perf_counter()
+    _, melhor_corte = busca_hiperparametros(ObjetivoLento(30), ESPACO, n_configs=4, max_processos=2, tempo_max_s=2)
+    tempo_corte = time.perf_counter() - inicio
+    print(f"Busca com tempo_max_s=2 e trials de 30 s: encerrada em {tempo_corte:.1f} s")
+    assert tempo_corte < 10 and melhor_corte is None
+
+    # Trials com métrica NaN não passam à frente dos válidos nem viram a melhor configuração
+    falhas, melhor_falhas = busca_hiperparametros(ObjetivoComFalhas(), ESPACO, n_configs=9, eta=3, max_processos=1)
+    seguintes = falhas[falhas['rodada'] > 0]
+    assert not np.isnan(melhor_falhas['metrica'])
+    assert seguintes['metrica'].notna().all()
+    print(f"Busca com {falhas[falhas['rodada'] == 0]['metrica'].isna().sum()} trials NaN na 1ª rodada: "
+          f"melhor métrica {melhor_falhas['metrica']:.6g}, nenhum NaN nas rodadas seguintes")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,71 @@
+
+#@title Benchmark de consultas no banco dimensional (sem índices x com índices)
+
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from scripts.benchmarks.dados_sinteticos import gerar_dados_transformados
+from scripts.operacional.criar_banco_dimensional import criar_banco, sql_tabelas, sql_views
+from scripts.pipeline.carga_dados import carregar_dados
+
+"""
+Mede a latência das leituras típicas da modelagem sobre a visão `vw_candles`:
+- "últimos N dias": candles a partir de uma data de corte;
+- "dia único": candles de uma data específica.
+
+O banco "sem índices" usa apenas as tabelas do esquema original (mais a visão);
+o banco "com índices" é criado por `criar_banco` (chaves naturais, índice de cobertura e ANALYZE).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_consultas_banco
+"""
+
+CONSULTAS = {
+    "últimos N dias": "SELECT * FROM vw_candles WHERE data >= ? ORDER BY data, hora",
+    "dia único": "SELECT * FROM vw_candles WHERE data = ? ORDER BY hora",
+}
+
+
+def medir_consulta(db_path, sql, parametros, repeticoes=20):
+    tempos = []
+    with sqlite3.connect(db_path) as conn:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            linhas = conn.execute(sql, parametros).fetchall()
+            tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000, len(linhas)
+
+
+def executar_benchmark(n_dias=250, ultimos_dias=5):
+    df = gerar_dados_transformados(n_dias=n_dias)
+    datas = sorted(df['data'].dt.strftime('%Y-%m-%d').unique())
+    parametros = {
+        "últimos N dias": (datas[-ultimos_dias],),
+        "dia único": (datas[len(datas) // 2],),
+    }
+    print(f"\nBenchmark de consultas: {len(df)} candles sintéticos ({n_dias} dias)\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_sem_indices = os.path.join(tmp, "sem_indices.db")
+        with sqlite3.connect(db_sem_indices) as conn:
+            conn.executescript(sql_tabelas)
+            conn.executescript(sql_views)
+        carregar_dados(df, db_sem_indices, modo='bulk')
+
+        db_com_indices = os.path.join(tmp, "com_indices.db")
+        criar_banco(db_com_indices)
+        carregar_dados(df, db_com_indices, modo='bulk')
+        criar_banco(db_com_indices)  # atualiza as estatísticas do ANALYZE com o banco carregado
+
+        for nome, sql in CONSULTAS.items():
+            antes, n_antes = medir_consulta(db_sem_indices, sql, parametros[nome])
+            depois, n_depois = medir_consulta(db_com_indices, sql, parametros[nome])
+            print(f"{nome:>15}: sem índices {antes:8.2f} ms ({n_antes} linhas) | "
+                  f"com índices {depois:8.2f} ms ({n_depois} linhas) | {antes / depois:6.1f}x")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,98 @@
+
+#@title Benchmark do formato dos datasets de treino (.npz compactado x .npy float32 mapeado)
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from scripts.benchmarks.benchmark_sequencias_intradiarias import COLUNAS_FEATURES, COLUNAS_TARGETS
+from scripts.benchmarks.dados_sinteticos import gerar_dados_transformados
+from scripts.modelagem_machine_learning.dataset_mmap import (
+    MANTER_DATASETS, abrir_dataset, limites_divisao, limpar_datasets, obter_divisao, registrar_dataset_modelo,
+    salvar_dataset
+)
+from scripts.modelagem_machine_learning.sequencias import sequencias_intradiarias
+
+"""
+Compara o formato anterior (`np.savez_compressed` com X/y inteiros, descompactados na memória a
+cada leitura) com o dataset de `dataset_mmap` (float32 sem compressão + manifesto, aberto com
+`np.load(mmap_mode='r')`): tempo de gravação, tempo até o primeiro lote de treino e tamanho em disco.
+Grava também o mesmo conteúdo duas vezes para mostrar que o diretório é reaproveitado, e várias
+versões (como execuções diárias) para conferir a retenção: ficam as `MANTER_DATASETS` mais recentes
+e a usada por um modelo salvo.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_dataset_mmap
+"""
+
+def tamanho_mb(caminho):
+    if os.path.isfile(caminho):
+        return os.path.getsize(caminho) / 1e6
+    return sum(os.path.getsize(os.path.join(raiz, f)) for raiz, _, arquivos in os.walk(caminho) for f in arquivos) / 1e6
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def executar_benchmark(n_dias=1000, dias_entrada=3, tamanho_lote=32):
+    df = gerar_dados_transformados(n_dias=n_dias)
+    X, y, _, validas = sequencias_intradiarias(df, COLUNAS_FEATURES, COLUNAS_TARGETS, dias_entrada, 98)
+    X, y = X[validas], y[validas]
+    divisoes = limites_divisao(len(X))
+    print(f"\nBenchmark do formato de dataset: X {X.shape}, y {y.shape}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arquivo_npz = os.path.join(tmp, "lstm_dataset.npz")
+        tempo_npz, _ = cronometrar(lambda: np.savez_compressed(arquivo_npz, X=X, y=y))
+
+        def primeiro_lote_npz():
+            with np.load(arquivo_npz) as dados:
+                X_treino = dados['X'][:divisoes['treino'][1]]
+                return X_treino[:tamanho_lote].sum()
+        leitura_npz, _ = cronometrar(primeiro_lote_npz)
+
+        dir_datasets = os.path.join(tmp, "datasets")
+        tempo_mmap, caminho = cronometrar(
+            lambda: salvar_dataset({'X': X, 'y': y}, 'lstm_intradiario', dir_datasets, divisoes=divisoes)
+        )
+
+        def primeiro_lote_mmap():
+            arrays, manifesto = abrir_dataset(caminho)
+            treino = obter_divisao(arrays, manifesto, 'treino')
+            return treino['X'][:tamanho_lote].sum()
+        leitura_mmap, _ = cronometrar(primeiro_lote_mmap)
+
+        regravar, caminho_2 = cronometrar(
+            lambda: salvar_dataset({'X': X, 'y': y}, 'lstm_intradiario', dir_datasets, divisoes=divisoes)
+        )
+
+        print(f"\n{'':>22} {'gravação':>10} {'1º lote':>10} {'disco':>10}")
+        print(f"{'npz compactado':>22} {tempo_npz:9.2f}s {leitura_npz * 1000:8.1f}ms {tamanho_mb(arquivo_npz):8.1f}MB")
+        print(f"{'npy float32 + mmap':>22} {tempo_mmap:9.2f}s {leitura_mmap * 1000:8.1f}ms {tamanho_mb(caminho):8.1f}MB")
+        print(f"\nMesmo conteúdo gravado de novo em {regravar:.2f} s, mesmo diretório: {caminho == caminho_2} "
+              f"({len(os.listdir(dir_datasets))} dataset no disco)")
+
+        # Retenção: uma versão por "dia"; a primeira é a base de um modelo salvo
+        dir_versoes, dir_modelos = os.path.join(tmp, "versoes"), os.path.join(tmp, "modelos")
+        os.makedirs(dir_modelos)
+        versoes = []
+        for dia in range(6):
+            versoes.append(salvar_dataset({'X': X[:100] + dia}, 'lstm_intradiario', dir_versoes, ticker='BBDC4.SA',
+                                          manter=None))
+            os.utime(versoes[-1], (dia, dia))
+        registrar_dataset_modelo(os.path.join(dir_modelos, 'modelo.keras'), versoes[0])
+        removidos = limpar_datasets('lstm_intradiario', dir_versoes, dir_modelos=dir_modelos)
+        assert sorted(removidos) == sorted(versoes[1:-MANTER_DATASETS])
+        assert sorted(os.path.join(dir_versoes, nome) for nome in os.listdir(dir_versoes)) == \
+            sorted([versoes[0]] + versoes[-MANTER_DATASETS:])
+        print(f"Retenção: {len(versoes)} versões gravadas, {len(removidos)} removidas; ficam as "
+              f"{MANTER_DATASETS} mais recentes e a usada pelo modelo salvo.")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
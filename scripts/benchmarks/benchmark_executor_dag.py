@@ -0,0 +1,144 @@
+
+#@title Benchmark do executor em grafo do pipeline (etapas puladas, reexecução parcial e falha isolada)
+
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from scripts.benchmarks.dados_sinteticos import gerar_candles_brutos
+from scripts.pipeline.armazenamento import acrescentar_etapa, contar_linhas, salvar_etapa
+from scripts.pipeline.executar_pipeline import montar_etapas
+from scripts.pipeline.executor_dag import executar_dag
+from scripts.pipeline.manifesto_pipeline import caminho_manifesto_padrao, registrar_marca
+
+"""
+Roda o grafo de `executar_pipeline` (limpeza, transformação, banco, carga e diagnóstico; a extração
+é substituída por dados brutos sintéticos já gravados, sem acesso à internet) para vários tickers,
+um deles com uma partição bruta corrompida, e mede:
+- primeira execução: todos os tickers processados; o ticker inválido falha na limpeza e só as
+  etapas dele ficam bloqueadas;
+- segunda execução sem dados novos: todas as unidades puladas pelas impressões das entradas;
+- um dia novo em um ticker: só as unidades desse ticker rodam de novo;
+- banco apagado: o banco é recriado e a carga de todos os tickers roda de novo;
+- dados transformados de um ticker apagados (o manifesto fica): a marca d'água é descartada e a
+  transformação desse ticker é refeita por completo.
+
+Depois de cada execução o banco deve ter um candle por linha transformada de cada ticker válido
+(os tickers dividem o mesmo banco, com a chave (data, hora, ticker)).
+
+A preparação do dataset LSTM fica de fora (depende do scikit-learn/TensorFlow).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_executor_dag
+"""
+
+TICKERS = ['AAAA3.SA', 'BBBB4.SA', 'CCCC3.SA', 'DDDD4.SA']
+TICKER_INVALIDO = 'ZZZZ3.SA'
+
+
+def gravar_bruto(caminho, ticker, df, acrescimo=False):
+    manifesto = caminho_manifesto_padrao(caminho)
+    if acrescimo:
+        acrescentar_etapa(df, caminho, 'bruto', ticker)
+    else:
+        salvar_etapa(df, caminho, 'bruto', ticker)
+    registrar_marca(manifesto, 'bruto', ticker, df, acrescimo=acrescimo)
+
+
+def executar(etapas, tickers, arquivo_estado):
+    # Os prints das etapas vão para um buffer; só a situação final interessa aqui
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        situacao = executar_dag(etapas, tickers, arquivo_estado=arquivo_estado)
+    return situacao, time.perf_counter() - inicio
+
+
+def candles_no_banco(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT ticker, COUNT(*) FROM vw_candles GROUP BY ticker").fetchall())
+
+
+def contar(situacao, status):
+    return sum(1 for valor in situacao.values() if valor == status)
+
+
+def executar_benchmark(n_dias=30):
+    print(f"\nExecutor em grafo: {len(TICKERS)} tickers válidos + 1 inválido, {n_dias} dias ({os.cpu_count()} CPUs)\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho_bruto = os.path.join(tmp, 'bruto')
+        caminhos = dict(
+            caminho_bruto=caminho_bruto, caminho_limpo=os.path.join(tmp, 'limpo'),
+            caminho_transformado=os.path.join(tmp, 'transformado'), db_path=os.path.join(tmp, 'banco', 'banco.db'),
+        )
+        for i, ticker in enumerate(TICKERS):
+            gravar_bruto(caminho_bruto, ticker, gerar_candles_brutos(n_dias=n_dias, semente=i))
+        # Ticker inválido: um arquivo Parquet corrompido em uma das partições
+        gravar_bruto(caminho_bruto, TICKER_INVALIDO, gerar_candles_brutos(n_dias=n_dias))
+        diretorio = os.path.join(caminho_bruto, f"ticker={TICKER_INVALIDO}")
+        with open(os.path.join(diretorio, sorted(os.listdir(diretorio))[-1], 'part-0.parquet'), 'wb') as f:
+            f.write(b'corrompido')
+
+        etapas = [
+            etapa for etapa in montar_etapas('5m', n_dias, tam_seq=16, tx_treino=0.8,
+                                             dir_relatorios=os.path.join(tmp, 'relatorios'), **caminhos)
+            if etapa.nome not in ('extracao', 'preparacao_lstm')
+        ]
+        tickers = TICKERS + [TICKER_INVALIDO]
+        arquivo_estado = os.path.join(tmp, 'estado_pipeline.json')
+
+        primeira, tempo_primeira = executar(etapas, tickers, arquivo_estado)
+        segunda, tempo_segunda = executar(etapas, tickers, arquivo_estado)
+
+        # Um dia novo só para o primeiro ticker
+        novo_dia = gerar_candles_brutos(n_dias=n_dias + 1, semente=0)
+        novo_dia = novo_dia[novo_dia.index.normalize() == novo_dia.index.normalize().max()]
+        gravar_bruto(caminho_bruto, TICKERS[0], novo_dia, acrescimo=True)
+        terceira, tempo_terceira = executar(etapas, tickers, arquivo_estado)
+        transformados = {ticker: contar_linhas(caminhos['caminho_transformado'], ticker) for ticker in TICKERS}
+        assert candles_no_banco(caminhos['db_path']) == transformados
+
+        os.remove(caminhos['db_path'])
+        quarta, tempo_quarta = executar(etapas, tickers, arquivo_estado)
+        assert candles_no_banco(caminhos['db_path']) == transformados
+
+        shutil.rmtree(os.path.join(caminhos['caminho_transformado'], f"ticker={TICKERS[1]}"))
+        quinta, tempo_quinta = executar(etapas, tickers, arquivo_estado)
+        assert {ticker: contar_linhas(caminhos['caminho_transformado'], ticker) for ticker in TICKERS} == transformados
+
+    print(f"{'execução':<34} {'tempo':>8} {'ok':>4} {'puladas':>8} {'erro':>5} {'bloqueadas':>11}")
+    for nome, situacao, tempo in (('primeira', primeira, tempo_primeira),
+                                  ('sem dados novos', segunda, tempo_segunda),
+                                  (f"dia novo em {TICKERS[0]}", terceira, tempo_terceira),
+                                  ('banco apagado', quarta, tempo_quarta),
+                                  (f"transformado apagado em {TICKERS[1]}", quinta, tempo_quinta)):
+        print(f"{nome:<34} {tempo:>7.2f}s {contar(situacao, 'ok'):>4} {contar(situacao, 'ignorada'):>8} "
+              f"{contar(situacao, 'erro'):>5} {contar(situacao, 'bloqueada'):>11}")
+
+    # Falha isolada: só a limpeza do ticker inválido falha e só as etapas dele ficam bloqueadas
+    assert primeira[('limpeza', TICKER_INVALIDO)] == 'erro'
+    assert all(status == 'ok' for (_, ticker), status in primeira.items() if ticker != TICKER_INVALIDO)
+    assert all(status == 'bloqueada' for (nome, ticker), status in primeira.items()
+               if ticker == TICKER_INVALIDO and nome != 'limpeza')
+    # Sem dados novos nada roda (a limpeza inválida, sem sucesso registrado, é tentada de novo)
+    assert all(status == 'ignorada' for (nome, ticker), status in segunda.items() if ticker != TICKER_INVALIDO)
+    # Dia novo: só as unidades do ticker alterado rodam
+    assert {unidade for unidade, status in terceira.items() if status == 'ok'} == {
+        (nome, TICKERS[0]) for nome in ('limpeza', 'transformacao', 'carga', 'diagnostico_qualidade')
+    }
+    # Banco apagado: recriado, e a carga (dependência só de ordem) roda para todos os tickers válidos
+    assert {unidade for unidade, status in quarta.items() if status == 'ok'} == {
+        ('banco_dimensional', None), *(('carga', ticker) for ticker in TICKERS)
+    }
+    # Saída apagada: a transformação do ticker é refeita; nada dos outros tickers roda
+    assert quinta[('transformacao', TICKERS[1])] == 'ok'
+    assert all(status == 'ignorada' for (nome, ticker), status in quinta.items()
+               if ticker not in (TICKERS[1], TICKER_INVALIDO))
+    print(f"\nBanco com os candles transformados de cada ticker ({sum(transformados.values())} no total).")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,92 @@
+
+#@title Benchmark da extração de vários tickers (serial x paralela x cache)
+
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from scripts.benchmarks.dados_sinteticos import gerar_candles_brutos
+from scripts.pipeline.armazenamento import ler_etapa
+from scripts.pipeline.extracao_dados import extrair_varios_tickers
+
+"""
+Extrai um universo de tickers com um provedor falso (candles sintéticos e latência simulada de rede,
+sem acesso à internet) e compara:
+- extração serial (`max_concorrencia=1`) x paralela;
+- reexecução com o cache de respostas em disco (nenhuma chamada ao provedor);
+- um ticker que falha nas primeiras tentativas (novas tentativas com espera) e um que sempre falha
+  (os demais tickers são gravados normalmente).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_extracao
+"""
+
+class ProvedorSintetico:
+    """Provedor falso: candles sintéticos por ticker, com latência fixa e falhas programadas."""
+
+    def __init__(self, latencia=0.2, falhas=None):
+        self.latencia = latencia
+        self.falhas = dict(falhas or {})  # ticker -> número de chamadas que falham
+        self.chamadas = 0
+        self._trava = threading.Lock()
+
+    def baixar(self, ticker, inicio, fim, intervalo):
+        with self._trava:
+            self.chamadas += 1
+            falhar = self.falhas.get(ticker, 0) > 0
+            if falhar:
+                self.falhas[ticker] -= 1
+        time.sleep(self.latencia)
+        if falhar:
+            raise ConnectionError("erro simulado do provedor")
+
+        dias = pd.bdate_range(inicio, pd.Timestamp(fim) - pd.Timedelta(days=1))
+        if dias.empty:
+            return pd.DataFrame()
+        semente = sum(ticker.encode())
+        return gerar_candles_brutos(n_dias=len(dias), data_inicio=dias[0], semente=semente)
+
+
+def extrair(tickers, destino, provedor, max_concorrencia, dir_cache=None):
+    inicio = time.perf_counter()
+    gravados, erros = extrair_varios_tickers(
+        tickers, 30, "5m", destino, provedor=provedor, dir_cache=dir_cache,
+        max_concorrencia=max_concorrencia, tentativas=3
+    )
+    return time.perf_counter() - inicio, gravados, erros
+
+
+def executar_benchmark(n_tickers=16, latencia=0.2):
+    tickers = [f"TICK{i:02d}.SA" for i in range(n_tickers)]
+    resultados = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for concorrencia in [1, 8]:
+            destino = os.path.join(tmp, f"brutos_{concorrencia}")
+            resultados[concorrencia], _, _ = extrair(tickers, destino, ProvedorSintetico(latencia), concorrencia)
+
+        cache = os.path.join(tmp, "cache")
+        provedor = ProvedorSintetico(latencia)
+        extrair(tickers, os.path.join(tmp, "brutos_cache_1"), provedor, 8, cache)
+        chamadas_primeira = provedor.chamadas
+        tempo_cache, _, _ = extrair(tickers, os.path.join(tmp, "brutos_cache_2"), provedor, 8, cache)
+        chamadas_reexecucao = provedor.chamadas - chamadas_primeira
+
+        provedor = ProvedorSintetico(0.01, falhas={tickers[0]: 2, tickers[1]: 10})
+        _, gravados, erros = extrair(tickers, os.path.join(tmp, "brutos_falhas"), provedor, 8)
+        linhas_primeiro = len(ler_etapa(os.path.join(tmp, "brutos_falhas"), 'bruto', tickers[0]))
+
+    print(f"\nBenchmark de extração: {n_tickers} tickers, latência simulada de {latencia * 1000:.0f} ms\n")
+    print(f"  serial:           {resultados[1]:6.2f} s")
+    print(f"  8 em paralelo:    {resultados[8]:6.2f} s ({resultados[1] / resultados[8]:.1f}x)")
+    print(f"  reexecução/cache: {tempo_cache:6.2f} s ({chamadas_reexecucao} chamadas ao provedor)")
+    print(f"\nCom falhas: {len(gravados)} tickers gravados, erros em {list(erros)}; "
+          f"{tickers[0]} gravado após novas tentativas ({linhas_primeiro} candles)")
+    return resultados
+
+
+if __name__ == "__main__":
+    executar_benchmark()
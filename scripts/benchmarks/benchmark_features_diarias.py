@@ -0,0 +1,72 @@
+
+#@title Benchmark das features diárias (groupby.apply x agregação única)
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.benchmarks.dados_sinteticos import gerar_candles_limpos
+from scripts.pipeline.transformacao_dados import adicionar_features_diarias
+
+"""
+Compara a implementação anterior de `adicionar_features_diarias` (groupby.apply com callback Python
+por dia, três groupby-transform separados e lags deslocados por linha) com a agregação diária única,
+sobre um DataFrame sintético de ~1 milhão de candles. Mede também o caso com vários tickers.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_features_diarias
+"""
+
+def features_diarias_anterior(df):
+    """Implementação anterior, mantida aqui apenas como referência de tempo."""
+    df['volume'] = df['volume'].astype(int)
+    fechamento_dia_map = df.groupby('data').apply(lambda x: x.loc[x['hora'].idxmax(), 'fechamento'])
+    df['fechamento_dia'] = df['data'].map(fechamento_dia_map)
+    df['volume_dia'] = df.groupby('data')['volume'].transform('sum').fillna(0).astype(int)
+    df['maximo_dia'] = df.groupby('data')['maximo'].transform('max')
+    df['minimo_dia'] = df.groupby('data')['minimo'].transform('min')
+    df['fechamento_dia_anterior'] = df['fechamento_dia'].shift(1)
+    df['volume_dia_anterior'] = df['volume_dia'].shift(1).fillna(0).astype(int)
+    df['maximo_dia_anterior'] = df['maximo_dia'].shift(1)
+    df['minimo_dia_anterior'] = df['minimo_dia'].shift(1)
+    return df
+
+
+def cronometrar(funcao, df):
+    inicio = time.perf_counter()
+    resultado = funcao(df.copy())
+    return time.perf_counter() - inicio, resultado
+
+
+def executar_benchmark(n_linhas=1_000_000, n_tickers=10):
+    pontos_por_dia = 98
+    df = gerar_candles_limpos(n_dias=n_linhas // pontos_por_dia, pontos_por_dia=pontos_por_dia)
+    print(f"\nBenchmark de features diárias: {len(df):,} candles, {df['data'].nunique():,} dias\n")
+
+    tempo_anterior, anterior = cronometrar(features_diarias_anterior, df)
+    tempo_novo, novo = cronometrar(adicionar_features_diarias, df)
+    print(f"groupby.apply (anterior): {tempo_anterior:7.2f} s")
+    print(f"agregação única:          {tempo_novo:7.2f} s ({tempo_anterior / tempo_novo:.1f}x)")
+
+    # Os agregados do próprio dia são iguais; os do dia anterior agora são do pregão anterior
+    for col in ['fechamento_dia', 'volume_dia', 'maximo_dia', 'minimo_dia']:
+        np.testing.assert_allclose(novo[col].to_numpy(float), anterior[col].to_numpy(float))
+    primeiro_do_dia = novo['data'] != novo['data'].shift(1)
+    np.testing.assert_allclose(
+        novo.loc[primeiro_do_dia, 'fechamento_dia_anterior'].to_numpy(float)[1:],
+        novo.loc[primeiro_do_dia, 'fechamento_dia'].to_numpy(float)[:-1]
+    )
+
+    # Vários tickers no mesmo DataFrame: o groupby usa a chave (ticker, data)
+    multi = pd.concat(
+        [gerar_candles_limpos(n_dias=n_linhas // pontos_por_dia // n_tickers, semente=i).assign(ticker=f"T{i}")
+         for i in range(n_tickers)],
+        ignore_index=True
+    )
+    tempo_multi, _ = cronometrar(adicionar_features_diarias, multi)
+    print(f"\n{n_tickers} tickers ({len(multi):,} candles): {tempo_multi:7.2f} s")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
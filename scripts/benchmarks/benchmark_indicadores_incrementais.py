@@ -0,0 +1,99 @@
+
+#@title Paridade e custo da transformação incremental de indicadores
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.benchmarks.dados_sinteticos import gerar_candles_limpos
+from scripts.pipeline.transformacao_dados import (
+    calcular_indicadores, calcular_indicadores_incremental, calcular_volatilidade
+)
+
+"""
+1. Paridade: processa o histórico dia a dia com `calcular_indicadores_incremental`, carregando o
+   estado entre os dias, e verifica que os indicadores são iguais aos de um recálculo completo com
+   `calcular_indicadores` + `calcular_volatilidade` (falha com AssertionError se divergirem).
+2. Custo: compara o tempo de acrescentar um dia novo (incremental) com o de recalcular o histórico, e
+   o da primeira execução incremental (histórico inteiro, sem estado) com o do recálculo completo.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_indicadores_incrementais
+"""
+
+COLUNAS_INDICADORES = [
+    'retorno', 'SMA_10', 'EMA_10', 'MACD', 'Signal_Line', 'rsi', 'OBV', 'ADX',
+    'BB_MA20', 'BB_STD20', 'BB_upper', 'BB_lower', '%K', '%D', 'CCI', 'ATR',
+    'fechamento_lag1', 'retorno_lag1', 'volume_lag1',
+    'fechamento_lag2', 'retorno_lag2', 'volume_lag2',
+    'fechamento_lag3', 'retorno_lag3', 'volume_lag3',
+    'retorno_log', 'volatilidade'
+]
+
+
+def recalculo_completo(df):
+    return calcular_volatilidade(calcular_indicadores(df.copy()))
+
+
+def processar_dia_a_dia(df, dias_iniciais=5):
+    dias = sorted(df['data'].unique())
+    estado = None
+    partes = []
+
+    primeiro_bloco = df[df['data'] < dias[dias_iniciais]]
+    parte, estado = calcular_indicadores_incremental(primeiro_bloco, estado)
+    partes.append(parte)
+
+    for dia in dias[dias_iniciais:]:
+        parte, estado = calcular_indicadores_incremental(df[df['data'] == dia], estado)
+        partes.append(parte)
+
+    return pd.concat(partes, ignore_index=True), estado
+
+
+def verificar_paridade(n_dias=30):
+    df = gerar_candles_limpos(n_dias=n_dias)
+    completo = recalculo_completo(df)
+    incremental, _ = processar_dia_a_dia(df)
+
+    assert len(completo) == len(incremental)
+    for col in COLUNAS_INDICADORES:
+        np.testing.assert_allclose(
+            incremental[col].to_numpy(dtype=float), completo[col].to_numpy(dtype=float),
+            rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=f"Divergência em {col}"
+        )
+    print(f"Paridade OK: {len(completo)} candles, {len(COLUNAS_INDICADORES)} colunas iguais ao recálculo completo.")
+
+
+def medir_custo(n_dias=250, repeticoes=5):
+    df = gerar_candles_limpos(n_dias=n_dias)
+    ultimo_dia = df['data'].max()
+    historico, dia_novo = df[df['data'] < ultimo_dia], df[df['data'] == ultimo_dia]
+    _, estado = calcular_indicadores_incremental(historico)
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        recalculo_completo(df)
+    tempo_completo = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        calcular_indicadores_incremental(dia_novo, estado)
+    tempo_incremental = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        calcular_indicadores_incremental(df)
+    tempo_primeira = (time.perf_counter() - inicio) / repeticoes
+
+    print(f"\nAcrescentar 1 dia a {n_dias} dias de histórico ({len(df)} candles):")
+    print(f"  recálculo completo: {tempo_completo * 1000:8.2f} ms")
+    print(f"  incremental:        {tempo_incremental * 1000:8.2f} ms ({tempo_completo / tempo_incremental:.1f}x)")
+    print(f"  primeira execução incremental (sem estado): {tempo_primeira * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    verificar_paridade()
+    for n_dias in [250, 1000, 2500]:
+        medir_custo(n_dias)
@@ -0,0 +1,58 @@
+
+#@title Latência e paridade do motor de indicadores online
+
+import time
+
+import numpy as np
+
+from scripts.benchmarks.benchmark_indicadores_incrementais import COLUNAS_INDICADORES, recalculo_completo
+from scripts.benchmarks.dados_sinteticos import gerar_candles_limpos
+from scripts.pipeline.indicadores_online import MotorIndicadoresOnline
+
+"""
+1. Paridade: as features produzidas candle a candle por `MotorIndicadoresOnline` devem ser iguais às de
+   `calcular_indicadores` + `calcular_volatilidade` sobre o mesmo histórico (AssertionError se divergirem).
+2. Latência: mede o tempo de cada `atualizar(candle)` com o motor aquecido e reporta p50/p99.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_indicadores_online
+"""
+
+def verificar_paridade(n_dias=30):
+    df = gerar_candles_limpos(n_dias=n_dias)
+    lote = recalculo_completo(df)
+    online = MotorIndicadoresOnline().processar(df)
+
+    for col in COLUNAS_INDICADORES:
+        np.testing.assert_allclose(
+            online[col].to_numpy(dtype=float), lote[col].to_numpy(dtype=float),
+            rtol=1e-7, atol=1e-7, equal_nan=True, err_msg=f"Divergência em {col}"
+        )
+    print(f"Paridade OK: {len(df)} candles, {len(COLUNAS_INDICADORES)} colunas iguais à versão em lote.")
+
+
+def medir_latencia(dias_aquecimento=20, dias_medidos=50):
+    df = gerar_candles_limpos(n_dias=dias_aquecimento + dias_medidos)
+    dias = sorted(df['data'].unique())
+    historico = df[df['data'] < dias[dias_aquecimento]]
+    candles = df[df['data'] >= dias[dias_aquecimento]].to_dict('records')
+
+    motor = MotorIndicadoresOnline()
+    motor.aquecer(historico)
+
+    tempos = np.empty(len(candles))
+    for i, candle in enumerate(candles):
+        inicio = time.perf_counter_ns()
+        motor.atualizar(candle)
+        tempos[i] = time.perf_counter_ns() - inicio
+
+    tempos_us = tempos / 1000
+    print(f"\nLatência por candle ({len(candles)} atualizações):")
+    print(f"  p50: {np.percentile(tempos_us, 50):7.1f} µs")
+    print(f"  p99: {np.percentile(tempos_us, 99):7.1f} µs")
+    print(f"  máx: {tempos_us.max():7.1f} µs")
+
+
+if __name__ == "__main__":
+    verificar_paridade()
+    medir_latencia()
@@ -0,0 +1,125 @@
+
+#@title Benchmark da limpeza (etapas com prints x máscara única silenciosa)
+
+import contextlib
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from scripts.benchmarks.dados_sinteticos import gerar_candles_brutos
+from scripts.pipeline.armazenamento import FUSO_HORARIO, minuto_do_dia, normalizar_bruto
+from scripts.pipeline.limpeza_dados import COLUNAS_LIMPAS, limpar_candles
+
+"""
+Compara a limpeza anterior (sete blocos de `head()`/`info()`, cópias intermediárias e um filtro
+booleano por critério) com `limpar_candles` (máscara única, colunas montadas só para as linhas
+mantidas) sobre um bruto sintético de ~3 milhões de candles com duplicatas, nulos, candles de fim
+de semana e fora do pregão. Mede o tempo (sem o tracemalloc) e o pico de memória alocada durante a
+limpeza (com o tracemalloc, em uma segunda execução), nas verbosidades 0, 1 e 2.
+
+Os prints da versão anterior vão para um buffer em memória (o custo de formatação é medido, o de
+escrever no terminal/log não). A gravação fica de fora: as duas versões gravam o mesmo resultado.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_limpeza
+"""
+
+
+def limpeza_anterior(df):
+    """Limpeza anterior (sem a gravação), mantida aqui apenas como referência de tempo e resultado."""
+    print("Dados originais:")
+    print(df.head())
+    print(df.info())
+    df = normalizar_bruto(df).copy()
+    print("Após remoção do cabeçalho do yfinance:")
+    print(df.head())
+    df.index = pd.to_datetime(df.index, utc=True)
+    df.index = df.index.tz_convert(FUSO_HORARIO)
+    df.index.name = 'timestamp'
+    df = df.reset_index()
+    df['data'] = df['timestamp'].dt.tz_localize(None).dt.normalize()
+    df['hora'] = df['timestamp'].dt.strftime('%H:%M:%S')
+    print("\nApós conversão de índice:")
+    print(df.head())
+    df.rename(columns={'Close': 'fechamento', 'High': 'maximo', 'Low': 'minimo', 'Open': 'abertura',
+                       'Volume': 'volume'}, inplace=True)
+    for col in ['abertura', 'minimo', 'maximo', 'fechamento']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').round(2)
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce', downcast='integer')
+    df = df[COLUNAS_LIMPAS + ['timestamp']]
+    print("\nApós reorganizar as colunas:")
+    print(df.head())
+    df = df.drop_duplicates(subset=COLUNAS_LIMPAS, keep='first')
+    df = df.dropna(subset=COLUNAS_LIMPAS, thresh=len(COLUNAS_LIMPAS) * 0.5)
+    print("\nApós remover duplicatas e nulos:")
+    print(df.head())
+    df = df[df['timestamp'].dt.weekday < 5]
+    print("\nApós filtrar apenas os dias úteis:")
+    print(df.head())
+    minutos = minuto_do_dia(df['timestamp'])
+    df = df[minutos.between(9 * 60 + 55, 18 * 60 + 5)]
+    print("\nApós filtrar o intervalo de horário (09:55-18:05):")
+    print(df.head())
+    df = df.sort_values(["data", "hora"], ascending=[False, True])
+    print("\nDados limpos e ordenados:")
+    print(df.head(10))
+    return df
+
+
+def gerar_bruto_sujo(n_dias, semente=0):
+    """Bruto sintético com ~3% de duplicatas, ~2% de nulos, fins de semana e candles fora do pregão."""
+    rng = np.random.default_rng(semente)
+    bruto = gerar_candles_brutos(n_dias=n_dias, semente=semente)
+    n = len(bruto)
+
+    duplicadas = bruto.iloc[rng.choice(n, n * 3 // 100, replace=False)]
+    nulas = bruto.iloc[rng.choice(n, n * 2 // 100, replace=False)].copy()
+    nulas.iloc[:, :3] = np.nan
+    fim_de_semana = bruto.iloc[rng.choice(n, n // 100, replace=False)].copy()
+    fim_de_semana.index = fim_de_semana.index + pd.Timedelta(days=5)  # dia útil + 5 cai no fim de semana
+    noturnas = bruto.iloc[rng.choice(n, n // 100, replace=False)].copy()
+    noturnas.index = noturnas.index + pd.Timedelta(hours=9)
+
+    sujo = pd.concat([bruto, duplicadas, nulas, fim_de_semana, noturnas])
+    return sujo.iloc[rng.permutation(len(sujo))]
+
+
+def medir(funcao, df):
+    saida = io.StringIO()
+    with contextlib.redirect_stdout(saida):
+        inicio = time.perf_counter()
+        resultado = funcao(df)
+        tempo = time.perf_counter() - inicio
+
+        tracemalloc.start()
+        funcao(df)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return tempo, pico / 1e6, len(saida.getvalue()), resultado
+
+
+def executar_benchmark(n_dias=28_000):
+    bruto = gerar_bruto_sujo(n_dias)
+    print(f"\nLimpeza: {len(bruto):,} candles brutos ({bruto.memory_usage(deep=True).sum() / 1e6:.0f} MB)\n")
+
+    casos = [('anterior (prints)', limpeza_anterior)] + [
+        (f"máscara única, verbosidade {nivel}", lambda df, nivel=nivel: limpar_candles(df, verbosidade=nivel))
+        for nivel in (0, 1, 2)
+    ]
+    resultados = {}
+    print(f"{'versão':<32} {'tempo':>8} {'pico':>9} {'log':>10}")
+    for nome, funcao in casos:
+        tempo, pico, caracteres, resultados[nome] = medir(funcao, bruto)
+        print(f"{nome:<32} {tempo:>7.2f}s {pico:>7.0f}MB {caracteres:>9,}c")
+
+    anterior = resultados['anterior (prints)']
+    for nome, resultado in resultados.items():
+        pd.testing.assert_frame_equal(resultado, anterior, check_index_type=False)
+    print(f"\nResultados idênticos ({len(anterior):,} candles limpos).")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
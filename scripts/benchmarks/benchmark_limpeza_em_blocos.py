@@ -0,0 +1,90 @@
+
+#@title Benchmark da limpeza em blocos (pico de memória x tamanho do histórico bruto)
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from scripts.benchmarks.benchmark_limpeza import gerar_bruto_sujo
+from scripts.pipeline.armazenamento import ler_etapa, salvar_etapa
+from scripts.pipeline.limpeza_dados import COLUNAS_LIMPAS
+
+"""
+Grava brutos sintéticos (com duplicatas, nulos, fins de semana e candles fora do pregão, em ordem
+cronológica como a extração grava) de dois tamanhos, em CSV e em Parquet, e limpa cada um em um
+processo Python novo:
+- completa: `limpeza_dados(ler_etapa(...))`, com o bruto inteiro em memória;
+- em blocos: `limpeza_dados_em_blocos`, lendo e gravando `tamanho_bloco` linhas por vez.
+
+Mede o tempo e o pico de memória residente (VmHWM) de cada processo, descontado o pico de um
+processo que só importa o módulo. O pico da limpeza em blocos deve ficar estável com o histórico 4x
+maior; o da completa cresce junto. Os dados limpos gravados pelas duas versões são relidos e
+comparados (o CSV em blocos é gravado em ordem cronológica, por isso a comparação ordena as linhas).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_limpeza_em_blocos
+"""
+
+TICKER = 'BENCH3.SA'
+IMPORTACAO = "from scripts.pipeline.armazenamento import ler_etapa\n" \
+             "from scripts.pipeline.limpeza_dados import limpeza_dados, limpeza_dados_em_blocos\n"
+
+
+def medir_processo(codigo):
+    """Tempo (s) e pico de memória residente (MB) de um processo Python novo executando `codigo`."""
+    # VmHWM e não ru_maxrss: no Linux o ru_maxrss do filho começa com o pico do processo que o criou
+    # (este, que guarda o bruto sintético inteiro)
+    medicao = (
+        "import time\n" + IMPORTACAO + "_t = time.perf_counter()\n" + codigo +
+        "\n_pico = [linha for linha in open('/proc/self/status') if linha.startswith('VmHWM')][0].split()[1]"
+        "\nprint(time.perf_counter() - _t, int(_pico) / 1024)"
+    )
+    saida = subprocess.run([sys.executable, '-c', medicao], capture_output=True, text=True, check=True)
+    tempo, memoria = saida.stdout.split()[-2:]
+    return float(tempo), float(memoria)
+
+
+def ordenar(df):
+    return df[COLUNAS_LIMPAS].sort_values(COLUNAS_LIMPAS, kind='stable').reset_index(drop=True)
+
+
+def executar_benchmark(n_dias=(2_000, 8_000), tamanho_bloco=100_000):
+    _, base = medir_processo("pass")
+    print(f"\nLimpeza completa x em blocos ({tamanho_bloco:,} linhas por bloco; "
+          f"processo só com as importações: {base:.0f} MB)\n")
+    print(f"{'formato':<8} {'linhas brutas':>14} {'completa':>18} {'em blocos':>18}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dias in n_dias:
+            bruto = gerar_bruto_sujo(dias).sort_index(kind='stable')
+            for formato in ('parquet', 'csv'):
+                sufixo = '.csv' if formato == 'csv' else ''
+                caminho_bruto = os.path.join(tmp, f"bruto_{dias}{sufixo}")
+                salvar_etapa(bruto, caminho_bruto, 'bruto', TICKER)
+                saidas = {versao: os.path.join(tmp, f"limpo_{versao}_{dias}{sufixo}")
+                          for versao in ('completa', 'blocos')}
+
+                completa = medir_processo(
+                    f"limpeza_dados(ler_etapa(r'{caminho_bruto}', 'bruto', '{TICKER}'), r'{saidas['completa']}', "
+                    f"'{TICKER}', verbosidade=0)"
+                )
+                em_blocos = medir_processo(
+                    f"limpeza_dados_em_blocos(r'{caminho_bruto}', r'{saidas['blocos']}', '{TICKER}', "
+                    f"{tamanho_bloco}, verbosidade=0)"
+                )
+                print(f"{formato:<8} {len(bruto):>14,} "
+                      f"{completa[0]:>6.2f}s {completa[1] - base:>7.0f}MB "
+                      f"{em_blocos[0]:>6.2f}s {em_blocos[1] - base:>7.0f}MB")
+
+                limpo_completo = ler_etapa(saidas['completa'], 'limpo', TICKER)
+                limpo_em_blocos = ler_etapa(saidas['blocos'], 'limpo', TICKER)
+                pd.testing.assert_frame_equal(ordenar(limpo_em_blocos), ordenar(limpo_completo))
+
+    print("\nDados limpos idênticos nas duas versões.")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,327 @@
+
+#@title Benchmark do runtime leve (início a frio e latência por lote)
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from scripts.modelagem_machine_learning.runtime_leve import carregar_modelo_leve
+
+"""
+Monta modelos exportados sintéticos no formato de `exportar_modelos.py` e mede:
+
+- início a frio: um processo novo que importa o runtime, carrega o modelo e faz uma previsão
+  (tempo total e pico de memória), comparado com `import tensorflow` + `load_model` quando o
+  TensorFlow está instalado;
+- latência por lote da previsão já carregada;
+- o worker do serviço de previsão com o LSTM exportado (com `scalers.npz`): carregar e prever não
+  importa scikit-learn, joblib nem TensorFlow, e a previsão é a do modelo com a normalização min-max;
+  o dataset vem do registro da exportação, e um dataset com outra janela é recusado.
+
+O LSTM tem a arquitetura de `criar_modelo_LSTM.LSTM_model` (LSTM 64 -> LSTM 32 -> Dense 4 por
+timestep); o LSTM v1 a de `modelo_LSTM_v1.criar_modelo` (LSTM 100 -> LSTM 100 -> Dense 64 relu ->
+Dense comprimento_alvo x targets -> Reshape), conferida também com o Keras, passando por
+`exportar_lstm`, quando o TensorFlow está instalado. O XGBoost 4 targets x 100 árvores de profundidade 5, como em `modelagem_dados_XGBoot.py`.
+As previsões são conferidas com implementações de referência (amostra a amostra / linha a linha) e,
+se o XGBoost estiver instalado, com `xgboost.Booster.predict`.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_runtime_leve
+"""
+
+def gerar_lstm_exportado(destino, timesteps=294, n_features=19, semente=0):
+    """Pesos aleatórios com a arquitetura de `LSTM_model`, gravados como `exportar_lstm` grava."""
+    rng = np.random.default_rng(semente)
+    camadas, pesos = [], {}
+    entrada = n_features
+    for indice, unidades in enumerate((64, 32)):
+        camadas.append({'tipo': 'lstm', 'units': unidades, 'return_sequences': True,
+                        'activation': 'tanh', 'recurrent_activation': 'sigmoid'})
+        pesos[f"{indice}_kernel"] = rng.normal(0, 0.2, (entrada, 4 * unidades)).astype(np.float32)
+        pesos[f"{indice}_recurrent_kernel"] = rng.normal(0, 0.2, (unidades, 4 * unidades)).astype(np.float32)
+        pesos[f"{indice}_bias"] = rng.normal(0, 0.1, 4 * unidades).astype(np.float32)
+        entrada = unidades
+    camadas.append({'tipo': 'dense', 'units': 4, 'activation': 'linear'})
+    pesos["2_kernel"] = rng.normal(0, 0.2, (entrada, 4)).astype(np.float32)
+    pesos["2_bias"] = rng.normal(0, 0.1, 4).astype(np.float32)
+
+    os.makedirs(destino, exist_ok=True)
+    np.savez(os.path.join(destino, 'pesos.npz'), **pesos)
+    with open(os.path.join(destino, 'modelo.json'), 'w', encoding='utf-8') as f:
+        json.dump({'tipo': 'lstm', 'input_shape': [timesteps, n_features], 'camadas': camadas, 'pesos': 'pesos.npz'}, f)
+    return destino
+
+
+def gerar_lstm_v1_exportado(destino, comprimento_entrada=96, n_features=27, comprimento_alvo=98, n_targets=4,
+                            semente=0):
+    """Pesos aleatórios com a arquitetura de `modelo_LSTM_v1.criar_modelo`, gravados como `exportar_lstm` grava."""
+    rng = np.random.default_rng(semente)
+    camadas, pesos = [], {}
+    entrada = n_features
+    for indice, (unidades, sequencia) in enumerate(((100, True), (100, False))):
+        camadas.append({'tipo': 'lstm', 'units': unidades, 'return_sequences': sequencia,
+                        'activation': 'tanh', 'recurrent_activation': 'sigmoid'})
+        pesos[f"{indice}_kernel"] = rng.normal(0, 0.1, (entrada, 4 * unidades)).astype(np.float32)
+        pesos[f"{indice}_recurrent_kernel"] = rng.normal(0, 0.1, (unidades, 4 * unidades)).astype(np.float32)
+        pesos[f"{indice}_bias"] = rng.normal(0, 0.1, 4 * unidades).astype(np.float32)
+        entrada = unidades
+    for indice, (unidades, ativacao) in enumerate(((64, 'relu'), (comprimento_alvo * n_targets, 'linear')), start=2):
+        camadas.append({'tipo': 'dense', 'units': unidades, 'activation': ativacao})
+        pesos[f"{indice}_kernel"] = rng.normal(0, 0.2, (entrada, unidades)).astype(np.float32)
+        pesos[f"{indice}_bias"] = rng.normal(0, 0.1, unidades).astype(np.float32)
+        entrada = unidades
+    camadas.append({'tipo': 'reshape', 'target_shape': [comprimento_alvo, n_targets]})
+
+    os.makedirs(destino, exist_ok=True)
+    np.savez(os.path.join(destino, 'pesos.npz'), **pesos)
+    with open(os.path.join(destino, 'modelo.json'), 'w', encoding='utf-8') as f:
+        json.dump({'tipo': 'lstm', 'input_shape': [comprimento_entrada, n_features], 'camadas': camadas,
+                   'pesos': 'pesos.npz'}, f)
+    return destino
+
+
+def gravar_scalers_exportados(destino, caminho_dataset, n_features=19, n_targets=4, semente=0):
+    """`scalers.npz` e manifestos como `exportar_scalers` grava, e o manifesto do dataset de treino."""
+    rng = np.random.default_rng(semente)
+    features = [f"f{i}" for i in range(n_features)]
+    targets = [f"t{i}" for i in range(n_targets)]
+    valores = {}
+    for tipo, n in (('features', n_features), ('targets', n_targets)):
+        minimo, amplitude = rng.normal(20, 5, n), rng.uniform(1, 10, n)
+        valores[f"{tipo}_scale"] = 1 / amplitude
+        valores[f"{tipo}_min"] = -minimo / amplitude
+    np.savez(os.path.join(destino, 'scalers.npz'), **valores)
+
+    with open(os.path.join(destino, 'modelo.json'), encoding='utf-8') as f:
+        manifesto = json.load(f)
+    manifesto.update({'scalers': 'scalers.npz', 'dataset': caminho_dataset, 'features': features, 'targets': targets})
+    with open(os.path.join(destino, 'modelo.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f)
+
+    os.makedirs(caminho_dataset, exist_ok=True)
+    with open(os.path.join(caminho_dataset, 'manifesto.json'), 'w', encoding='utf-8') as f:
+        json.dump({'features': features, 'targets': targets, 'comprimento_entrada': manifesto['input_shape'][0],
+                   'scalers': {'features': 'features.pkl', 'targets': 'targets.pkl'}}, f)
+    return valores
+
+
+def _arvore_aleatoria(rng, n_features, profundidade):
+    esquerda, direita, indices, condicoes, padrao = [], [], [], [], []
+
+    def no(nivel):
+        atual = len(esquerda)
+        for lista in (esquerda, direita, indices, condicoes, padrao):
+            lista.append(0)
+        if nivel == profundidade or (nivel > 1 and rng.random() < 0.15):
+            esquerda[atual] = direita[atual] = -1
+            condicoes[atual] = float(np.float32(rng.normal(0, 0.05)))
+            return atual
+        indices[atual] = int(rng.integers(n_features))
+        condicoes[atual] = float(np.float32(rng.normal(0, 1)))
+        padrao[atual] = int(rng.integers(2))
+        esquerda[atual] = no(nivel + 1)
+        direita[atual] = no(nivel + 1)
+        return atual
+
+    no(0)
+    return {'left_children': esquerda, 'right_children': direita, 'split_indices': indices,
+            'split_conditions': condicoes, 'default_left': padrao}
+
+
+def gerar_xgboost_exportado(destino, targets=('abertura', 'minimo', 'maximo', 'fechamento'),
+                            n_features=19, n_arvores=100, profundidade=5, semente=0):
+    """Boosters sintéticos no formato JSON do XGBoost, gravados como `exportar_xgboost` grava."""
+    rng = np.random.default_rng(semente)
+    os.makedirs(destino, exist_ok=True)
+    arquivos = {}
+    for target in targets:
+        arvores = [_arvore_aleatoria(rng, n_features, profundidade) for _ in range(n_arvores)]
+        booster = {'learner': {
+            'learner_model_param': {'base_score': '[1.2E1]', 'num_feature': str(n_features)},
+            'objective': {'name': 'reg:squarederror'},
+            'gradient_booster': {'name': 'gbtree', 'model': {'trees': arvores}},
+        }}
+        arquivos[target] = f"{target}.json"
+        with open(os.path.join(destino, arquivos[target]), 'w', encoding='utf-8') as f:
+            json.dump(booster, f)
+    with open(os.path.join(destino, 'modelo.json'), 'w', encoding='utf-8') as f:
+        json.dump({'tipo': 'xgboost', 'features': [f"f{i}" for i in range(n_features)],
+                   'targets': list(targets), 'arquivos': arquivos}, f)
+    return destino
+
+
+def lstm_referencia(destino, X):
+    """LSTM amostra a amostra e passo a passo, em float64, com as portas calculadas separadamente."""
+    with open(os.path.join(destino, 'modelo.json'), encoding='utf-8') as f:
+        camadas = json.load(f)['camadas']
+    pesos = dict(np.load(os.path.join(destino, 'pesos.npz')))
+    sigmoide = lambda x: 1 / (1 + np.exp(-x))
+
+    saidas = []
+    for amostra in X.astype(np.float64):
+        x = amostra
+        for indice, camada in enumerate(camadas):
+            if camada['tipo'] == 'dense':
+                x = x @ pesos[f"{indice}_kernel"] + pesos[f"{indice}_bias"]
+                x = np.maximum(x, 0) if camada['activation'] == 'relu' else x
+                continue
+            if camada['tipo'] == 'reshape':
+                x = x.reshape(camada['target_shape'])
+                continue
+            u = camada['units']
+            W, U, b = pesos[f"{indice}_kernel"], pesos[f"{indice}_recurrent_kernel"], pesos[f"{indice}_bias"]
+            h, c, sequencia = np.zeros(u), np.zeros(u), []
+            for passo in x:
+                portas = [passo @ W[:, k * u:(k + 1) * u] + h @ U[:, k * u:(k + 1) * u] + b[k * u:(k + 1) * u] for k in range(4)]
+                c = sigmoide(portas[1]) * c + sigmoide(portas[0]) * np.tanh(portas[2])
+                h = sigmoide(portas[3]) * np.tanh(c)
+                sequencia.append(h)
+            x = np.array(sequencia) if camada['return_sequences'] else h
+        saidas.append(x)
+    return np.array(saidas)
+
+
+def xgboost_referencia(destino, X):
+    """Percurso recursivo linha a linha sobre o JSON de cada booster."""
+    with open(os.path.join(destino, 'modelo.json'), encoding='utf-8') as f:
+        manifesto = json.load(f)
+    colunas = []
+    for target in manifesto['targets']:
+        with open(os.path.join(destino, manifesto['arquivos'][target]), encoding='utf-8') as f:
+            aprendiz = json.load(f)['learner']
+        base = float(aprendiz['learner_model_param']['base_score'].strip('[]'))
+        arvores = aprendiz['gradient_booster']['model']['trees']
+
+        def folha(arvore, linha, no=0):
+            if arvore['left_children'][no] == -1:
+                return arvore['split_conditions'][no]
+            valor = linha[arvore['split_indices'][no]]
+            esquerda = arvore['default_left'][no] if np.isnan(valor) else valor < np.float32(arvore['split_conditions'][no])
+            return folha(arvore, linha, arvore['left_children' if esquerda else 'right_children'][no])
+
+        colunas.append([base + sum(folha(a, linha) for a in arvores) for linha in X.astype(np.float32)])
+    return np.array(colunas).T
+
+
+def inicio_a_frio(codigo):
+    """Tempo (s) e pico de memória (MB) de um processo Python novo executando `codigo`."""
+    medicao = (
+        "import resource, time\n_t = time.perf_counter()\n" + codigo +
+        "\nprint(time.perf_counter() - _t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)"
+    )
+    saida = subprocess.run([sys.executable, '-c', medicao], capture_output=True, text=True, check=True)
+    tempo, memoria = saida.stdout.split()[-2:]
+    return float(tempo), float(memoria)
+
+
+def latencia_ms(modelo, X, repeticoes=5):
+    modelo.predict(X)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        modelo.predict(X)
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def executar_benchmark(lotes=(1, 32, 256)):
+    rng = np.random.default_rng(1)
+    print("\nBenchmark do runtime leve (NumPy) para os modelos exportados\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dir_lstm = gerar_lstm_exportado(os.path.join(tmp, 'LSTM'))
+        dir_xgb = gerar_xgboost_exportado(os.path.join(tmp, 'XGBoost'))
+        lstm, xgb = carregar_modelo_leve(dir_lstm), carregar_modelo_leve(dir_xgb)
+
+        # Conferência com as implementações de referência
+        X_lstm = rng.normal(0, 1, (3, 294, 19)).astype(np.float32)
+        np.testing.assert_allclose(lstm.predict(X_lstm), lstm_referencia(dir_lstm, X_lstm), rtol=1e-4, atol=1e-5)
+        X_xgb = rng.normal(0, 1, (200, 19)).astype(np.float32)
+        X_xgb[rng.random(X_xgb.shape) < 0.05] = np.nan
+        np.testing.assert_allclose(xgb.predict(X_xgb), xgboost_referencia(dir_xgb, X_xgb), rtol=1e-6)
+        if importlib.util.find_spec('xgboost') is not None:
+            import xgboost
+            booster = xgboost.Booster()
+            booster.load_model(os.path.join(dir_xgb, 'abertura.json'))
+            np.testing.assert_allclose(xgb.predict(X_xgb)[:, 0], booster.predict(xgboost.DMatrix(X_xgb)), rtol=1e-5)
+        # Arquitetura de `modelo_LSTM_v1.py` (saída Dense + Reshape)
+        dir_v1 = gerar_lstm_v1_exportado(os.path.join(tmp, 'LSTM_v1'))
+        X_v1 = rng.normal(0, 1, (3, 96, 27)).astype(np.float32)
+        previsao_v1 = carregar_modelo_leve(dir_v1).predict(X_v1)
+        assert previsao_v1.shape == (3, 98, 4)
+        np.testing.assert_allclose(previsao_v1, lstm_referencia(dir_v1, X_v1), rtol=1e-4, atol=1e-5)
+        if importlib.util.find_spec('tensorflow') is not None:
+            from scripts.modelagem_machine_learning.exportar_modelos import exportar_lstm
+            from scripts.modelagem_machine_learning.modelo_LSTM_v1 import criar_modelo
+            modelo_v1 = criar_modelo(96, 27, 98, 4)
+            modelo_v1.save(os.path.join(tmp, 'modelo_LSTM_v1.keras'))
+            exportado = exportar_lstm(os.path.join(tmp, 'modelo_LSTM_v1.keras'), os.path.join(tmp, 'LSTM_v1_keras'))
+            np.testing.assert_allclose(carregar_modelo_leve(exportado).predict(X_v1), modelo_v1.predict(X_v1, verbose=0),
+                                       rtol=1e-4, atol=1e-5)
+        print("Previsões conferidas com as implementações de referência.\n")
+
+        print("Início a frio (processo novo: import + carga + 1 previsão)")
+        carga_leve = (
+            "import numpy as np\nfrom scripts.modelagem_machine_learning.runtime_leve import carregar_modelo_leve\n"
+            "m = carregar_modelo_leve({!r})\nm.predict(np.zeros({}, dtype=np.float32))"
+        )
+        for nome, diretorio, forma in (('LSTM', dir_lstm, (1, 294, 19)), ('XGBoost', dir_xgb, (1, 19))):
+            tempo, memoria = inicio_a_frio(carga_leve.format(diretorio, forma))
+            print(f"  {nome:<8} runtime leve: {tempo * 1000:>8.0f} ms {memoria:>8.0f} MB")
+
+        if importlib.util.find_spec('tensorflow') is not None:
+            tempo, memoria = inicio_a_frio("import tensorflow as tf")
+            print(f"  {'LSTM':<8} import tensorflow (sem carregar o modelo): {tempo * 1000:>8.0f} ms {memoria:>8.0f} MB")
+        else:
+            print("  TensorFlow não instalado: o caminho atual (import tensorflow + load_model) não foi medido.")
+
+        # Worker do serviço com o LSTM exportado: normalização com os min_/scale_ gravados no export
+        caminho_dataset = os.path.join(tmp, 'dataset')
+        valores = gravar_scalers_exportados(dir_lstm, caminho_dataset)
+        worker = (
+            "import sys\nimport numpy as np\n"
+            "from scripts.modelagem_machine_learning.servico_previsao import carregar_modelo_servido\n"
+            f"servido, _ = carregar_modelo_servido({dir_lstm!r})\n"
+            "servido.prever_lote(np.full((1, 294, 19), 20.0))\n"
+            "print(*[m for m in ('sklearn', 'joblib', 'tensorflow') if m in sys.modules] or ['nenhum'])"
+        )
+        tempo, memoria = inicio_a_frio(worker)
+        importados = subprocess.run([sys.executable, '-c', worker], capture_output=True, text=True,
+                                    check=True).stdout.split()[-1]
+        assert importados == 'nenhum', importados
+        print(f"  {'serviço':<8} LSTM exportado + scalers: {tempo * 1000:>5.0f} ms {memoria:>8.0f} MB "
+              f"(sem scikit-learn/joblib/TensorFlow)")
+
+        from scripts.modelagem_machine_learning.servico_previsao import carregar_modelo_servido
+        servido, _ = carregar_modelo_servido(dir_lstm, caminho_dataset)
+        janelas = rng.normal(20, 5, (3, 294, 19))
+        esperado = lstm_referencia(dir_lstm, janelas * valores['features_scale'] + valores['features_min'])
+        esperado = (esperado - valores['targets_min']) / valores['targets_scale']
+        np.testing.assert_allclose(servido.prever_lote(janelas), esperado, rtol=1e-4, atol=1e-3)
+
+        # Dataset com outra janela (ex.: o global, de 16 candles): erro claro em vez de falhar na previsão
+        with open(os.path.join(caminho_dataset, 'manifesto.json'), encoding='utf-8') as f:
+            outro = json.load(f)
+        outro_dataset = os.path.join(tmp, 'outro_dataset')
+        os.makedirs(outro_dataset)
+        with open(os.path.join(outro_dataset, 'manifesto.json'), 'w', encoding='utf-8') as f:
+            json.dump({**outro, 'comprimento_entrada': 16}, f)
+        try:
+            carregar_modelo_servido(dir_lstm, outro_dataset)
+            raise AssertionError("Modelo servido com um dataset de outra janela.")
+        except ValueError as erro:
+            assert 'não correspondem' in str(erro)
+
+        print(f"\n{'lote':>6} {'LSTM ms':>10} {'XGBoost ms':>12}")
+        for lote in lotes:
+            X_l = rng.normal(0, 1, (lote, 294, 19)).astype(np.float32)
+            X_x = rng.normal(0, 1, (lote, 19)).astype(np.float32)
+            print(f"{lote:>6} {latencia_ms(lstm, X_l):>10.2f} {latencia_ms(xgb, X_x):>12.2f}")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
@@ -0,0 +1,86 @@
+
+#@title Benchmark da montagem de amostras do LSTM global (filtro por dia x índice de deslocamentos)
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.benchmarks.dados_sinteticos import gerar_dados_transformados
+from scripts.modelagem_machine_learning.sequencias import (
+    amostras_proximo_dia, indice_dias, lotes_proximo_dia, memoria_mb, posicoes_proximo_dia
+)
+
+"""
+Compara o laço anterior de `preparar_dados_lstm_global` (para cada par de dias, filtra o DataFrame
+com `df_seq[df_seq['data'] == dia]` e `df_targets[df_targets['data'] == proximo]`) com a montagem
+por índice de deslocamentos (uma indexação vetorizada) e com a geração em lotes. As features são
+usadas sem normalização: o custo medido é só o da montagem das amostras.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_sequencias_global
+"""
+
+FEATURES = [
+    'abertura', 'minimo', 'maximo', 'fechamento', 'volume', 'SMA_10', 'EMA_10', 'OBV', 'retorno',
+    'volatilidade', 'MACD', 'Signal_Line', 'rsi', 'ADX', 'BB_MA20', 'BB_STD20', 'BB_upper', 'BB_lower',
+    '%K', '%D', 'CCI', 'ATR', 'hora_num', 'minuto'
+]
+TARGETS = ['minimo_dia', 'maximo_dia', 'fechamento_dia', 'volume_dia']
+
+
+def amostras_anterior(df, X_scaled, y_scaled, janela):
+    """Laço anterior, mantido aqui apenas como referência de tempo."""
+    df_seq = pd.DataFrame(X_scaled, columns=FEATURES)
+    df_seq['data'] = df['data'].values
+    df_targets = pd.DataFrame(y_scaled, columns=TARGETS)
+    df_targets['data'] = df['data'].values
+
+    X, y = [], []
+    dias_unicos = df_seq['data'].unique()
+    for i in range(len(dias_unicos) - 1):
+        dados_dia = df_seq[df_seq['data'] == dias_unicos[i]].drop(columns='data')
+        alvo_proximo = df_targets[df_targets['data'] == dias_unicos[i + 1]][TARGETS]
+        if len(dados_dia) >= janela and not alvo_proximo.empty:
+            X.append(dados_dia.iloc[-janela:].values)
+            y.append(alvo_proximo.iloc[0].values)
+    return np.array(X), np.array(y)
+
+
+def executar_benchmark(n_dias=1000, janela=16, tamanho_lote=128):
+    df = gerar_dados_transformados(n_dias=n_dias).sort_values(['data', 'hora']).reset_index(drop=True)
+    X_scaled = df[FEATURES].to_numpy(dtype=float)
+    y_scaled = df[TARGETS].to_numpy(dtype=float)
+    print(f"\nBenchmark de amostras do LSTM global: {len(df):,} candles, {df['data'].nunique()} dias\n")
+
+    inicio = time.perf_counter()
+    X_ant, y_ant = amostras_anterior(df, X_scaled, y_scaled, janela)
+    tempo_anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    _, _, inicios, fins = indice_dias(df['data'].to_numpy())
+    fins_entrada, posicoes_alvo = posicoes_proximo_dia(inicios, fins, janela)
+    X, y = amostras_proximo_dia(X_scaled, y_scaled, fins_entrada, posicoes_alvo, janela)
+    tempo_novo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    maior_lote, n_lotes = 0.0, 0
+    for X_lote, y_lote in lotes_proximo_dia(X_scaled, y_scaled, fins_entrada, posicoes_alvo, janela, tamanho_lote):
+        maior_lote = max(maior_lote, memoria_mb(X_lote, y_lote))
+        n_lotes += 1
+    tempo_lotes = time.perf_counter() - inicio
+
+    print(f"filtro por dia (anterior): {tempo_anterior:8.3f} s")
+    print(f"índice de deslocamentos:   {tempo_novo:8.3f} s ({tempo_anterior / tempo_novo:.0f}x) "
+          f"| X {X.shape}: {memoria_mb(X):.1f} MB")
+    rotulo = f"em lotes de {tamanho_lote}:"
+    print(f"{rotulo:<26} {tempo_lotes:8.3f} s | {n_lotes} lotes, "
+          f"no máximo {maior_lote:.2f} MB por lote")
+
+    np.testing.assert_array_equal(X, X_ant)
+    np.testing.assert_array_equal(y, y_ant)
+    print("\nAmostras idênticas à implementação anterior.")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
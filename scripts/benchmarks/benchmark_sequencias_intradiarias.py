@@ -0,0 +1,87 @@
+
+#@title Benchmark da montagem de sequências do LSTM intradiário (filtro por dia x janelas deslizantes)
+
+import time
+
+import numpy as np
+
+from scripts.benchmarks.dados_sinteticos import gerar_dados_transformados
+from scripts.modelagem_machine_learning.sequencias import memoria_mb, sequencias_intradiarias
+
+"""
+Compara o laço anterior de `preparar_dados_lstm_intradiario` (para cada dia alvo, filtra o DataFrame
+inteiro com `df[df["data"] == dia]` para cada um dos `dias_entrada` dias e empilha cópias) com
+`sequencias_intradiarias` (cubo por dia montado uma vez + `sliding_window_view`), sobre um ano de
+candles de 5 minutos, e confere que X, y e as datas são idênticos.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_sequencias_intradiarias
+"""
+
+COLUNAS_FEATURES = [
+    'abertura', 'minimo', 'maximo', 'fechamento', 'volume',
+    'SMA_10', 'EMA_10', 'OBV', 'retorno', 'volatilidade',
+    'MACD', 'Signal_Line', 'rsi', 'ADX', 'BB_MA20', 'BB_STD20',
+    'BB_upper', 'BB_lower', '%K', '%D', 'CCI', 'ATR'
+]
+COLUNAS_TARGETS = ['minimo_dia', 'maximo_dia', 'fechamento_dia', 'volume_dia']
+
+
+def sequencias_anterior(df, dias_entrada, n_pontos_dia):
+    """Laço anterior, mantido aqui apenas como referência de tempo."""
+    dias_unicos = sorted(df["data"].unique())
+    X, y, datas_validas = [], [], []
+    for i in range(dias_entrada, len(dias_unicos)):
+        dias_passados = dias_unicos[i - dias_entrada:i]
+        dia_target = dias_unicos[i]
+        entradas = []
+        sequencia_valida = True
+        for dia in dias_passados:
+            dados_dia = df[df["data"] == dia][COLUNAS_FEATURES].values
+            if len(dados_dia) != n_pontos_dia:
+                sequencia_valida = False
+                break
+            entradas.append(dados_dia)
+        saida = df[df["data"] == dia_target][COLUNAS_TARGETS].values
+        if len(saida) != n_pontos_dia:
+            sequencia_valida = False
+        if sequencia_valida:
+            X.append(np.vstack(entradas))
+            y.append(saida)
+            datas_validas.append(dia_target)
+    return np.array(X), np.array(y), datas_validas
+
+
+def executar_benchmark(n_dias=252, dias_entrada=3, pontos_por_dia=98):
+    df = gerar_dados_transformados(n_dias=n_dias, pontos_por_dia=pontos_por_dia)
+    df["data"] = df["data"].astype(str)
+    # O primeiro dia perde candles no dropna dos indicadores e um dia do meio fica incompleto
+    df = df.drop(df.index[df["data"] == sorted(df["data"].unique())[n_dias // 2]][:5])
+    print(f"\nBenchmark de sequências intradiárias: {len(df):,} candles, {df['data'].nunique()} dias\n")
+
+    inicio = time.perf_counter()
+    X_ant, y_ant, datas_ant = sequencias_anterior(df, dias_entrada, pontos_por_dia)
+    tempo_anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    X_janelas, y_janelas, dias_alvo, validas = sequencias_intradiarias(
+        df, COLUNAS_FEATURES, COLUNAS_TARGETS, dias_entrada, pontos_por_dia
+    )
+    tempo_views = time.perf_counter() - inicio
+    X, y = X_janelas[validas], y_janelas[validas]
+    tempo_novo = time.perf_counter() - inicio
+
+    print(f"filtro por dia (anterior):   {tempo_anterior:8.3f} s")
+    print(f"janelas (views):             {tempo_views:8.3f} s")
+    print(f"janelas + cópia das válidas: {tempo_novo:8.3f} s ({tempo_anterior / tempo_novo:.0f}x)")
+    print(f"\nX {X.shape}: {memoria_mb(X):.1f} MB materializados; "
+          f"janelas compartilham a memória do cubo: {np.shares_memory(X_janelas, X_janelas[1:])}")
+
+    np.testing.assert_array_equal(X, X_ant)
+    np.testing.assert_array_equal(y, y_ant)
+    assert dias_alvo[validas].tolist() == datas_ant
+    print(f"Amostras idênticas à implementação anterior ({len(datas_ant)} válidas).")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
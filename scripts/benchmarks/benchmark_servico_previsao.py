@@ -0,0 +1,156 @@
+
+#@title Teste de carga do serviço de previsão (requisições/s e latência de cauda)
+
+import http.client
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+
+from scripts.benchmarks.benchmark_sequencias_intradiarias import COLUNAS_FEATURES as FEATURES
+from scripts.benchmarks.benchmark_sequencias_intradiarias import COLUNAS_TARGETS as TARGETS
+from scripts.benchmarks.dados_sinteticos import gerar_dados_transformados
+from scripts.modelagem_machine_learning.servico_previsao import (
+    FonteJanelas, LoteadorPrevisoes, ModeloServido, criar_servidor
+)
+from scripts.pipeline.armazenamento import TICKER_PADRAO, salvar_etapa
+
+"""
+`testar_carga` dispara requisições `POST /prever` de `concorrencia` clientes (cada um com conexão
+persistente) contra um servidor já em execução e reporta requisições/s e latências p50/p95/p99.
+
+Sem argumentos, o benchmark sobe o serviço em processo com dados transformados sintéticos (Parquet) e um
+modelo sintético com custo fixo por chamada (como o de uma chamada ao TensorFlow) e compara o serviço
+sem lotes (`tamanho_max_lote=1`) com lotes dinâmicos, para várias concorrências. Confere também que a
+resposta HTTP é a previsão calculada diretamente e volta à escala original.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.benchmarks.benchmark_servico_previsao
+"""
+
+class EscalaMinMax:
+    """Normalização mínimo-máximo por coluna (transform/inverse_transform como os scalers do projeto)."""
+
+    def __init__(self, valores):
+        valores = np.asarray(valores, dtype=np.float64)
+        self.minimo = valores.min(axis=0)
+        self.amplitude = np.where(np.ptp(valores, axis=0) > 0, np.ptp(valores, axis=0), 1.0)
+
+    def transform(self, df):
+        return (np.asarray(df, dtype=np.float64) - self.minimo) / self.amplitude
+
+    def inverse_transform(self, df):
+        return np.asarray(df, dtype=np.float64) * self.amplitude + self.minimo
+
+
+class ModeloSintetico:
+    """Média da janela projetada nos alvos, com `custo_ms` fixo por chamada (independe do tamanho do lote)."""
+
+    def __init__(self, n_features, n_targets, custo_ms=4.0, semente=0):
+        self.pesos = np.random.default_rng(semente).uniform(0, 1 / n_features, (n_features, n_targets))
+        self.custo = custo_ms / 1000
+        self.chamadas = 0
+
+    def __call__(self, X):
+        self.chamadas += 1
+        time.sleep(self.custo)
+        return X.mean(axis=1) @ self.pesos
+
+
+def testar_carga(url, corpo, concorrencia=8, n_requisicoes=800):
+    """
+    Retorna:
+    dict: requisições/s, latências (ms) p50/p95/p99/máxima, tamanho médio de lote e erros.
+    """
+    destino = urlparse(url)
+    dados = json.dumps(corpo).encode('utf-8')
+    latencias, lotes, erros = [], [], []
+    trava = threading.Lock()
+    por_cliente = [n_requisicoes // concorrencia + (i < n_requisicoes % concorrencia) for i in range(concorrencia)]
+
+    def cliente(n):
+        conexao = http.client.HTTPConnection(destino.hostname, destino.port, timeout=30)
+        for _ in range(n):
+            inicio = time.perf_counter()
+            conexao.request('POST', destino.path or '/prever', dados, {'Content-Type': 'application/json'})
+            resposta = conexao.getresponse()
+            conteudo = json.loads(resposta.read())
+            duracao = time.perf_counter() - inicio
+            with trava:
+                if resposta.status == 200:
+                    latencias.append(duracao)
+                    lotes.append(conteudo['lote'])
+                else:
+                    erros.append(conteudo.get('erro'))
+        conexao.close()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as executor:
+        list(executor.map(cliente, por_cliente))
+    duracao = time.perf_counter() - inicio
+
+    latencias_ms = np.array(latencias) * 1000
+    return {
+        'req_s': len(latencias) / duracao,
+        'p50': np.percentile(latencias_ms, 50),
+        'p95': np.percentile(latencias_ms, 95),
+        'p99': np.percentile(latencias_ms, 99),
+        'max': latencias_ms.max(),
+        'lote_medio': float(np.mean(lotes)),
+        'erros': len(erros),
+    }
+
+
+def executar_benchmark(concorrencias=(1, 8, 32), n_requisicoes=800, janela=16, custo_ms=4.0):
+    print(f"\nTeste de carga do serviço de previsão (modelo sintético com {custo_ms:.0f} ms por chamada)\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho_dados = f"{tmp}/dados_transformados"
+        df = gerar_dados_transformados(n_dias=60)
+        salvar_etapa(df, caminho_dados, 'transformado', TICKER_PADRAO)
+
+        escala_features, escala_targets = EscalaMinMax(df[FEATURES]), EscalaMinMax(df[TARGETS])
+        fonte = FonteJanelas(caminho_dados, FEATURES, janela, dias=1)
+
+        print(f"{'lote máx.':>9} {'clientes':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'máx. ms':>8} {'lote médio':>11}")
+        for tamanho_max_lote in (1, 32):
+            for concorrencia in concorrencias:
+                modelo = ModeloServido(
+                    ModeloSintetico(len(FEATURES), len(TARGETS), custo_ms),
+                    escala_features, escala_targets, FEATURES, TARGETS
+                )
+                servidor = criar_servidor(LoteadorPrevisoes(modelo, tamanho_max_lote), fonte, porta=0)
+                threading.Thread(target=servidor.serve_forever, daemon=True).start()
+                url = f"http://127.0.0.1:{servidor.server_address[1]}/prever"
+
+                r = testar_carga(url, {'ticker': TICKER_PADRAO}, concorrencia, n_requisicoes)
+                servidor.shutdown()
+                servidor.server_close()
+                assert r['erros'] == 0
+                print(f"{tamanho_max_lote:>9} {concorrencia:>9} {r['req_s']:>9,.0f} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+                      f"{r['p99']:>8.1f} {r['max']:>8.1f} {r['lote_medio']:>11.1f}")
+
+        # A resposta é a previsão da última janela do ticker, de volta à escala original
+        servidor = criar_servidor(LoteadorPrevisoes(modelo), fonte, porta=0)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        conexao = http.client.HTTPConnection('127.0.0.1', servidor.server_address[1])
+        conexao.request('POST', '/prever', json.dumps({'ticker': TICKER_PADRAO}))
+        resposta = json.loads(conexao.getresponse().read())
+        servidor.shutdown()
+        servidor.server_close()
+
+        ultimo_dia = df[df['data'] == df['data'].max()]
+        X = escala_features.transform(ultimo_dia[FEATURES].to_numpy()[-janela:])[None].astype(np.float32)
+        esperado = escala_targets.inverse_transform(modelo.prever(X))[0]
+        np.testing.assert_allclose([resposta['previsao'][coluna] for coluna in TARGETS], esperado, rtol=1e-9)
+
+    print("\nResposta HTTP idêntica à previsão direta (na escala original dos alvos).")
+
+
+if __name__ == "__main__":
+    executar_benchmark()
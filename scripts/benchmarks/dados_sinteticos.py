@@ -0,0 +1,62 @@
+
+#@title Geração de dados sintéticos para os benchmarks
+
+import numpy as np
+import pandas as pd
+
+"""
+Gera candles intradiários sintéticos (passeio aleatório) no mesmo formato das etapas do pipeline,
+para que os benchmarks rodem sem acesso à rede e sem depender dos CSVs do projeto.
+"""
+
+def gerar_candles_limpos(n_dias=20, pontos_por_dia=98, data_inicio="2024-01-02", semente=42):
+    """Candles de 5 minutos a partir das 10:00 em dias úteis, no formato da etapa `limpo`."""
+    rng = np.random.default_rng(semente)
+    dias = pd.bdate_range(data_inicio, periods=n_dias)
+    horas = pd.timedelta_range("10:00:00", periods=pontos_por_dia, freq="5min")
+
+    timestamps = (dias.values[:, None] + horas.values[None, :]).ravel()
+    n = len(timestamps)
+
+    fechamento = 12 + np.cumsum(rng.normal(0, 0.02, n))
+    abertura = np.concatenate([[fechamento[0]], fechamento[:-1]])
+    maximo = np.maximum(abertura, fechamento) + rng.uniform(0, 0.03, n)
+    minimo = np.minimum(abertura, fechamento) - rng.uniform(0, 0.03, n)
+    volume = rng.integers(0, 2_000_000, n)
+
+    ts = pd.DatetimeIndex(timestamps)
+    return pd.DataFrame({
+        'data': ts.normalize(),
+        'hora': ts.strftime('%H:%M:%S'),
+        'abertura': abertura.round(2),
+        'minimo': minimo.round(2),
+        'maximo': maximo.round(2),
+        'fechamento': fechamento.round(2),
+        'volume': volume,
+        'timestamp': ts.tz_localize('America/Sao_Paulo'),
+    })
+
+
+def gerar_dados_transformados(n_dias=20, pontos_por_dia=98, semente=42):
+    """Executa as etapas de transformação sobre candles sintéticos, no formato de `dados_transformados.csv`."""
+    from scripts.pipeline.transformacao_dados import (
+        calcular_indicadores, adicionar_features_temporais,
+        adicionar_features_diarias, calcular_volatilidade
+    )
+
+    df = gerar_candles_limpos(n_dias, pontos_por_dia, semente=semente)
+    df = calcular_indicadores(df)
+    df = adicionar_features_temporais(df)
+    df = adicionar_features_diarias(df)
+    df = calcular_volatilidade(df)
+    return df.dropna(subset=['fechamento', 'retorno', 'SMA_10', 'EMA_10', 'MACD', 'rsi']).reset_index(drop=True)
+
+
+def gerar_candles_brutos(n_dias=20, pontos_por_dia=98, data_inicio="2024-01-02", semente=42):
+    """Candles sintéticos no formato da etapa `bruto` (índice `Datetime` com fuso e colunas do yfinance)."""
+    df = gerar_candles_limpos(n_dias, pontos_por_dia, data_inicio, semente)
+    df = df.set_index('timestamp').rename(columns={
+        'fechamento': 'Close', 'maximo': 'High', 'minimo': 'Low', 'abertura': 'Open', 'volume': 'Volume'
+    })
+    df.index.name = 'Datetime'
+    return df[['Close', 'High', 'Low', 'Open', 'Volume']]
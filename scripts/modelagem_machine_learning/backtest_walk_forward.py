@@ -0,0 +1,278 @@
+
+# @title Backtest walk-forward (janelas de treino/teste por dia, folds em paralelo)
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.modelagem_machine_learning.dataset_mmap import abrir_dataset, salvar_dataset
+from scripts.modelagem_machine_learning.sequencias import indice_dias
+
+"""
+Avalia um modelo ao longo do tempo sobre `dados_transformados`, em vez de um único corte treino/teste:
+
+1. As amostras são montadas uma vez a partir das features já calculadas (`amostras_proximo_dia`:
+   último candle do dia -> agregados do dia seguinte; `amostras_candles`: candle -> candle
+   `horizonte` passos à frente no mesmo dia) e gravadas como dataset mapeável em memória
+   (`dataset_mmap.py`), lido sem cópia por todos os processos.
+2. Os dias de teste são cortados em folds de `retreinar_a_cada` dias: o modelo de cada fold é treinado
+   com os dias anteriores ao fold (todos, ou só os últimos `janela_treino`) e usado em todos os dias do
+   fold, ou seja, é retreinado a cada `retreinar_a_cada` dias.
+3. Os folds são independentes e rodam em paralelo (`ProcessPoolExecutor`).
+4. Por dia e target: MAE, R² (entre as amostras do dia) e o PnL de uma regra simples — comprar se a
+   previsão está acima do preço de referência (fechamento do candle de entrada), vender se abaixo, e
+   zerar no valor realizado do target. Só targets de fechamento (`TARGETS_COM_PNL`) têm PnL e taxa
+   de acerto: o fechamento do candle/dia alvo é um preço em que dá para zerar a posição, enquanto a
+   mínima e a máxima só são conhecidas depois (zerar nelas superestima o PnL), e volume não é preço.
+
+Modelos: 'linear' (ridge em NumPy) ou 'xgboost' (um booster por target, `modelo_XGBoost.py`), ou qualquer classe com
+`fit(X, Y)` / `predict(X)` que possa ser enviada a outros processos (definida em nível de módulo).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.modelagem_machine_learning.backtest_walk_forward
+"""
+
+NOME_AMOSTRAS = 'backtest_amostras'
+
+# Targets cujo valor realizado é um preço de saída executável (fechamento do candle ou do dia alvo)
+TARGETS_COM_PNL = ['fechamento', 'fechamento_dia']
+
+
+class RegressaoLinear:
+    """Ridge multi-saída com features padronizadas (média/desvio do treino)."""
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def fit(self, X, Y):
+        X, Y = np.asarray(X, dtype=np.float64), np.asarray(Y, dtype=np.float64)
+        self.media, self.desvio = X.mean(axis=0), X.std(axis=0)
+        self.desvio[self.desvio == 0] = 1.0
+        self.media_y = Y.mean(axis=0)
+        Z = (X - self.media) / self.desvio
+        self.coeficientes = np.linalg.solve(Z.T @ Z + self.alpha * np.eye(Z.shape[1]), Z.T @ (Y - self.media_y))
+        return self
+
+    def predict(self, X):
+        Z = (np.asarray(X, dtype=np.float64) - self.media) / self.desvio
+        return Z @ self.coeficientes + self.media_y
+
+
+class XGBoostPorTarget:
+    """Um booster por coluna de Y, treinados em paralelo sobre a mesma quantização (`modelo_XGBoost.py`)."""
+
+    def __init__(self, parametros=None, num_rodadas=100, nthread=1, max_bin=256):
+        self.parametros = parametros
+        self.num_rodadas = num_rodadas
+        self.nthread = nthread
+        self.max_bin = max_bin
+
+    def fit(self, X, Y):
+        from scripts.modelagem_machine_learning.modelo_XGBoost import treinar_xgboost
+        Y = np.asarray(Y)
+        self.targets = [str(i) for i in range(Y.shape[1])]
+        self.boosters, _ = treinar_xgboost(
+            np.asarray(X, dtype=np.float32), Y, self.targets, self.parametros, self.num_rodadas,
+            self.nthread, self.max_bin, verbose=False
+        )
+        return self
+
+    def predict(self, X):
+        from scripts.modelagem_machine_learning.modelo_XGBoost import prever_xgboost
+        return prever_xgboost(self.boosters, np.asarray(X, dtype=np.float32), self.targets)
+
+
+MODELOS = {'linear': RegressaoLinear, 'xgboost': XGBoostPorTarget}
+
+
+def _ordenar_por_dia(df):
+    df = df.sort_values(['data', 'hora']).reset_index(drop=True)
+    _, dias, inicios, fins = indice_dias(df['data'].to_numpy())
+    return df, dias, inicios, fins
+
+
+def amostras_proximo_dia(df, features, targets, referencia='fechamento'):
+    """Uma amostra por dia: features do último candle do dia -> targets do dia seguinte (agregados diários)."""
+    df, dias, inicios, fins = _ordenar_por_dia(df)
+    entradas, alvos = fins[:-1] - 1, inicios[1:]
+    return {
+        'X': df[features].to_numpy(dtype=np.float64)[entradas],
+        'Y': df[targets].to_numpy(dtype=np.float64)[alvos],
+        'referencia': df[referencia].to_numpy(dtype=np.float64)[entradas],
+        'dia': np.arange(1, len(dias), dtype=np.int64),
+    }, dias
+
+
+def amostras_candles(df, features, targets, horizonte=1, referencia='fechamento'):
+    """Uma amostra por candle: features do candle -> targets `horizonte` candles depois, no mesmo dia."""
+    df, dias, inicios, fins = _ordenar_por_dia(df)
+    contagens = fins - inicios
+    dia = np.repeat(np.arange(len(dias), dtype=np.int64), contagens)
+    entradas = np.flatnonzero(np.arange(len(df)) + horizonte < np.repeat(fins, contagens))
+    return {
+        'X': df[features].to_numpy(dtype=np.float64)[entradas],
+        'Y': df[targets].to_numpy(dtype=np.float64)[entradas + horizonte],
+        'referencia': df[referencia].to_numpy(dtype=np.float64)[entradas],
+        'dia': dia[entradas],
+    }, dias
+
+
+def planejar_folds(n_dias, dias_teste, retreinar_a_cada=5, janela_treino=None):
+    """
+    Folds (primeiro dia de treino, primeiro dia de teste, fim do teste) sobre os índices dos dias,
+    cobrindo os últimos `dias_teste` dias em blocos de `retreinar_a_cada`.
+    """
+    inicio_teste = n_dias - dias_teste
+    if inicio_teste < 1:
+        raise ValueError(f"{dias_teste} dias de teste deixam {inicio_teste} dias para o primeiro treino.")
+    folds = []
+    for inicio in range(inicio_teste, n_dias, retreinar_a_cada):
+        inicio_treino = 0 if janela_treino is None else max(0, inicio - janela_treino)
+        folds.append((inicio_treino, inicio, min(inicio + retreinar_a_cada, n_dias)))
+    return folds
+
+
+def _instanciar(modelo, parametros_modelo):
+    classe = MODELOS[modelo] if isinstance(modelo, str) else modelo
+    return classe(**(parametros_modelo or {}))
+
+
+def _executar_fold(caminho, modelo, parametros_modelo, fold):
+    """Treina com os dias anteriores ao fold e prevê os dias do fold (roda em outro processo)."""
+    arrays, _ = abrir_dataset(caminho)
+    dia = arrays['dia']
+    inicio_treino, inicio_teste, fim_teste = np.searchsorted(dia, fold)
+    if inicio_teste == inicio_treino:
+        raise ValueError(f"Fold {fold} sem amostras de treino.")
+
+    instancia = _instanciar(modelo, parametros_modelo)
+    instancia.fit(arrays['X'][inicio_treino:inicio_teste], arrays['Y'][inicio_treino:inicio_teste])
+    return inicio_teste, fim_teste, np.asarray(instancia.predict(arrays['X'][inicio_teste:fim_teste]))
+
+
+def metricas_por_dia(Y, P, referencia, dia, datas, targets):
+    """MAE, R² e PnL por dia de teste e target (formato longo; PnL só nos `TARGETS_COM_PNL`)."""
+    erro = P - Y
+    tabela = []
+    for i, target in enumerate(targets):
+        partes = pd.DataFrame({'dia': dia, 'y': Y[:, i], 'erro_abs': np.abs(erro[:, i]), 'erro2': erro[:, i] ** 2})
+        if target in TARGETS_COM_PNL:
+            partes['pnl'] = np.sign(P[:, i] - referencia) * (Y[:, i] - referencia)
+            partes['acerto'] = np.sign(P[:, i] - referencia) == np.sign(Y[:, i] - referencia)
+        partes['desvio2'] = (partes['y'] - partes.groupby('dia')['y'].transform('mean')) ** 2
+
+        grupos = partes.groupby('dia')
+        diario = pd.DataFrame({
+            'n_amostras': grupos.size(),
+            'mae': grupos['erro_abs'].mean(),
+            'r2': 1 - grupos['erro2'].sum() / grupos['desvio2'].sum().replace(0, np.nan),
+            'pnl': grupos['pnl'].sum() if 'pnl' in partes else np.nan,
+            'acerto': grupos['acerto'].mean() if 'acerto' in partes else np.nan,
+        })
+        diario.loc[diario['n_amostras'] < 2, 'r2'] = np.nan
+        diario.insert(0, 'target', target)
+        diario.insert(0, 'data', [str(datas[d])[:10] for d in diario.index])
+        tabela.append(diario.reset_index(drop=True))
+    return pd.concat(tabela, ignore_index=True)
+
+
+def resumir(Y, P, referencia, targets):
+    """MAE, R² e PnL de todo o período de teste, por target (PnL só nos `TARGETS_COM_PNL`)."""
+    linhas = []
+    for i, target in enumerate(targets):
+        sse = ((P[:, i] - Y[:, i]) ** 2).sum()
+        sst = ((Y[:, i] - Y[:, i].mean()) ** 2).sum()
+        preco = target in TARGETS_COM_PNL
+        posicao = np.sign(P[:, i] - referencia)
+        linhas.append({
+            'target': target,
+            'mae': np.abs(P[:, i] - Y[:, i]).mean(),
+            'r2': 1 - sse / sst if sst > 0 else np.nan,
+            'pnl': (posicao * (Y[:, i] - referencia)).sum() if preco else np.nan,
+            'acerto': (posicao == np.sign(Y[:, i] - referencia)).mean() if preco else np.nan,
+        })
+    return pd.DataFrame(linhas)
+
+
+def executar_backtest(df, features, targets, modelo='linear', parametros_modelo=None, amostragem='proximo_dia',
+                      dias_teste=60, retreinar_a_cada=5, janela_treino=None, max_processos=None,
+                      dir_datasets=None, horizonte=1):
+    """
+    Parâmetros:
+    df (pd.DataFrame): Dados transformados (com `data`, `hora`, features e targets).
+    modelo (str | type): 'linear', 'xgboost' ou uma classe com fit/predict.
+    amostragem (str): 'proximo_dia' ou 'candles' (ver `amostras_proximo_dia` / `amostras_candles`).
+    dias_teste (int): Quantidade de dias finais avaliados.
+    retreinar_a_cada (int): Dias de teste por modelo treinado.
+    janela_treino (int): Dias de treino por fold (None = todos os anteriores).
+    max_processos (int): Processos em paralelo (1 executa os folds no processo atual).
+    dir_datasets (str): Onde gravar as amostras mapeáveis (None = diretório temporário).
+
+    Retorna:
+    (pd.DataFrame, pd.DataFrame, dict): métricas por dia e target, resumo por target e previsões
+    ({'P', 'Y', 'referencia', 'dia', 'datas'} do período de teste).
+    """
+    if amostragem == 'proximo_dia':
+        amostras, datas = amostras_proximo_dia(df, features, targets)
+    elif amostragem == 'candles':
+        amostras, datas = amostras_candles(df, features, targets, horizonte)
+    else:
+        raise ValueError(f"Amostragem desconhecida: {amostragem}")
+
+    folds = planejar_folds(len(datas), dias_teste, retreinar_a_cada, janela_treino)
+    print(f"[Info] {len(amostras['X'])} amostras, {len(datas)} dias, {len(folds)} folds "
+          f"(retreino a cada {retreinar_a_cada} dias, {dias_teste} dias de teste)")
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho = salvar_dataset(
+            amostras, NOME_AMOSTRAS, dir_datasets or temporario, dtype=np.float64,
+            features=list(features), targets=list(targets), amostragem=amostragem,
+            datas=[str(d)[:10] for d in datas]
+        )
+
+        if max_processos == 1:
+            resultados = [_executar_fold(caminho, modelo, parametros_modelo, fold) for fold in folds]
+        else:
+            with ProcessPoolExecutor(max_processos) as executor:
+                resultados = list(executor.map(
+                    _executar_fold, *zip(*[(caminho, modelo, parametros_modelo, fold) for fold in folds])
+                ))
+
+    inicio_teste = resultados[0][0]
+    P = np.concatenate([previsoes for _, _, previsoes in resultados])
+    Y = amostras['Y'][inicio_teste:]
+    referencia = amostras['referencia'][inicio_teste:]
+    dia = amostras['dia'][inicio_teste:]
+
+    por_dia = metricas_por_dia(Y, P, referencia, dia, datas, targets)
+    resumo = resumir(Y, P, referencia, targets)
+    return por_dia, resumo, {'P': P, 'Y': Y, 'referencia': referencia, 'dia': dia, 'datas': datas}
+
+
+if __name__ == "__main__":
+    from scripts.pipeline.armazenamento import ler_etapa
+
+    # Mesmas features do modelo XGBoost; alvos do dia seguinte como no LSTM global
+    features = [
+        "abertura", "minimo", "maximo", "fechamento", "SMA_10", "EMA_10",
+        "rsi", "MACD", "Signal_Line", "OBV", "fechamento_lag1", "fechamento_lag2", "fechamento_lag3",
+        "retorno_lag1", "retorno_lag2", "retorno_lag3", "volume_lag1", "volume_lag2", "volume_lag3"
+    ]
+    targets = ['minimo_dia', 'maximo_dia', 'fechamento_dia', 'volume_dia']
+
+    df_transformado = ler_etapa(
+        '/content/Piloto_Day_Trade/data/transformed/dados_transformados',
+        'transformado',
+        colunas=['data', 'hora'] + features + targets
+    ).dropna(subset=features + targets)
+
+    por_dia, resumo, _ = executar_backtest(df_transformado, features, targets, modelo='xgboost', dias_teste=20)
+    print(resumo.to_string(index=False))
+
+    caminho_relatorio = '/content/Piloto_Day_Trade/reports/backtest_walk_forward.csv'
+    os.makedirs(os.path.dirname(caminho_relatorio), exist_ok=True)
+    por_dia.to_csv(caminho_relatorio, index=False)
+    print(f"[Info] Métricas por dia salvas em: {caminho_relatorio}")
@@ -0,0 +1,365 @@
+
+# @title Busca de hiperparâmetros em paralelo (successive halving, parada antecipada, log de trials)
+
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from scripts.modelagem_machine_learning.dataset_mmap import abrir_dataset
+
+"""
+Ajuste de hiperparâmetros dentro de um orçamento fixo de CPU, em vez de treinar cada configuração até
+o fim:
+
+- as configurações são sorteadas do espaço de busca (`amostrar_configuracoes`);
+- successive halving: todas começam com `orcamento_min` passos (épocas no LSTM, rodadas no XGBoost);
+  a cada rodada só a melhor fração 1/`eta` continua, com `eta` vezes mais passos. Os trials são
+  retomados do checkpoint da rodada anterior, então os passos já feitos não são refeitos;
+- cada trial usa parada antecipada na validação (`paciencia`). Um trial parado não volta a treinar:
+  o objetivo grava a parada no checkpoint, e nas rodadas seguintes o trial concorre com o último
+  resultado (`reaproveitada=True`), sem ser reenviado;
+- os trials rodam em um `ProcessPoolExecutor`, com `threads_por_trial` threads cada (variáveis de
+  ambiente definidas antes de o processo importar TensorFlow/XGBoost), e todos leem o mesmo dataset
+  mapeável em memória (`dataset_mmap.py` / `pipeline_entrada.py`), sem cópias por trial;
+- `tempo_max_s` limita o tempo total: quando acaba, os trials na fila são cancelados e os processos
+  com trials em andamento são encerrados (esses trials não entram no resultado);
+- cada avaliação vira uma linha JSON em `arquivo_log` (config, passos, métrica, tempo, processo), e a
+  última linha traz a melhor configuração.
+
+Objetivos prontos: `ObjetivoXGBoost` (dataset com X, Y e divisões) e `ObjetivoLSTM` (base de janelas).
+Qualquer objeto que possa ser enviado a outro processo com `__call__(config, orcamento, checkpoint)`
+-> {'metrica', 'passos', 'parado'} serve (métrica menor é melhor; `parado` indica a parada antecipada).
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.modelagem_machine_learning.busca_hiperparametros
+"""
+
+ESPACO_LSTM = {
+    'unidades_1': [32, 64, 100, 128],
+    'unidades_2': [16, 32, 64, 100],
+    'dropout': (0.0, 0.3),
+    'taxa_aprendizado': (1e-4, 1e-2, 'log'),
+    'batch_size': [16, 32, 64],
+}
+
+ESPACO_XGBOOST = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'eta': (0.02, 0.3, 'log'),
+    'min_child_weight': (1.0, 10.0, 'log'),
+    'subsample': (0.6, 1.0),
+    'colsample_bytree': (0.6, 1.0),
+    'lambda': (0.1, 10.0, 'log'),
+}
+
+
+def amostrar_configuracoes(espaco, n, semente=0):
+    """
+    Configurações sorteadas do espaço: lista = escolha; (min, max) = uniforme (inteiro se os dois
+    limites forem inteiros); (min, max, 'log') = log-uniforme.
+    """
+    rng = np.random.default_rng(semente)
+    configuracoes = []
+    for _ in range(n):
+        config = {}
+        for nome, valores in espaco.items():
+            if isinstance(valores, list):
+                config[nome] = valores[rng.integers(len(valores))]
+            elif len(valores) == 3 and valores[2] == 'log':
+                config[nome] = float(np.exp(rng.uniform(np.log(valores[0]), np.log(valores[1]))))
+            elif all(isinstance(v, int) for v in valores):
+                config[nome] = int(rng.integers(valores[0], valores[1] + 1))
+            else:
+                config[nome] = float(rng.uniform(*valores))
+        configuracoes.append(config)
+    return configuracoes
+
+
+def _inicializar_processo(threads):
+    for variavel in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                     'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[variavel] = str(threads)
+
+
+def _avaliar(objetivo, trial, config, orcamento, checkpoint):
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    resultado = objetivo(config, orcamento, checkpoint)
+    return {
+        'trial': trial, 'config': config, 'orcamento': orcamento, **resultado,
+        'tempo_s': time.perf_counter() - inicio, 'cpu_s': time.process_time() - inicio_cpu, 'pid': os.getpid(),
+    }
+
+
+def _metrica_ordenavel(metrica):
+    """Métrica para ordenação: NaN (trial sem avaliação válida) fica atrás de qualquer resultado."""
+    return math.inf if metrica is None or math.isnan(metrica) else metrica
+
+
+def _encerrar(executor):
+    """Cancela os trials na fila e encerra os processos, sem esperar os trials em andamento."""
+    if hasattr(executor, 'terminate_workers'):  # Python 3.14+
+        executor.terminate_workers()
+        return
+    processos = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for processo in processos:
+        processo.terminate()
+    for processo in processos:
+        processo.join()
+
+
+def _ler_estado(checkpoint):
+    arquivo = f"{checkpoint}.json"
+    if not os.path.exists(arquivo):
+        return None
+    with open(arquivo, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_estado(checkpoint, estado):
+    with open(f"{checkpoint}.json", 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+
+
+def busca_hiperparametros(objetivo, espaco, n_configs=27, orcamento_min=1, eta=3, n_rodadas=None,
+                          max_processos=None, threads_por_trial=1, semente=0, tempo_max_s=None,
+                          arquivo_log=None, dir_checkpoints=None):
+    """
+    Parâmetros:
+    objetivo: Função de avaliação `(config, orcamento, checkpoint) -> {'metrica', 'passos', ...}`.
+    espaco (dict): Espaço de busca (ver `amostrar_configuracoes`).
+    n_configs (int): Configurações na primeira rodada.
+    orcamento_min (int): Passos por trial na primeira rodada (multiplicado por `eta` a cada rodada).
+    n_rodadas (int): Rodadas de halving (padrão: até sobrar uma configuração).
+    tempo_max_s (float): Tempo máximo da busca; trials na fila são cancelados e os em andamento, encerrados.
+
+    Retorna:
+    (pd.DataFrame, dict): todas as avaliações e a melhor ({'trial', 'config', 'metrica', ...}; None se
+    nenhum trial terminou dentro do tempo).
+    """
+    configuracoes = amostrar_configuracoes(espaco, n_configs, semente)
+    n_rodadas = n_rodadas or int(math.floor(math.log(n_configs, eta) + 1e-9)) + 1
+    dir_temporario = None if dir_checkpoints else tempfile.TemporaryDirectory()
+    dir_checkpoints = dir_checkpoints or dir_temporario.name
+    os.makedirs(dir_checkpoints, exist_ok=True)
+    log = open(arquivo_log, 'a', encoding='utf-8') if arquivo_log else None
+
+    inicio = time.perf_counter()
+    avaliacoes, vivos, orcamento = [], list(range(n_configs)), orcamento_min
+    parados = {}  # trial -> última avaliação de um trial com parada antecipada
+    esgotado = False
+    executor = ProcessPoolExecutor(max_processos, initializer=_inicializar_processo, initargs=(threads_por_trial,))
+    try:
+        for rodada in range(n_rodadas):
+            # Trials parados concorrem com o último resultado, sem treinar de novo
+            resultados = [{**parados[trial], 'rodada': rodada, 'reaproveitada': True} for trial in vivos if trial in parados]
+            pendentes = {
+                executor.submit(_avaliar, objetivo, trial, configuracoes[trial], orcamento,
+                                os.path.join(dir_checkpoints, f"trial_{trial:04d}"))
+                for trial in vivos if trial not in parados
+            }
+            while pendentes:
+                restante = None if tempo_max_s is None else max(0, tempo_max_s - (time.perf_counter() - inicio))
+                prontos, pendentes = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    avaliacao = {'rodada': rodada, **futuro.result(), 'reaproveitada': False}
+                    resultados.append(avaliacao)
+                    if avaliacao.get('parado'):
+                        parados[avaliacao['trial']] = avaliacao
+                    if log:
+                        log.write(json.dumps({'tipo': 'trial', **avaliacao}, default=float) + '\n')
+                        log.flush()
+                if not prontos:
+                    esgotado = True
+                    break
+
+            avaliacoes.extend(resultados)
+            print(f"[Info] Rodada {rodada}: {len(resultados)}/{len(vivos)} trials com {orcamento} passos, "
+                  f"melhor métrica {min((_metrica_ordenavel(r['metrica']) for r in resultados), default=math.inf):.6g} "
+                  f"({time.perf_counter() - inicio:.1f} s)")
+            if esgotado or not resultados:
+                print("[Aviso] Tempo máximo da busca atingido; trials pendentes cancelados e processos encerrados.")
+                break
+
+            # Só a melhor fração segue para a próxima rodada, com eta vezes mais passos
+            resultados.sort(key=lambda r: _metrica_ordenavel(r['metrica']))
+            vivos = [r['trial'] for r in resultados[:max(1, len(resultados) // eta)]]
+            orcamento *= eta
+            if len(resultados) == 1:
+                break
+    finally:
+        # Sem esperar os trials em andamento quando o tempo acabou (ou em caso de erro)
+        if esgotado or sys.exc_info()[0] is not None:
+            _encerrar(executor)
+        else:
+            executor.shutdown()
+        if dir_temporario is not None:
+            dir_temporario.cleanup()
+
+    tabela = pd.DataFrame(avaliacoes)
+    melhor = None
+    if not tabela.empty:
+        # A melhor é a da rodada mais avançada (mais passos) com a menor métrica
+        ultima = tabela[tabela['rodada'] == tabela['rodada'].max()]
+        melhor = ultima.loc[ultima['metrica'].fillna(math.inf).idxmin()].to_dict()
+    if log:
+        if melhor is not None:
+            log.write(json.dumps({'tipo': 'melhor', **melhor, 'tempo_total_s': time.perf_counter() - inicio}, default=float) + '\n')
+        log.close()
+    return tabela, melhor
+
+
+# Objetivos
+# ---------------------------------------------------------------------------
+
+class ObjetivoXGBoost:
+    """
+    RMSE médio de validação dos targets de um dataset tabular ('X', 'Y' e divisões no manifesto).
+    Passos = rodadas de boosting; cada target continua do booster salvo no checkpoint, e um target
+    com parada antecipada (gravada no estado do checkpoint) não recebe mais rodadas.
+    """
+
+    def __init__(self, caminho_dataset, paciencia=20, max_bin=256):
+        self.caminho_dataset = caminho_dataset
+        self.paciencia = paciencia
+        self.max_bin = max_bin
+        self._matrizes = None
+
+    def _carregar(self):
+        # Quantizado uma vez por processo e reaproveitado pelos trials seguintes do mesmo processo
+        if self._matrizes is None:
+            import xgboost as xgb
+            arrays, manifesto = abrir_dataset(self.caminho_dataset)
+            treino, validacao = (slice(*manifesto['divisoes'][nome]) for nome in ('treino', 'validacao'))
+            X, Y = arrays['X'], arrays['Y']
+            matrizes = []
+            for i in range(Y.shape[1]):
+                base = xgb.QuantileDMatrix(X[treino], label=Y[treino, i], max_bin=self.max_bin,
+                                           ref=matrizes[0][0] if matrizes else None)
+                matrizes.append((base, xgb.QuantileDMatrix(X[validacao], label=Y[validacao, i], ref=base)))
+            self._matrizes = matrizes
+        return self._matrizes
+
+    def __getstate__(self):
+        return {**self.__dict__, '_matrizes': None}
+
+    def __call__(self, config, orcamento, checkpoint):
+        import xgboost as xgb
+
+        parametros = {'objective': 'reg:squarederror', 'tree_method': 'hist', 'eval_metric': 'rmse',
+                      'max_bin': self.max_bin, 'nthread': int(os.environ.get('OMP_NUM_THREADS', 1)), **config}
+        estado = _ler_estado(checkpoint) or {'parados': [], 'metricas': []}
+        metricas, parados, passos = [], [], 0
+        for i, (treino, validacao) in enumerate(self._carregar()):
+            arquivo = f"{checkpoint}-{i}.json"
+            anterior = xgb.Booster(model_file=arquivo) if os.path.exists(arquivo) else None
+            feitas = anterior.num_boosted_rounds() if anterior is not None else 0
+            if i < len(estado['parados']) and estado['parados'][i]:
+                metricas.append(estado['metricas'][i])
+                parados.append(True)
+                passos = max(passos, feitas)
+                continue
+            historico = {}
+            booster = xgb.train(
+                parametros, treino, num_boost_round=max(0, orcamento - feitas), xgb_model=anterior,
+                evals=[(validacao, 'validacao')], early_stopping_rounds=self.paciencia,
+                evals_result=historico, verbose_eval=False
+            )
+            booster.save_model(arquivo)
+            metricas.append(min(historico['validacao']['rmse']) if historico else float('nan'))
+            # Menos rodadas que o orçamento: a parada antecipada interrompeu o treino
+            parados.append(booster.num_boosted_rounds() < orcamento)
+            passos = max(passos, booster.num_boosted_rounds())
+        _gravar_estado(checkpoint, {'parados': parados, 'metricas': metricas})
+        return {'metrica': float(np.mean(metricas)), 'passos': passos, 'parado': all(parados)}
+
+
+class ObjetivoLSTM:
+    """
+    Menor `val_loss` de um LSTM treinado em streaming da base de janelas (`pipeline_entrada.py`).
+    Passos = épocas; o modelo continua do `.keras` salvo no checkpoint, e um trial com parada
+    antecipada (gravada no estado do checkpoint) devolve o último resultado sem treinar.
+    """
+
+    def __init__(self, caminho_base, paciencia=3):
+        self.caminho_base = caminho_base
+        self.paciencia = paciencia
+
+    def _criar_modelo(self, config, manifesto, n_features, n_targets):
+        from tensorflow.keras import Input
+        from tensorflow.keras.layers import LSTM, Dense, Dropout, Reshape
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.optimizers import Adam
+
+        comprimento_alvo = manifesto['comprimento_alvo']
+        camadas = [
+            Input((manifesto['comprimento_entrada'], n_features)),
+            LSTM(config['unidades_1'], return_sequences=True),
+            Dropout(config['dropout']),
+            LSTM(config['unidades_2']),
+            Dropout(config['dropout']),
+        ]
+        if comprimento_alvo is None:
+            camadas.append(Dense(n_targets))
+        else:
+            camadas += [Dense(comprimento_alvo * n_targets), Reshape((comprimento_alvo, n_targets))]
+        modelo = Sequential(camadas)
+        modelo.compile(optimizer=Adam(config['taxa_aprendizado']), loss='mse')
+        return modelo
+
+    def __call__(self, config, orcamento, checkpoint):
+        from tensorflow.keras.callbacks import EarlyStopping
+        from tensorflow.keras.models import load_model
+        from scripts.modelagem_machine_learning.pipeline_entrada import criar_tf_dataset, verificar_normalizada
+
+        estado = _ler_estado(checkpoint)
+        if estado is not None and estado['parado']:
+            return estado
+
+        arrays, manifesto = abrir_dataset(self.caminho_base)
+        verificar_normalizada(manifesto, self.caminho_base)
+        arquivo = f"{checkpoint}.keras"
+        if estado is not None and os.path.exists(arquivo):
+            modelo = load_model(arquivo)
+            feitas = estado['passos']
+        else:
+            modelo = self._criar_modelo(config, manifesto, arrays['features'].shape[1], arrays['targets'].shape[1])
+            feitas = 0
+
+        treino = criar_tf_dataset(self.caminho_base, 'treino', config['batch_size'], embaralhar=True, semente=0)
+        validacao = criar_tf_dataset(self.caminho_base, 'validacao', config['batch_size'])
+        parada = EarlyStopping(patience=self.paciencia, restore_best_weights=True)
+        historico = modelo.fit(
+            treino, validation_data=validacao, initial_epoch=feitas, epochs=max(orcamento, feitas), verbose=0,
+            callbacks=[parada]
+        )
+        passos = feitas + len(historico.history.get('val_loss', []))
+        modelo.save(arquivo)
+        resultado = {'metrica': float(min(historico.history.get('val_loss', [np.nan]))), 'passos': passos,
+                     'parado': parada.stopped_epoch > 0}
+        _gravar_estado(checkpoint, resultado)
+        return resultado
+
+
+if __name__ == "__main__":
+    from scripts.modelagem_machine_learning.pipeline_entrada import ultima_base
+
+    # Base de janelas normalizada mais recente, gravada pela preparação do LSTM global
+    caminho_base = ultima_base('global')
+
+    tabela, melhor = busca_hiperparametros(
+        ObjetivoLSTM(caminho_base), ESPACO_LSTM, n_configs=27, orcamento_min=2, eta=3,
+        threads_por_trial=2, tempo_max_s=3600,
+        arquivo_log='/content/Piloto_Day_Trade/reports/busca_hiperparametros_LSTM.jsonl'
+    )
+    print(tabela.sort_values(['rodada', 'metrica']).to_string(index=False))
+    if melhor is None:
+        print("\n[Aviso] Nenhum trial terminou dentro do tempo máximo; sem melhor configuração.")
+    else:
+        print(f"\n[Info] Melhor configuração: {melhor['config']} (val_loss {melhor['metrica']:.6f})")
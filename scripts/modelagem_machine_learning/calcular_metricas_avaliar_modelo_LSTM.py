@@ -1,22 +1,34 @@
-
 import pandas as pd
 import numpy as np
-import joblib
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
-def avaliar_modelo_lstm(modelo, X_teste, y_teste, caminho_scaler='/content/Piloto_Day_Trade/models/LSTM/scalers/scaler_normalizacao_preco.pkl'):
+from scripts.modelagem_machine_learning.dataset_mmap import carregar_manifesto_dataset
+from scripts.modelagem_machine_learning.registro_scalers import carregar_scaler
+
+def avaliar_modelo_lstm(modelo, X_teste, y_teste, caminho_dataset=None, caminho_scaler=None):
     """
     Avalia o modelo LSTM, imprimindo as principais métricas e comparação entre previsões e valores reais.
+
+    O scaler usado para voltar à escala original é o registrado no manifesto do dataset
+    (`caminho_dataset`), ou seja, o mesmo ajustado no treino que gerou X_teste/y_teste.
+    `caminho_scaler` permite informar um scaler de preços diretamente.
     """
     print("Realizando previsões...")
     y_previsto = modelo.predict(X_teste)
 
     print("Carregando scaler de preços para inversão...")
-    scaler_precos = joblib.load(caminho_scaler)
     colunas_precos = ['abertura', 'maximo', 'minimo', 'fechamento']
-
-    y_previsto_reshape = y_previsto.reshape(-1, 4)
-    y_teste_reshape = y_teste.reshape(-1, 4)
+    if caminho_dataset is not None:
+        manifesto = carregar_manifesto_dataset(caminho_dataset)
+        caminho_scaler = manifesto['scalers']['targets']
+        colunas_precos = manifesto['targets']
+    elif caminho_scaler is None:
+        raise ValueError("Informe `caminho_dataset` (recomendado) ou `caminho_scaler`.")
+    scaler_precos = carregar_scaler(caminho_scaler)
+
+    n_colunas = len(colunas_precos)
+    y_previsto_reshape = y_previsto.reshape(-1, n_colunas)
+    y_teste_reshape = np.asarray(y_teste).reshape(-1, n_colunas)
 
     y_previsto_original = scaler_precos.inverse_transform(y_previsto_reshape)
     y_teste_original = scaler_precos.inverse_transform(y_teste_reshape)
@@ -24,15 +36,11 @@ def avaliar_modelo_lstm(modelo, X_teste, y_teste, caminho_scaler='/content/Pilot
     df_previsto = pd.DataFrame(y_previsto_original, columns=colunas_precos)
     df_real = pd.DataFrame(y_teste_original, columns=colunas_precos)
 
+    # Real e previsto lado a lado para cada coluna alvo
     comparacao = pd.DataFrame({
-        'Abertura_Real': df_real['abertura'],
-        'Abertura_Prevista': df_previsto['abertura'],
-        'Maximo_Real': df_real['maximo'],
-        'Maximo_Previsto': df_previsto['maximo'],
-        'Minimo_Real': df_real['minimo'],
-        'Minimo_Previsto': df_previsto['minimo'],
-        'Fechamento_Real': df_real['fechamento'],
-        'Fechamento_Previsto': df_previsto['fechamento']
+        f"{coluna}_{origem}": df[coluna]
+        for coluna in colunas_precos
+        for origem, df in (('real', df_real), ('previsto', df_previsto))
     })
 
     print("\nComparação de previsões (valores reais):")
@@ -45,10 +53,8 @@ def avaliar_modelo_lstm(modelo, X_teste, y_teste, caminho_scaler='/content/Pilot
         print(f"{nome} - MAE: {mae:.4f}, MSE: {mse:.4f}, R²: {r2:.4f}")
 
     print("\n Métricas de desempenho por coluna:")
-    calcular_metricas(df_real['abertura'], df_previsto['abertura'], "Abertura")
-    calcular_metricas(df_real['maximo'], df_previsto['maximo'], "Máximo")
-    calcular_metricas(df_real['minimo'], df_previsto['minimo'], "Mínimo")
-    calcular_metricas(df_real['fechamento'], df_previsto['fechamento'], "Fechamento")
+    for coluna in colunas_precos:
+        calcular_metricas(df_real[coluna], df_previsto[coluna], coluna)
 
     return df_real, df_previsto, comparacao
 
@@ -56,21 +62,26 @@ def avaliar_modelo_lstm(modelo, X_teste, y_teste, caminho_scaler='/content/Pilot
 if __name__ == "__main__":
     print("Importando scripts de modelo e dados...")
     from tensorflow.keras.models import load_model
-    from scripts.modelagem_machine_learning.preparar_dados_modelagem_LSTM import preparar_dados_lstm
+    from scripts.modelagem_machine_learning.dataset_mmap import dataset_do_modelo, verificar_entrada_modelo
+    from scripts.modelagem_machine_learning.pipeline_entrada import gerar_lotes
 
-    print("Preparando dados para avaliação...")
-    X_treino, X_teste, y_treino, y_teste = preparar_dados_lstm(
-        path_dados='/content/Piloto_Day_Trade/data/transformed/dados_transformados.csv',
-        tam_seq=96,
-        tx_treino=0.8
-    )
+    caminho_modelo = '/content/Piloto_Day_Trade/models/LSTM/modelo_LSTM_v1.keras'
 
     print("📡 Carregando modelo salvo...")
-    modelo_lstm_v1 = load_model('/content/Piloto_Day_Trade/models/LSTM/modelo_LSTM_v1.keras')
+    modelo_lstm_v1 = load_model(caminho_modelo)
+
+    # Conjunto de teste da base em que o modelo foi treinado (mesmas janelas, colunas e scalers)
+    print("Preparando dados para avaliação...")
+    caminho_base = dataset_do_modelo(caminho_modelo)
+    verificar_entrada_modelo(modelo_lstm_v1.input_shape[1:], carregar_manifesto_dataset(caminho_base), caminho_modelo)
+    lotes = list(gerar_lotes(caminho_base, 'teste', tamanho_lote=256))
+    X_teste = np.concatenate([X for X, _ in lotes])
+    y_teste = np.concatenate([y for _, y in lotes])
 
     print("Avaliando modelo...")
     df_real, df_previsto, comparacao = avaliar_modelo_lstm(
         modelo=modelo_lstm_v1,
         X_teste=X_teste,
-        y_teste=y_teste
+        y_teste=y_teste,
+        caminho_dataset=caminho_base
     )
@@ -33,3 +33,26 @@ def LSTM_model(input_shape):
     model.compile(optimizer='adam', loss='mse')
 
     return model
+
+def treinar_com_streaming(model, caminho_base, epochs=20, batch_size=16, embaralhar=True):
+    """
+    Treina o modelo lendo a base de janelas mapeada em memória (`pipeline_entrada.py`), em vez de
+    arrays X_treino/y_treino inteiros na RAM: os lotes são montados sob demanda com map paralelo e prefetch.
+    A base precisa ter sido gravada normalizada pelos scripts de preparação (scalers no manifesto).
+
+    Args:
+        model (tf.keras.Model): modelo compilado (ex.: `LSTM_model(input_shape)`)
+        caminho_base (str): diretório da base salva com `pipeline_entrada.salvar_base`
+        epochs (int): número de épocas
+        batch_size (int): tamanho do lote
+
+    Returns:
+        historico (tf.keras.callbacks.History)
+    """
+    from scripts.modelagem_machine_learning.dataset_mmap import carregar_manifesto_dataset
+    from scripts.modelagem_machine_learning.pipeline_entrada import criar_tf_dataset, verificar_normalizada
+
+    verificar_normalizada(carregar_manifesto_dataset(caminho_base), caminho_base)
+    treino = criar_tf_dataset(caminho_base, 'treino', tamanho_lote=batch_size, embaralhar=embaralhar)
+    validacao = criar_tf_dataset(caminho_base, 'validacao', tamanho_lote=batch_size)
+    return model.fit(treino, validation_data=validacao, epochs=epochs)
@@ -0,0 +1,230 @@
+
+# @title Datasets de treino em arrays mapeáveis em memória (.npy float32 + manifesto)
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+"""
+Formato dos conjuntos preparados para os modelos: um diretório por conteúdo,
+
+    <dir_datasets>/<nome>-<hash>/
+        X.npy, y.npy, ...       arrays float32 contíguos e sem compressão
+        manifesto.json          arrays (arquivo, shape, dtype), features, targets, scalers,
+                                datas das amostras, divisões (treino/validação/teste) e parâmetros
+
+- Os arrays são abertos com `np.load(mmap_mode='r')`: abrir leva milissegundos e só as páginas
+  usadas são lidas do disco, em vez de descompactar um `.npz` inteiro na memória.
+- O nome do diretório vem do hash do conteúdo: preparar de novo os mesmos dados reaproveita o
+  diretório existente, e vários experimentos abrem a mesma cópia.
+- As divisões são intervalos de amostras (`[inicio, fim)`), então treino/validação/teste são
+  fatias do mesmo arquivo, também sem cópia.
+- Cada preparação com dados novos grava uma versão nova; `limpar_datasets` (chamado por
+  `salvar_dataset`) mantém as `MANTER_DATASETS` mais recentes de cada nome/ticker/modelo e nunca
+  remove um dataset referenciado por um modelo salvo ou exportado em `DIR_MODELOS`.
+- Um modelo treinado guarda o dataset em que foi treinado (`registrar_dataset_modelo`): avaliação,
+  exportação e serviço usam esse manifesto (scalers, colunas e formato da janela), e
+  `verificar_entrada_modelo` confere que o formato de entrada do modelo é o do dataset.
+"""
+
+DIR_DATASETS = '/content/Piloto_Day_Trade/data/prepared/datasets'
+DIR_MODELOS = '/content/Piloto_Day_Trade/models'
+
+# Versões mantidas por nome/ticker/modelo (além das usadas por modelos)
+MANTER_DATASETS = 3
+
+
+def limites_divisao(n_amostras, test_size=0.2, val_size=0.1):
+    """
+    Divisões sem embaralhar, com os mesmos tamanhos de `train_test_split(shuffle=False)` aplicado
+    duas vezes (teste sobre o total, validação sobre o que sobra para treino).
+    """
+    n_teste = int(np.ceil(test_size * n_amostras))
+    n_treino_val = n_amostras - n_teste
+    n_val = int(np.ceil(val_size * n_treino_val))
+    n_treino = n_treino_val - n_val
+    return {
+        'treino': [0, n_treino],
+        'validacao': [n_treino, n_treino_val],
+        'teste': [n_treino_val, n_amostras],
+    }
+
+
+def _hash_conteudo(arrays, metadados):
+    resumo = hashlib.sha1(json.dumps(metadados, sort_keys=True, default=str).encode('utf-8'))
+    for nome in sorted(arrays):
+        array = arrays[nome]
+        resumo.update(f"{nome}{array.shape}{array.dtype}".encode('utf-8'))
+        resumo.update(array.reshape(-1).view(np.uint8))
+    return resumo.hexdigest()[:16]
+
+
+def salvar_dataset(arrays, nome, dir_datasets=DIR_DATASETS, dtype=np.float32, manter=MANTER_DATASETS, **metadados):
+    """
+    Grava os arrays (contíguos; os de ponto flutuante em float32) e o manifesto em `<dir_datasets>/<nome>-<hash>`.
+
+    Parâmetros:
+    arrays (dict): Arrays por nome (ex.: {'X': X, 'y': y}).
+    nome (str): Prefixo do diretório (ex.: 'lstm_global').
+    manter (int): Versões de `nome` mantidas após a gravação (`limpar_datasets`); None não remove nada.
+    metadados: Entradas do manifesto (features, targets, scalers, datas, divisoes, parâmetros...).
+
+    Retorna:
+    str: Diretório do dataset (o existente, se o mesmo conteúdo já foi gravado).
+    """
+    # Arrays de ponto flutuante vão para `dtype`; índices inteiros mantêm o tipo
+    arrays = {
+        chave: np.ascontiguousarray(valor, dtype=dtype if np.issubdtype(np.asarray(valor).dtype, np.floating) else None)
+        for chave, valor in arrays.items()
+    }
+    destino = os.path.join(dir_datasets, f"{nome}-{_hash_conteudo(arrays, metadados)}")
+    if os.path.exists(os.path.join(destino, 'manifesto.json')):
+        # Reaproveitado conta como a versão mais recente na retenção
+        os.utime(destino)
+        print(f"[Info] Dataset já existente reaproveitado: {destino}")
+        if manter is not None:
+            limpar_datasets(nome, dir_datasets, manter, preservar=[destino])
+        return destino
+
+    # Grava em um diretório temporário e renomeia: um dataset nunca fica pela metade
+    temporario = f"{destino}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    manifesto = {'nome': nome, 'arrays': {}, **metadados}
+    for chave, array in arrays.items():
+        arquivo = f"{chave}.npy"
+        np.save(os.path.join(temporario, arquivo), array)
+        manifesto['arrays'][chave] = {'arquivo': arquivo, 'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+    with open(os.path.join(temporario, 'manifesto.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, default=str)
+
+    try:
+        os.rename(temporario, destino)
+    except OSError:
+        # Outro processo gravou o mesmo conteúdo ao mesmo tempo
+        shutil.rmtree(temporario, ignore_errors=True)
+
+    print(f"[Info] Dataset salvo em: {destino}")
+    if manter is not None:
+        limpar_datasets(nome, dir_datasets, manter, preservar=[destino])
+    return destino
+
+
+def datasets_referenciados(dir_modelos=DIR_MODELOS):
+    """Datasets usados por modelos salvos (`<modelo>_dataset.json`) ou exportados (`modelo.json`)."""
+    referenciados = set()
+    for raiz, _, arquivos in os.walk(dir_modelos):
+        for arquivo in arquivos:
+            if not (arquivo.endswith('_dataset.json') or arquivo == 'modelo.json'):
+                continue
+            try:
+                with open(os.path.join(raiz, arquivo), encoding='utf-8') as f:
+                    dataset = json.load(f).get('dataset')
+            except (OSError, ValueError):
+                continue
+            if dataset:
+                referenciados.add(os.path.realpath(dataset))
+    return referenciados
+
+
+def limpar_datasets(nome, dir_datasets=DIR_DATASETS, manter=MANTER_DATASETS, dir_modelos=DIR_MODELOS, preservar=()):
+    """
+    Remove as versões antigas de `nome`: de cada ticker/modelo ficam as `manter` mais recentes, além
+    das referenciadas por modelos em `dir_modelos` e das listadas em `preservar`.
+
+    Retorna:
+    list: Diretórios removidos.
+    """
+    grupos = {}
+    for entrada in os.listdir(dir_datasets) if os.path.isdir(dir_datasets) else []:
+        caminho = os.path.join(dir_datasets, entrada)
+        if entrada.rsplit('-', 1)[0] != nome or not os.path.exists(os.path.join(caminho, 'manifesto.json')):
+            continue
+        manifesto = carregar_manifesto_dataset(caminho)
+        grupos.setdefault((manifesto.get('ticker'), manifesto.get('modelo')), []).append(caminho)
+
+    protegidos = datasets_referenciados(dir_modelos) | {os.path.realpath(caminho) for caminho in preservar}
+    removidos = []
+    for caminhos in grupos.values():
+        caminhos.sort(key=os.path.getmtime, reverse=True)
+        for caminho in caminhos[manter:]:
+            if os.path.realpath(caminho) not in protegidos:
+                shutil.rmtree(caminho, ignore_errors=True)
+                removidos.append(caminho)
+    if removidos:
+        print(f"[Info] {len(removidos)} versão(ões) antiga(s) de {nome} removida(s) de {dir_datasets}.")
+    return removidos
+
+
+def carregar_manifesto_dataset(caminho):
+    with open(os.path.join(caminho, 'manifesto.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def abrir_dataset(caminho, mmap_mode='r'):
+    """
+    Abre os arrays do dataset sem lê-los para a memória.
+
+    Retorna:
+    (dict, dict): arrays (np.memmap) por nome e o manifesto.
+    """
+    manifesto = carregar_manifesto_dataset(caminho)
+    arrays = {
+        chave: np.load(os.path.join(caminho, info['arquivo']), mmap_mode=mmap_mode)
+        for chave, info in manifesto['arrays'].items()
+    }
+    return arrays, manifesto
+
+
+def caminho_dataset_modelo(caminho_modelo):
+    """Arquivo ao lado do modelo (`<modelo>_dataset.json`) com o dataset usado no treino."""
+    return f"{os.path.splitext(str(caminho_modelo).rstrip('/'))[0]}_dataset.json"
+
+
+def registrar_dataset_modelo(caminho_modelo, caminho_dataset):
+    """Grava, ao lado do modelo salvo, o dataset em que ele foi treinado."""
+    with open(caminho_dataset_modelo(caminho_modelo), 'w', encoding='utf-8') as f:
+        json.dump({'modelo': os.path.abspath(caminho_modelo), 'dataset': os.path.abspath(caminho_dataset)}, f, indent=2)
+
+
+def dataset_do_modelo(caminho_modelo):
+    """
+    Dataset em que o modelo foi treinado: o registrado ao lado do `.keras` ou, em um modelo exportado
+    (diretório com `modelo.json`), o gravado na exportação.
+    """
+    arquivo = os.path.join(caminho_modelo, 'modelo.json') if os.path.isdir(caminho_modelo) else caminho_dataset_modelo(caminho_modelo)
+    if os.path.exists(arquivo):
+        with open(arquivo, encoding='utf-8') as f:
+            dataset = json.load(f).get('dataset')
+        if dataset:
+            return dataset
+    raise FileNotFoundError(f"Sem dataset de treino registrado para {caminho_modelo}; salve o modelo com "
+                            f"`registrar_dataset_modelo` (ou exporte-o informando o dataset).")
+
+
+def formato_janela(manifesto):
+    """(linhas da janela, dias lidos para montá-la, candles por dia) conforme o tipo de dataset."""
+    if 'dias_entrada' in manifesto:
+        return manifesto['dias_entrada'] * manifesto['n_pontos_dia'], manifesto['dias_entrada'], manifesto['n_pontos_dia']
+    if 'janela' in manifesto:
+        return manifesto['janela'], 1, None
+    return manifesto['comprimento_entrada'], None, None
+
+
+def verificar_entrada_modelo(input_shape, manifesto, caminho_modelo):
+    """ValueError se a entrada do modelo (sem o eixo do lote) não é (linhas da janela, features) do dataset."""
+    esperado = (formato_janela(manifesto)[0], len(manifesto['features']))
+    if tuple(input_shape) != esperado:
+        raise ValueError(f"O modelo {caminho_modelo} espera entradas {tuple(input_shape)}, mas o dataset "
+                         f"({manifesto.get('nome')}) tem janelas {esperado}: modelo e dataset não correspondem.")
+
+
+def obter_divisao(arrays, manifesto, divisao):
+    """Fatias (sem cópia) de todos os arrays para a divisão ('treino', 'validacao' ou 'teste')."""
+    inicio, fim = manifesto['divisoes'][divisao]
+    return {chave: array[inicio:fim] for chave, array in arrays.items()}
@@ -0,0 +1,182 @@
+
+# @title Exportação dos modelos treinados para o runtime leve (sem TensorFlow na inferência)
+
+import json
+import os
+
+import numpy as np
+
+"""
+Converte os modelos treinados para os formatos lidos por `runtime_leve.py`:
+
+- `exportar_lstm`: modelo Keras (.keras) -> `modelo.json` (camadas LSTM/Dense e suas configurações)
+  + `pesos.npz`. Dropout é descartado (não atua na inferência), TimeDistributed(Dense) vira Dense e
+  Reshape grava só o `target_shape` (saída Dense(comprimento_alvo * targets) de `modelo_LSTM_v1.py`).
+  Com `caminho_dataset`, os scalers do dataset de treino vão junto (`exportar_scalers`).
+- `exportar_scalers`: `min_`/`scale_` dos MinMaxScaler de features e targets do manifesto do dataset
+  -> `scalers.npz`, e as colunas de cada um no `modelo.json`; o serviço de previsão normaliza com
+  NumPy e não importa scikit-learn/joblib.
+- `exportar_xgboost`: regressores XGBoost (objetos ou os .pkl gravados com joblib) -> um booster JSON
+  nativo por target + `modelo.json` com features e targets.
+
+A exportação roda onde o TensorFlow/XGBoost já estão instalados (ex.: no Colab, após o treino); os
+workers só precisam de NumPy.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.modelagem_machine_learning.exportar_modelos
+"""
+
+DIR_EXPORTADOS = '/content/Piloto_Day_Trade/models/exportados'
+
+
+def _salvar_manifesto(destino, manifesto):
+    os.makedirs(destino, exist_ok=True)
+    with open(os.path.join(destino, 'modelo.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2)
+
+
+def exportar_scalers(caminho_dataset, destino):
+    """
+    Grava `scalers.npz` (min_ e scale_ dos scalers de features e targets do dataset) no diretório de
+    um modelo já exportado e registra o arquivo e as colunas no `modelo.json`.
+
+    Retorna:
+    str: Caminho do `scalers.npz`.
+    """
+    from scripts.modelagem_machine_learning.dataset_mmap import carregar_manifesto_dataset
+    from scripts.modelagem_machine_learning.registro_scalers import scalers_do_dataset
+
+    manifesto_dataset = carregar_manifesto_dataset(caminho_dataset)
+    scalers = scalers_do_dataset(manifesto_dataset)
+    if set(scalers) != {'features', 'targets'}:
+        raise ValueError(f"O dataset {caminho_dataset} não referencia scalers de features e targets.")
+
+    valores = {}
+    for tipo, scaler in scalers.items():
+        if len(scaler.scale_) != len(manifesto_dataset[tipo]):
+            raise ValueError(f"Scaler de {tipo} com {len(scaler.scale_)} colunas; o dataset tem {len(manifesto_dataset[tipo])}.")
+        valores[f"{tipo}_min"] = scaler.min_.astype(np.float64)
+        valores[f"{tipo}_scale"] = scaler.scale_.astype(np.float64)
+    np.savez(os.path.join(destino, 'scalers.npz'), **valores)
+
+    with open(os.path.join(destino, 'modelo.json'), encoding='utf-8') as f:
+        manifesto = json.load(f)
+    manifesto.update({
+        'scalers': 'scalers.npz',
+        'dataset': os.path.abspath(caminho_dataset),
+        'features': list(manifesto_dataset['features']),
+        'targets': list(manifesto_dataset['targets']),
+    })
+    _salvar_manifesto(destino, manifesto)
+    print(f"[Info] Scalers de {caminho_dataset} exportados em: {destino}")
+    return os.path.join(destino, 'scalers.npz')
+
+
+def exportar_lstm(caminho_keras, destino=os.path.join(DIR_EXPORTADOS, 'LSTM'), caminho_dataset=None):
+    """
+    Parâmetros:
+    caminho_keras (str): Modelo salvo com `model.save(...keras)`.
+    destino (str): Diretório de saída (`modelo.json` + `pesos.npz`).
+    caminho_dataset (str): Dataset de treino; se informado, os scalers dele são exportados junto.
+
+    Retorna:
+    str: Diretório do modelo exportado.
+    """
+    from tensorflow.keras.models import load_model
+
+    modelo = load_model(caminho_keras)
+    camadas, pesos = [], {}
+    for camada in modelo.layers:
+        tipo = type(camada).__name__
+        if tipo == 'Dropout':
+            continue
+        if tipo == 'TimeDistributed':
+            camada, tipo = camada.layer, type(camada.layer).__name__
+
+        config = camada.get_config()
+        indice = len(camadas)
+        if tipo == 'LSTM':
+            if config.get('go_backwards') or config.get('stateful'):
+                raise ValueError(f"LSTM '{camada.name}' usa go_backwards/stateful, não suportado no runtime leve.")
+            camadas.append({
+                'tipo': 'lstm', 'units': config['units'], 'return_sequences': config['return_sequences'],
+                'activation': config['activation'], 'recurrent_activation': config['recurrent_activation']
+            })
+            nomes = ('kernel', 'recurrent_kernel', 'bias')
+        elif tipo == 'Dense':
+            camadas.append({'tipo': 'dense', 'units': config['units'], 'activation': config['activation']})
+            nomes = ('kernel', 'bias')
+        elif tipo == 'Reshape':
+            camadas.append({'tipo': 'reshape', 'target_shape': list(config['target_shape'])})
+            nomes = ()
+        else:
+            raise ValueError(f"Camada não suportada no runtime leve: {tipo} ({camada.name})")
+
+        valores = camada.get_weights()
+        if len(valores) != len(nomes):
+            raise ValueError(f"Camada '{camada.name}' sem bias não é suportada no runtime leve.")
+        for nome, valor in zip(nomes, valores):
+            pesos[f"{indice}_{nome}"] = valor.astype(np.float32)
+
+    os.makedirs(destino, exist_ok=True)
+    np.savez(os.path.join(destino, 'pesos.npz'), **pesos)
+    _salvar_manifesto(destino, {
+        'tipo': 'lstm',
+        'origem': os.path.abspath(caminho_keras),
+        'input_shape': list(modelo.input_shape[1:]),
+        'camadas': camadas,
+        'pesos': 'pesos.npz',
+    })
+    print(f"[Info] LSTM exportado ({len(camadas)} camadas) em: {destino}")
+    if caminho_dataset is not None:
+        exportar_scalers(caminho_dataset, destino)
+    return destino
+
+
+def exportar_xgboost(modelos, features, destino=os.path.join(DIR_EXPORTADOS, 'XGBoost')):
+    """
+    Parâmetros:
+    modelos (dict): target -> XGBRegressor, Booster ou caminho de um .pkl gravado com joblib.
+    features (list): Colunas de entrada, na ordem usada no treino.
+
+    Retorna:
+    str: Diretório do modelo exportado.
+    """
+    import joblib
+
+    os.makedirs(destino, exist_ok=True)
+    arquivos = {}
+    for target, modelo in modelos.items():
+        if isinstance(modelo, str):
+            modelo = joblib.load(modelo)
+        booster = modelo.get_booster() if hasattr(modelo, 'get_booster') else modelo
+        arquivos[target] = f"{target}.json"
+        booster.save_model(os.path.join(destino, arquivos[target]))
+
+    _salvar_manifesto(destino, {
+        'tipo': 'xgboost',
+        'features': list(features),
+        'targets': list(modelos),
+        'arquivos': arquivos,
+    })
+    print(f"[Info] XGBoost exportado ({len(arquivos)} targets) em: {destino}")
+    return destino
+
+
+if __name__ == "__main__":
+    from scripts.modelagem_machine_learning.dataset_mmap import dataset_do_modelo
+
+    # Scalers da base em que o modelo foi treinado, para o serviço de previsão não depender do scikit-learn
+    caminho_keras = '/content/Piloto_Day_Trade/models/LSTM/modelo_LSTM_v1.keras'
+    exportar_lstm(caminho_keras, caminho_dataset=dataset_do_modelo(caminho_keras))
+
+    # Regressores gravados por `modelagem_dados_XGBoot.py` (um .pkl por target)
+    features_xgboost = [
+        "abertura", "minimo", "maximo", "fechamento", "SMA_10", "EMA_10",
+        "rsi", "MACD", "Signal_Line", "OBV", "fechamento_lag1", "fechamento_lag2", "fechamento_lag3",
+        "retorno_lag1", "retorno_lag2", "retorno_lag3", "volume_lag1", "volume_lag2", "volume_lag3"
+    ]
+    targets_xgboost = ["abertura", "minimo", "maximo", "fechamento"]
+    pkls = {target: f"modelo_{target}.pkl" for target in targets_xgboost}
+    if all(os.path.exists(caminho) for caminho in pkls.values()):
+        exportar_xgboost(pkls, features_xgboost)
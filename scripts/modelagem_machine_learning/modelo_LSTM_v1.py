@@ -1,53 +1,82 @@
 
 # Tentativa inicial - Modelo base LSTM para previsão intradiária de preços
 
+import os
+
+from tensorflow.keras import Input
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
+from tensorflow.keras.layers import LSTM, Dense, Dropout, Reshape
+
+from scripts.modelagem_machine_learning.criar_modelo_LSTM import treinar_com_streaming
+from scripts.modelagem_machine_learning.dataset_mmap import abrir_dataset, registrar_dataset_modelo
+from scripts.modelagem_machine_learning.pipeline_entrada import ultima_base
+
+
+CAMINHO_MODELO = '/content/Piloto_Day_Trade/models/LSTM/modelo_LSTM_v1.keras'
+
 
 # 🔧 Construção do modelo
-LSTM_model = Sequential([
-    
-    # Camada LSTM 1:
-    # - 100 unidades (aumentado para maior capacidade de captura de padrões temporais)
-    # - return_sequences=True para passar a sequência completa para a próxima camada
-    # - input_shape: (32, número de features) - sequência de 32 timesteps com n features
-    LSTM(100, return_sequences=True, input_shape=(X_treino.shape[1], X_treino.shape[2])),
-    
-    # Dropout leve para reduzir overfitting sem perder muito sinal
-    Dropout(0.1),
-
-    # Camada LSTM 2:
-    # - Outra LSTM com 100 unidades
-    # - Também retorna sequência, pois a saída é uma sequência (32 timestamps com 4 preços)
-    LSTM(100, return_sequences=True),
-    
-    # Outro Dropout leve
-    Dropout(0.1),
-
-    # Camada densa intermediária:
-    # - 64 neurônios com ativação ReLU
-    # - Introduz não-linearidade e ajuda a refinar a saída da LSTM antes da previsão final
-    Dense(64, activation='relu'),
-
-    # Camada de saída:
-    # - 4 unidades: prevendo abertura, máxima, mínima e fechamento por timestamp
-    # - Sem ativação, saída contínua (valores de preços normalizados)
-    Dense(4)
-])
-
-# 🧠 Compilação do modelo
-# - Otimizador Adam, bom para problemas não estacionários como séries temporais
-# - Função de perda MSE (erro quadrático médio), apropriado para regressão
-LSTM_model.compile(optimizer='adam', loss='mse')
-
-# 🚂 Treinamento do modelo
-# - 20 épocas: número inicial para observar o desempenho
-# - batch_size=16: menor para atualizar pesos com frequência e lidar com variação dos dados
-historico = LSTM_model.fit(
-    X_treino, y_treino,
-    validation_data=(X_teste, y_teste),
-    epochs=20,
-    batch_size=16
-)
+def criar_modelo(comprimento_entrada, n_features, comprimento_alvo, n_targets):
+    return Sequential([
+
+        # Entrada: sequência de `comprimento_entrada` timesteps com n features
+        Input((comprimento_entrada, n_features)),
+
+        # Camada LSTM 1:
+        # - 100 unidades (aumentado para maior capacidade de captura de padrões temporais)
+        # - return_sequences=True para passar a sequência completa para a próxima camada
+        LSTM(100, return_sequences=True),
+
+        # Dropout leve para reduzir overfitting sem perder muito sinal
+        Dropout(0.1),
+
+        # Camada LSTM 2:
+        # - Outra LSTM com 100 unidades
+        # - Resume a sequência de entrada: o alvo (dia seguinte) não tem o mesmo comprimento da entrada
+        LSTM(100),
+
+        # Outro Dropout leve
+        Dropout(0.1),
+
+        # Camada densa intermediária:
+        # - 64 neurônios com ativação ReLU
+        # - Introduz não-linearidade e ajuda a refinar a saída da LSTM antes da previsão final
+        Dense(64, activation='relu'),
+
+        # Camada de saída:
+        # - Um valor por candle do dia seguinte e por target, sem ativação (valores normalizados)
+        Dense(comprimento_alvo * n_targets),
+        Reshape((comprimento_alvo, n_targets))
+    ])
+
+
+if __name__ == "__main__":
+    # 📦 Base de janelas normalizada mais recente do LSTM intradiário
+    # - Gravada por `preparar_dados_lstm_intradiario` com os scalers do treino já aplicados
+    # - Os lotes (X, y) são montados sob demanda a partir do arquivo mapeado, sem X_treino/y_treino na RAM
+    caminho_base = ultima_base('intradiario')
+    arrays, manifesto = abrir_dataset(caminho_base)
+    comprimento_entrada = manifesto['comprimento_entrada']  # dias de entrada x candles por dia
+    comprimento_alvo = manifesto['comprimento_alvo']        # candles do dia seguinte
+    n_features = arrays['features'].shape[1]
+    n_targets = arrays['targets'].shape[1]
+
+    LSTM_model = criar_modelo(comprimento_entrada, n_features, comprimento_alvo, n_targets)
+
+    # 🧠 Compilação do modelo
+    # - Otimizador Adam, bom para problemas não estacionários como séries temporais
+    # - Função de perda MSE (erro quadrático médio), apropriado para regressão
+    LSTM_model.compile(optimizer='adam', loss='mse')
 
+    # 🚂 Treinamento do modelo em streaming
+    # - 20 épocas: número inicial para observar o desempenho
+    # - batch_size=16: menor para atualizar pesos com frequência e lidar com variação dos dados
+    # - Validação na divisão 'validacao' gravada no manifesto da base
+    historico = treinar_com_streaming(LSTM_model, caminho_base, epochs=20, batch_size=16)
 
+    # 💾 Modelo salvo junto com a base em que foi treinado
+    # - Avaliação, exportação e serviço de previsão usam os scalers, colunas e janela dessa base
+    os.makedirs(os.path.dirname(CAMINHO_MODELO), exist_ok=True)
+    LSTM_model.save(CAMINHO_MODELO)
+    registrar_dataset_modelo(CAMINHO_MODELO, caminho_base)
+    print(f"[Info] Modelo salvo em: {CAMINHO_MODELO} (base de treino: {caminho_base})")
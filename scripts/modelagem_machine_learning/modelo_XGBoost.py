@@ -0,0 +1,140 @@
+
+# @title Modelo XGBoost por target com matriz quantizada compartilhada e treino concorrente
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+"""
+Versão em módulo de `modelagem_dados_XGBoot.py` (um regressor por target: abertura, mínimo, máximo e
+fechamento), sem refazer trabalho a cada target:
+
+- as features de treino são quantizadas uma única vez (`QuantileDMatrix` com `max_bin`); a matriz de
+  cada target reaproveita esses cortes (`ref=`) e só troca o rótulo;
+- os targets são treinados ao mesmo tempo em threads (o XGBoost libera o GIL durante o treino), com
+  `tree_method='hist'` e as threads do XGBoost divididas explicitamente entre os modelos (`nthread`);
+- a previsão usa `inplace_predict` sobre o array, sem montar outra DMatrix;
+- MAE e R² são calculados uma vez por target, em NumPy, junto com o tempo de treino de cada target.
+
+Os boosters são gravados com `exportar_modelos.exportar_xgboost` (JSON nativo por target), o formato
+lido pelo runtime leve.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.modelagem_machine_learning.modelo_XGBoost
+"""
+
+FEATURES = [
+    "abertura", "minimo", "maximo", "fechamento", "SMA_10", "EMA_10",
+    "rsi", "MACD", "Signal_Line", "OBV", "fechamento_lag1", "fechamento_lag2", "fechamento_lag3",
+    "retorno_lag1", "retorno_lag2", "retorno_lag3", "volume_lag1", "volume_lag2", "volume_lag3"
+]
+TARGETS = ["abertura", "minimo", "maximo", "fechamento"]
+
+# Mesmos hiperparâmetros do script original (n_estimators=100, learning_rate=0.1, max_depth=5)
+PARAMETROS_PADRAO = {
+    'objective': 'reg:squarederror',
+    'tree_method': 'hist',
+    'max_depth': 5,
+    'eta': 0.1,
+    'seed': 42,
+}
+NUM_RODADAS = 100
+
+
+def dividir_ultimo_dia(df, features=FEATURES, targets=TARGETS):
+    """Treino até "ontem" (último dia - 1) e teste no último dia, como no script original."""
+    df = df.sort_values(['data', 'hora'])
+    ontem = df['data'].max() - pd.Timedelta(days=1)
+    treino, teste = df[df['data'] <= ontem], df[df['data'] > ontem]
+    return (
+        treino[features].to_numpy(dtype=np.float32), treino[targets].to_numpy(dtype=np.float64),
+        teste[features].to_numpy(dtype=np.float32), teste[targets].to_numpy(dtype=np.float64),
+    )
+
+
+def treinar_xgboost(X_treino, Y_treino, targets=TARGETS, parametros=None, num_rodadas=NUM_RODADAS,
+                    nthread=None, max_bin=256, features=None, verbose=True):
+    """
+    Treina um booster por target em paralelo sobre a mesma quantização das features.
+
+    Parâmetros:
+    X_treino (np.ndarray): (amostras, features).
+    Y_treino (np.ndarray): (amostras, targets).
+    nthread (int): Threads do XGBoost no total (None = todas as CPUs), divididas entre os targets.
+    features (list): Nomes das colunas de X (gravados no booster).
+
+    Retorna:
+    (dict, dict): boosters e tempos de treino (s) por target.
+    """
+    import xgboost as xgb
+
+    nthread = nthread or os.cpu_count()
+    concorrencia = min(len(targets), nthread)
+    threads_por_modelo = max(1, nthread // concorrencia)
+    parametros = {**PARAMETROS_PADRAO, **(parametros or {}), 'nthread': threads_por_modelo, 'max_bin': max_bin}
+    nomes = list(features) if features is not None else None
+
+    # Quantização (esboço dos cortes por feature) feita uma vez
+    inicio = time.perf_counter()
+    base = xgb.QuantileDMatrix(X_treino, label=Y_treino[:, 0], max_bin=max_bin, nthread=nthread,
+                               feature_names=nomes)
+    if verbose:
+        print(f"[Info] QuantileDMatrix ({X_treino.shape[0]} x {X_treino.shape[1]}, max_bin={max_bin}) "
+              f"em {time.perf_counter() - inicio:.2f} s")
+
+    def treinar(i):
+        inicio = time.perf_counter()
+        matriz = base if i == 0 else xgb.QuantileDMatrix(
+            X_treino, label=Y_treino[:, i], ref=base, nthread=threads_por_modelo, feature_names=nomes
+        )
+        booster = xgb.train(parametros, matriz, num_boost_round=num_rodadas)
+        return booster, time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(concorrencia) as executor:
+        resultados = list(executor.map(treinar, range(len(targets))))
+
+    boosters = {target: booster for target, (booster, _) in zip(targets, resultados)}
+    tempos = {target: tempo for target, (_, tempo) in zip(targets, resultados)}
+    return boosters, tempos
+
+
+def prever_xgboost(boosters, X, targets=TARGETS):
+    """(amostras, targets) com `inplace_predict` (sem DMatrix)."""
+    return np.column_stack([boosters[target].inplace_predict(X) for target in targets])
+
+
+def calcular_metricas(Y, P, targets=TARGETS, tempos=None):
+    """MAE e R² por target (uma passada por coluna), com o tempo de treino se informado."""
+    erro = P - Y
+    sst = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+    metricas = pd.DataFrame({
+        'target': list(targets),
+        'mae': np.abs(erro).mean(axis=0),
+        'r2': np.where(sst > 0, 1 - (erro ** 2).sum(axis=0) / np.where(sst > 0, sst, 1), np.nan),
+    })
+    if tempos is not None:
+        metricas['tempo_treino_s'] = [tempos[target] for target in targets]
+    return metricas
+
+
+if __name__ == "__main__":
+    from scripts.modelagem_machine_learning.exportar_modelos import DIR_EXPORTADOS, exportar_xgboost
+
+    df = pd.read_csv('/content/Piloto_Day_Trade/data/dados_transformados_recentes.csv', parse_dates=["data"])
+
+    # Remover datas específicas do dataset
+    datas_excluir = ['2025-03-28', '2025-03-27']
+    df = df[~df['data'].dt.strftime('%Y-%m-%d').isin(datas_excluir)]
+
+    X_treino, Y_treino, X_teste, Y_teste = dividir_ultimo_dia(df)
+    boosters, tempos = treinar_xgboost(X_treino, Y_treino, features=FEATURES)
+    previsoes = prever_xgboost(boosters, X_teste)
+
+    print(f"\n📅 Data prevista: {df['data'].max().strftime('%Y-%m-%d')}")
+    print("\n📈 Métricas e tempo de treino por target:")
+    print(calcular_metricas(Y_teste, previsoes, tempos=tempos).to_string(index=False))
+
+    exportar_xgboost(boosters, FEATURES, os.path.join(DIR_EXPORTADOS, 'XGBoost'))
@@ -0,0 +1,224 @@
+
+# @title Entrada em streaming para o treino dos modelos LSTM (janelas montadas sob demanda)
+
+import os
+import queue
+import threading
+
+import numpy as np
+
+from scripts.modelagem_machine_learning.dataset_mmap import (
+    DIR_DATASETS, abrir_dataset, carregar_manifesto_dataset, limites_divisao, salvar_dataset
+)
+from scripts.modelagem_machine_learning.sequencias import (
+    indice_dias, posicoes_intradiarias, posicoes_proximo_dia
+)
+
+"""
+Em vez de materializar X (amostras, timesteps, features) — que repete cada candle em várias janelas
+e limita o histórico ao tamanho da RAM —, o treino lê de uma "base de janelas":
+
+- `features` (candles, n_features) e `targets` (candles, n_targets): a tabela de candles ordenada por
+  dia, gravada uma vez como dataset mapeável em memória (`dataset_mmap.py`);
+- `inicio_entrada` / `inicio_alvo`: a linha onde começa a entrada e o alvo de cada amostra;
+- no manifesto, `comprimento_entrada` e `comprimento_alvo` (linhas por entrada/alvo), o tipo de
+  modelo e os caminhos dos scalers (`registro_scalers.py`) aplicados antes da gravação.
+
+As bases são gravadas pelos scripts de preparação (`preparar_dados_modelagem_LSTM_global.py` e
+`..._intradiario.py`) com as colunas já normalizadas pelos scalers ajustados no treino; o treino
+(`criar_modelo_LSTM.treinar_com_streaming`, `busca_hiperparametros.ObjetivoLSTM`) recusa uma base
+sem scalers no manifesto.
+
+Cada lote é montado na hora com uma indexação vetorizada sobre o arquivo mapeado, então a memória
+fica proporcional ao lote, e não ao histórico:
+- `criar_tf_dataset`: `tf.data` com embaralhamento dos índices, lote, `map` paralelo e `prefetch`;
+- `gerar_lotes`: o mesmo sem TensorFlow (gerador com pré-carregamento em uma thread).
+"""
+
+NOME_BASE = 'lstm_base_janelas'
+
+
+def base_intradiaria(df, colunas_features, colunas_targets, dias_entrada=3, n_pontos_dia=98):
+    """
+    Base de janelas do LSTM intradiário (`dias_entrada` dias -> todos os candles do dia seguinte).
+    As colunas de `df` são gravadas como estão: passe-as já normalizadas.
+    """
+    ordem, dias, inicios, fins = indice_dias(df['data'].to_numpy())
+    inicio_entrada, inicio_alvo, dias_alvo = posicoes_intradiarias(inicios, fins, dias_entrada, n_pontos_dia)
+    arrays = {
+        'features': df[colunas_features].to_numpy(dtype=np.float32)[ordem],
+        'targets': df[colunas_targets].to_numpy(dtype=np.float32)[ordem],
+        'inicio_entrada': inicio_entrada,
+        'inicio_alvo': inicio_alvo,
+    }
+    return arrays, {
+        'comprimento_entrada': dias_entrada * n_pontos_dia,
+        'comprimento_alvo': n_pontos_dia,
+        'dias_entrada': dias_entrada,
+        'n_pontos_dia': n_pontos_dia,
+        'datas': [str(d) for d in dias[dias_alvo]],
+    }
+
+
+def base_global(df, colunas_features, colunas_targets, janela=16):
+    """
+    Base de janelas do LSTM global (últimos `janela` candles -> primeiro candle do dia seguinte).
+    As colunas de `df` são gravadas como estão: passe-as já normalizadas.
+    """
+    ordem, dias, inicios, fins = indice_dias(df['data'].to_numpy())
+    fins_entrada, posicoes_alvo = posicoes_proximo_dia(inicios, fins, janela)
+    dia_alvo = np.searchsorted(inicios, posicoes_alvo)
+    arrays = {
+        'features': df[colunas_features].to_numpy(dtype=np.float32)[ordem],
+        'targets': df[colunas_targets].to_numpy(dtype=np.float32)[ordem],
+        'inicio_entrada': fins_entrada - janela,
+        'inicio_alvo': posicoes_alvo,
+    }
+    return arrays, {
+        'comprimento_entrada': janela,
+        'comprimento_alvo': None,
+        'datas': [str(d) for d in dias[dia_alvo]],
+    }
+
+
+def salvar_base(arrays, parametros, colunas_features, colunas_targets, dir_datasets=DIR_DATASETS,
+                test_size=0.2, val_size=0.1, scalers=None, **metadados):
+    """
+    Grava a base de janelas com as divisões treino/validação/teste sobre as amostras.
+
+    Parâmetros:
+    scalers (dict): {'features': caminho, 'targets': caminho} dos scalers já aplicados às colunas;
+        sem eles a base só serve para medições (o treino a recusa).
+    """
+    divisoes = limites_divisao(len(arrays['inicio_entrada']), test_size, val_size)
+    return salvar_dataset(
+        arrays, NOME_BASE, dir_datasets,
+        features=list(colunas_features), targets=list(colunas_targets),
+        divisoes=divisoes, scalers=dict(scalers or {}), **parametros, **metadados
+    )
+
+
+def verificar_normalizada(manifesto, caminho):
+    """ValueError se a base não registra os scalers de features e targets aplicados antes da gravação."""
+    if not {'features', 'targets'} <= set(manifesto.get('scalers', {})):
+        raise ValueError(f"A base {caminho} não tem scalers no manifesto (dados não normalizados); "
+                         f"grave-a pelos scripts de preparação do LSTM.")
+
+
+def ultima_base(modelo=None, dir_datasets=DIR_DATASETS):
+    """Base de janelas normalizada mais recente em `dir_datasets` ('global' ou 'intradiario'; None = qualquer)."""
+    candidatos = []
+    for nome in os.listdir(dir_datasets) if os.path.isdir(dir_datasets) else []:
+        caminho = os.path.join(dir_datasets, nome)
+        if not nome.startswith(f"{NOME_BASE}-") or not os.path.exists(os.path.join(caminho, 'manifesto.json')):
+            continue
+        manifesto = carregar_manifesto_dataset(caminho)
+        if manifesto.get('scalers') and (modelo is None or manifesto.get('modelo') == modelo):
+            candidatos.append(caminho)
+    if not candidatos:
+        raise FileNotFoundError(f"Nenhuma base de janelas normalizada ({modelo or 'qualquer modelo'}) em {dir_datasets}.")
+    return max(candidatos, key=os.path.getmtime)
+
+
+def montar_lote(features, targets, inicio_entrada, inicio_alvo, comprimento_entrada, comprimento_alvo=None):
+    """X (lote, comprimento_entrada, n_features) e y (lote, comprimento_alvo, n_targets) ou (lote, n_targets)."""
+    linhas = inicio_entrada[:, None] + np.arange(comprimento_entrada)
+    X = np.asarray(features[linhas.ravel()]).reshape(len(inicio_entrada), comprimento_entrada, -1)
+    if comprimento_alvo is None:
+        return X, np.asarray(targets[inicio_alvo])
+    linhas_alvo = (inicio_alvo[:, None] + np.arange(comprimento_alvo)).ravel()
+    y = np.asarray(targets[linhas_alvo]).reshape(len(inicio_alvo), comprimento_alvo, -1)
+    return X, y
+
+
+def _amostras(arrays, manifesto, divisao):
+    inicio_entrada, inicio_alvo = arrays['inicio_entrada'], arrays['inicio_alvo']
+    if divisao is not None:
+        inicio, fim = manifesto['divisoes'][divisao]
+        inicio_entrada, inicio_alvo = inicio_entrada[inicio:fim], inicio_alvo[inicio:fim]
+    return np.asarray(inicio_entrada), np.asarray(inicio_alvo)
+
+
+def gerar_lotes(caminho, divisao=None, tamanho_lote=32, embaralhar=False, semente=None, prefetch=2):
+    """
+    Lotes (X, y) montados sob demanda a partir da base mapeada, sem TensorFlow. Uma thread monta os
+    próximos `prefetch` lotes enquanto o atual é consumido; um erro na montagem é relançado no
+    consumidor, e fechar o gerador antes do fim encerra a thread.
+    """
+    arrays, manifesto = abrir_dataset(caminho)
+    inicio_entrada, inicio_alvo = _amostras(arrays, manifesto, divisao)
+    ordem = np.arange(len(inicio_entrada))
+    if embaralhar:
+        np.random.default_rng(semente).shuffle(ordem)
+
+    fila = queue.Queue(maxsize=prefetch)
+    fim_da_fila = object()
+    parar = threading.Event()
+
+    def colocar(item):
+        # Espera por espaço na fila, mas desiste se o consumidor já parou
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produzir():
+        ultimo = fim_da_fila
+        try:
+            for inicio in range(0, len(ordem), tamanho_lote):
+                lote = ordem[inicio:inicio + tamanho_lote]
+                if not colocar(montar_lote(
+                    arrays['features'], arrays['targets'], inicio_entrada[lote], inicio_alvo[lote],
+                    manifesto['comprimento_entrada'], manifesto['comprimento_alvo']
+                )):
+                    return
+        except Exception as erro:
+            ultimo = erro
+        finally:
+            colocar(ultimo)
+
+    produtor = threading.Thread(target=produzir, daemon=True)
+    produtor.start()
+    try:
+        while (lote := fila.get()) is not fim_da_fila:
+            if isinstance(lote, Exception):
+                raise lote
+            yield lote
+    finally:
+        parar.set()
+        produtor.join()
+
+
+def criar_tf_dataset(caminho, divisao=None, tamanho_lote=32, embaralhar=False, semente=None):
+    """
+    `tf.data.Dataset` de lotes (X, y) montados sob demanda a partir da base mapeada: os índices das
+    amostras são embaralhados e agrupados em lotes, e cada lote é montado por um `map` paralelo
+    (`tf.numpy_function` sobre o arquivo mapeado) com `prefetch`.
+    """
+    import tensorflow as tf
+
+    arrays, manifesto = abrir_dataset(caminho)
+    inicio_entrada, inicio_alvo = _amostras(arrays, manifesto, divisao)
+    features, targets = arrays['features'], arrays['targets']
+    comprimento_entrada, comprimento_alvo = manifesto['comprimento_entrada'], manifesto['comprimento_alvo']
+
+    def montar(entradas, alvos):
+        return montar_lote(features, targets, entradas, alvos, comprimento_entrada, comprimento_alvo)
+
+    def montar_tf(entradas, alvos):
+        X, y = tf.numpy_function(montar, [entradas, alvos], (tf.float32, tf.float32))
+        X.set_shape([None, comprimento_entrada, features.shape[1]])
+        y.set_shape([None, targets.shape[1]] if comprimento_alvo is None else [None, comprimento_alvo, targets.shape[1]])
+        return X, y
+
+    dataset = tf.data.Dataset.from_tensor_slices((inicio_entrada, inicio_alvo))
+    if embaralhar:
+        dataset = dataset.shuffle(len(inicio_entrada), seed=semente, reshuffle_each_iteration=True)
+    return (
+        dataset.batch(tamanho_lote)
+        .map(montar_tf, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not embaralhar)
+        .prefetch(tf.data.AUTOTUNE)
+    )
@@ -3,90 +3,117 @@
 
 import pandas as pd
 import numpy as np
-import joblib
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
 
-def preparar_dados_lstm_global(df, janela=16, test_size=0.2, val_size=0.1):
+from scripts.modelagem_machine_learning.dataset_mmap import DIR_DATASETS, limites_divisao, salvar_dataset
+from scripts.modelagem_machine_learning.pipeline_entrada import base_global, salvar_base
+from scripts.modelagem_machine_learning.registro_scalers import DIR_SCALERS, ajustar_scaler
+from scripts.modelagem_machine_learning.sequencias import (
+    amostras_proximo_dia, indice_dias, lotes_proximo_dia, memoria_mb, posicoes_proximo_dia
+)
+from scripts.pipeline.armazenamento import TICKER_PADRAO, ler_etapa
+
+# Colunas usadas pelo modelo global
+FEATURES = [
+    'abertura', 'minimo', 'maximo', 'fechamento', 'volume',
+    'SMA_10', 'EMA_10', 'OBV', 'retorno', 'volatilidade',
+    'MACD', 'Signal_Line', 'rsi', 'ADX', 'BB_MA20', 'BB_STD20',
+    'BB_upper', 'BB_lower', '%K', '%D', 'CCI', 'ATR',
+    'fechamento_lag1', 'retorno_lag1', 'volume_lag1',
+    'fechamento_lag2', 'retorno_lag2', 'volume_lag2',
+    'fechamento_lag3', 'retorno_lag3', 'volume_lag3',
+    'hora_num', 'minuto'
+]
+TARGETS = ['minimo_dia', 'maximo_dia', 'fechamento_dia', 'volume_dia']
+
+def preparar_dados_lstm_global(df, janela=16, test_size=0.2, val_size=0.1, dir_datasets=DIR_DATASETS,
+                               ticker=TICKER_PADRAO, dir_scalers=DIR_SCALERS):
     """
     Prepara os dados para um modelo LSTM prever os alvos globais do próximo dia (mínimo, máximo, fechamento, volume),
     usando sequências de candles intradiários (ex: 5 em 5 minutos) do(s) dia(s) anterior(es).
+
+    X e y são gravados uma única vez como dataset mapeável em memória (`dataset_mmap.py`), com as
+    divisões treino/validação/teste no manifesto; os splits retornados são fatias desses arrays.
+    A base de janelas do treino em streaming (`pipeline_entrada.py`) é gravada com as mesmas
+    colunas normalizadas e os caminhos dos scalers no manifesto.
     """
 
     # Ordenar temporalmente
     df = df.sort_values(['data', 'hora']).reset_index(drop=True)
 
     # Definir colunas
-    features = [
-        'abertura', 'minimo', 'maximo', 'fechamento', 'volume',
-        'SMA_10', 'EMA_10', 'OBV', 'retorno', 'volatilidade',
-        'MACD', 'Signal_Line', 'rsi', 'ADX', 'BB_MA20', 'BB_STD20',
-        'BB_upper', 'BB_lower', '%K', '%D', 'CCI', 'ATR',
-        'fechamento_lag1', 'retorno_lag1', 'volume_lag1',
-        'fechamento_lag2', 'retorno_lag2', 'volume_lag2',
-        'fechamento_lag3', 'retorno_lag3', 'volume_lag3',
-        'hora_num', 'minuto'
-    ]
-    targets = ['minimo_dia', 'maximo_dia', 'fechamento_dia', 'volume_dia']
-
-    # Normalização
-    scaler_features = MinMaxScaler()
-    scaler_targets = MinMaxScaler()
-    X_scaled = scaler_features.fit_transform(df[features])
-    y_scaled = scaler_targets.fit_transform(df[targets])
-
-    # Construir DataFrames auxiliares
-    df_seq = pd.DataFrame(X_scaled, columns=features)
-    df_seq['data'] = df['data'].values
-    df_targets = pd.DataFrame(y_scaled, columns=targets)
-    df_targets['data'] = df['data'].values
-
-    # Geração de sequências por dia
-    X, y = [], []
-    dias_unicos = df_seq['data'].unique()
-    for i in range(len(dias_unicos) - 1):
-        dia = dias_unicos[i]
-        proximo = dias_unicos[i + 1]
-
-        dados_dia = df_seq[df_seq['data'] == dia].drop(columns='data')
-        alvo_proximo = df_targets[df_targets['data'] == proximo][targets]
-
-        if len(dados_dia) >= janela and not alvo_proximo.empty:
-            X.append(dados_dia.iloc[-janela:].values)
-            y.append(alvo_proximo.iloc[0].values)
-
-    X = np.array(X)
-    y = np.array(y)
-
-    # Salvar dados completos antes do split
-    np.savez_compressed(
-        '/content/Piloto_Day_Trade/models/LSTM/lstm_global_dataset_completo.npz',
-        X=X, y=y
-    )
-
-    # Split sem embaralhar
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, shuffle=False)
-    X_train, X_val, y_train, y_val = train_test_split(X_train, y_train, test_size=val_size, shuffle=False)
-
-    # Salvar splits
-    np.savez_compressed(
-        '/content/Piloto_Day_Trade/models/LSTM/lstm_global_datasets.npz',
-        X_train=X_train, X_val=X_val, X_test=X_test,
-        y_train=y_train, y_val=y_val, y_test=y_test
+    features = FEATURES
+    targets = TARGETS
+
+    # Índice de deslocamentos por dia e divisão sem embaralhar (mesmos tamanhos de
+    # train_test_split(shuffle=False)); não dependem da normalização
+    _, _, inicios, fins = indice_dias(df['data'].to_numpy())
+    fins_entrada, posicoes_alvo = posicoes_proximo_dia(inicios, fins, janela)
+    divisoes = limites_divisao(len(fins_entrada), test_size, val_size)
+    if divisoes['treino'][1] == 0:
+        raise ValueError("Amostras insuficientes para formar o conjunto de treino.")
+
+    # Normalização ajustada só com as linhas até o alvo da última amostra de treino (sem vazamento
+    # de validação/teste); o mesmo treino reaproveita o scaler já gravado
+    fim_treino = posicoes_alvo[divisoes['treino'][1] - 1] + 1
+    df_treino = df.iloc[:fim_treino]
+    scaler_features, caminho_scaler_features = ajustar_scaler(df_treino, features, 'features', ticker, dir_scalers)
+    scaler_targets, caminho_scaler_targets = ajustar_scaler(df_treino, targets, 'targets', ticker, dir_scalers)
+    X_scaled = scaler_features.transform(df[features])
+    y_scaled = scaler_targets.transform(df[targets])
+    scalers = {'features': caminho_scaler_features, 'targets': caminho_scaler_targets}
+
+    # Base de janelas (tabela de candles normalizada + índices) para o treino em streaming
+    df_normalizado = pd.concat([
+        df[['data']], pd.DataFrame(X_scaled, columns=features), pd.DataFrame(y_scaled, columns=targets)
+    ], axis=1)
+    arrays_base, parametros_base = base_global(df_normalizado, features, targets, janela)
+    caminho_base = salvar_base(arrays_base, parametros_base, features, targets, dir_datasets, test_size, val_size,
+                               scalers=scalers, ticker=ticker, modelo='global')
+    del df_normalizado, arrays_base
+
+    # Cada amostra é uma fatia do índice, montadas todas de uma vez
+    X, y = amostras_proximo_dia(X_scaled, y_scaled, fins_entrada, posicoes_alvo, janela)
+    print(f"X {X.shape}: {memoria_mb(X):.1f} MB | y {y.shape}: {memoria_mb(y):.1f} MB")
+
+    X_train, X_val, X_test = (X[inicio:fim] for inicio, fim in divisoes.values())
+    y_train, y_val, y_test = (y[inicio:fim] for inicio, fim in divisoes.values())
+
+    # Salvar dataset (float32, sem compressão, abre com np.load(mmap_mode='r'))
+    datas_amostras = pd.to_datetime(df['data'].to_numpy()[posicoes_alvo]).strftime('%Y-%m-%d').tolist()
+    caminho_dataset = salvar_dataset(
+        {'X': X, 'y': y}, 'lstm_global', dir_datasets,
+        ticker=ticker, features=features, targets=targets, janela=janela,
+        scalers=scalers, datas=datas_amostras, divisoes=divisoes
     )
 
-    # Salvar scalers
-    joblib.dump(scaler_features, '/content/Piloto_Day_Trade/models/LSTM/scaler_features_lstm_global.save')
-    joblib.dump(scaler_targets, '/content/Piloto_Day_Trade/models/LSTM/scaler_targets_lstm_global.save')
-
     return X_train, X_val, X_test, y_train, y_val, y_test, {
         'scaler_features': scaler_features,
-        'scaler_targets': scaler_targets
+        'scaler_targets': scaler_targets,
+        'caminho_dataset': caminho_dataset,
+        'caminho_base': caminho_base
     }
 
+def gerar_lotes_lstm_global(df, scaler_features, scaler_targets, janela=16, tamanho_lote=1024):
+    """
+    Mesmas amostras de `preparar_dados_lstm_global`, geradas em lotes (X, y) de até `tamanho_lote`
+    amostras com scalers já ajustados, para universos grandes que não cabem inteiros na memória.
+    """
+    df = df.sort_values(['data', 'hora']).reset_index(drop=True)
+    X_scaled = scaler_features.transform(df[FEATURES])
+    y_scaled = scaler_targets.transform(df[TARGETS])
+
+    _, _, inicios, fins = indice_dias(df['data'].to_numpy())
+    fins_entrada, posicoes_alvo = posicoes_proximo_dia(inicios, fins, janela)
+    yield from lotes_proximo_dia(X_scaled, y_scaled, fins_entrada, posicoes_alvo, janela, tamanho_lote)
+
 # Bloco de teste local (não roda se importado)
 if __name__ == "__main__":
-    df_transformado = pd.read_csv('/content/Piloto_Day_Trade/data/transformed/dados_transformados.csv')
+    # Lê apenas as colunas usadas pelo modelo (no Parquet, as demais não são lidas do disco)
+    df_transformado = ler_etapa(
+        '/content/Piloto_Day_Trade/data/transformed/dados_transformados',
+        'transformado',
+        colunas=['data', 'hora'] + FEATURES + TARGETS
+    )
     X_train, X_val, X_test, y_train, y_val, y_test, scalers = preparar_dados_lstm_global(df_transformado)
 
     print("Pré-visualização de uma sequência de entrada normalizada:")
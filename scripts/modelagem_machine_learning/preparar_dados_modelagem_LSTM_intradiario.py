@@ -2,10 +2,17 @@
 import os
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
 from collections import Counter
-import joblib
-import datetime
+
+from scripts.modelagem_machine_learning.dataset_mmap import DIR_DATASETS, limites_divisao, salvar_dataset
+from scripts.modelagem_machine_learning.pipeline_entrada import base_intradiaria, salvar_base
+from scripts.modelagem_machine_learning.registro_scalers import (
+    DIR_SCALERS, ajustar_scaler, carregar_scaler, ultimo_scaler
+)
+from scripts.modelagem_machine_learning.sequencias import (
+    indice_dias, posicoes_intradiarias, sequencias_intradiarias
+)
+from scripts.pipeline.armazenamento import TICKER_PADRAO, ler_etapa
 
 def preparar_dados_lstm_intradiario(
     df: pd.DataFrame,
@@ -13,9 +20,21 @@ def preparar_dados_lstm_intradiario(
     colunas_targets: list,
     dias_entrada: int = 3,
     n_pontos_dia: int = None,
-    verbose: bool = True
+    verbose: bool = True,
+    dir_datasets: str = DIR_DATASETS,
+    ticker: str = TICKER_PADRAO,
+    test_size: float = 0.2,
+    val_size: float = 0.1,
+    dir_scalers: str = DIR_SCALERS
 ):
-  
+    """
+    Monta as amostras do LSTM intradiário (`dias_entrada` dias completos -> candles do dia seguinte).
+
+    Os scalers são ajustados só com os dias até o último dia alvo do treino (divisão sem embaralhar,
+    gravada no manifesto do dataset) e versionados no registro de scalers (`registro_scalers.py`).
+    Além do dataset com X e y, grava a base de janelas normalizada do treino em streaming
+    (`pipeline_entrada.py`), com os caminhos dos scalers no manifesto.
+    """
     df = df.copy()
 
     if "data" not in df.columns:
@@ -37,20 +56,20 @@ def preparar_dados_lstm_intradiario(
     if verbose:
         print(f"[Info] Detectado {n_pontos_dia} candles por dia.")
 
-    scaler_features = MinMaxScaler()
-    scaler_targets = MinMaxScaler()
-
-    if not np.allclose(df[colunas_features].max(), 1.0, atol=1e-2):
-        df[colunas_features] = scaler_features.fit_transform(df[colunas_features])
-    else:
-        if verbose:
-            print("[Info] As colunas de features parecem já estar normalizadas.")
-
-    if not np.allclose(df[colunas_targets].max(), 1.0, atol=1e-2):
-        df[colunas_targets] = scaler_targets.fit_transform(df[colunas_targets])
-    else:
-        if verbose:
-            print("[Info] As colunas de targets parecem já estar normalizadas.")
+    # Divisão por dia alvo, sem embaralhar; as amostras válidas saem do índice de dias, antes da normalização
+    _, dias, inicios, fins = indice_dias(df["data"].to_numpy())
+    _, _, indices_validos = posicoes_intradiarias(inicios, fins, dias_entrada, n_pontos_dia)
+    datas_validas = dias[indices_validos].tolist()
+    divisoes = limites_divisao(len(datas_validas), test_size, val_size)
+    if divisoes['treino'][1] == 0:
+        raise ValueError("Amostras insuficientes para formar o conjunto de treino.")
+
+    # Scalers ajustados só com os dias até o último alvo de treino (sem vazamento de validação/teste)
+    df_treino = df[df["data"] <= datas_validas[divisoes['treino'][1] - 1]]
+    scaler_features, caminho_scaler_features = ajustar_scaler(df_treino, colunas_features, 'features', ticker, dir_scalers)
+    scaler_targets, caminho_scaler_targets = ajustar_scaler(df_treino, colunas_targets, 'targets', ticker, dir_scalers)
+    df[colunas_features] = scaler_features.transform(df[colunas_features])
+    df[colunas_targets] = scaler_targets.transform(df[colunas_targets])
 
     path_norm = '/content/Piloto_Day_Trade/data/prepared/dados_normalizados.csv'
     os.makedirs(os.path.dirname(path_norm), exist_ok=True)
@@ -58,65 +77,44 @@ def preparar_dados_lstm_intradiario(
     if verbose:
         print(f"[Info] Dados normalizados salvos em: {path_norm}")
 
-    scaler_path = '/content/Piloto_Day_Trade/models/LSTM'
-    os.makedirs(scaler_path, exist_ok=True)
-    joblib.dump(scaler_features, os.path.join(scaler_path, 'scaler_features.pkl'))
-    joblib.dump(scaler_targets, os.path.join(scaler_path, 'scaler_targets.pkl'))
+    scalers = {'features': caminho_scaler_features, 'targets': caminho_scaler_targets}
+    arrays_base, parametros_base = base_intradiaria(df, colunas_features, colunas_targets, dias_entrada, n_pontos_dia)
+    caminho_base = salvar_base(arrays_base, parametros_base, colunas_features, colunas_targets, dir_datasets,
+                               test_size, val_size, scalers=scalers, ticker=ticker, modelo='intradiario')
+    del arrays_base
+    if verbose:
+        print(f"[Info] Base de janelas normalizada salva em: {caminho_base}")
+
+    # Cubo (dias, candles, colunas) montado uma vez; as janelas de dias são views sem cópia
+    X_janelas, y_janelas, dias_alvo, validas = sequencias_intradiarias(
+        df, colunas_features, colunas_targets, dias_entrada, n_pontos_dia
+    )
+
     if verbose:
-        print(f"[Info] Scalers salvos em: {scaler_path}")
-
-    dias_unicos = sorted(df["data"].unique())
-    X, y, datas_validas = [], [], []
-
-    for i in range(dias_entrada, len(dias_unicos)):
-        dias_passados = dias_unicos[i - dias_entrada:i]
-        dia_target = dias_unicos[i]
-
-        entradas = []
-        sequencia_valida = True
-
-        for dia in dias_passados:
-            dados_dia = df[df["data"] == dia][colunas_features].values
-            if len(dados_dia) != n_pontos_dia:
-                sequencia_valida = False
-                break
-            entradas.append(dados_dia)
-
-        saida = df[df["data"] == dia_target][colunas_targets].values
-        if len(saida) != n_pontos_dia:
-            sequencia_valida = False
-
-        if sequencia_valida:
-            X.append(np.vstack(entradas))
-            y.append(saida)
-            datas_validas.append(dia_target)
-        elif verbose:
+        for dia_target in dias_alvo[~validas]:
             print(f"[Aviso] Ignorado: {dia_target} com sequência incompleta.")
 
-    X = np.array(X)
-    y = np.array(y)
+    # Só as amostras válidas são copiadas
+    X = X_janelas[validas]
+    y = y_janelas[validas]
 
     if verbose:
         print(f"[Info] X shape: {X.shape}, y shape: {y.shape}, Amostras válidas: {len(datas_validas)}")
         print("[Info] Preparação finalizada com sucesso.")
 
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M')
-    np.save(os.path.join(scaler_path, f'X_{timestamp}.npy'), X)
-    np.save(os.path.join(scaler_path, f'y_{timestamp}.npy'), y)
-
-    with open(os.path.join(scaler_path, f'datas_validas_{timestamp}.txt'), 'w') as f:
-        for d in datas_validas:
-            f.write(f"{d}\n")
+    # Dataset float32 mapeável em memória; o mesmo conteúdo reaproveita o diretório existente
+    salvar_dataset(
+        {'X': X, 'y': y}, 'lstm_intradiario', dir_datasets,
+        features=colunas_features, targets=colunas_targets,
+        ticker=ticker, dias_entrada=dias_entrada, n_pontos_dia=int(n_pontos_dia),
+        scalers=scalers, datas=datas_validas, divisoes=divisoes
+    )
 
     return X, y, datas_validas
 
 
 if __name__ == "__main__":
-    caminho_dados = '/content/Piloto_Day_Trade/data/transformed/dados_transformados.csv'
-    caminho_scaler_features = '/content/Piloto_Day_Trade/models/LSTM/scaler_features.pkl'
-    caminho_scaler_targets = '/content/Piloto_Day_Trade/models/LSTM/scaler_targets.pkl'
-
-    df_transformado = pd.read_csv(caminho_dados)
+    caminho_dados = '/content/Piloto_Day_Trade/data/transformed/dados_transformados'
 
     colunas_features = [
         'abertura', 'minimo', 'maximo', 'fechamento', 'volume',
@@ -126,6 +124,12 @@ if __name__ == "__main__":
     ]
     colunas_targets = ['minimo_dia', 'maximo_dia', 'fechamento_dia', 'volume_dia']
 
+    # Lê apenas as colunas usadas pelo modelo (no Parquet, as demais não são lidas do disco)
+    df_transformado = ler_etapa(
+        caminho_dados, 'transformado',
+        colunas=['data', 'hora'] + colunas_features + colunas_targets
+    )
+
     X, y, datas = preparar_dados_lstm_intradiario(
         df=df_transformado,
         colunas_features=colunas_features,
@@ -140,6 +144,7 @@ if __name__ == "__main__":
     print(f"Amostras válidas: {len(datas)}")
     print(f"Primeira data válida: {datas[0] if datas else 'Nenhuma'}")
 
-    scaler_features = joblib.load(caminho_scaler_features)
-    scaler_targets = joblib.load(caminho_scaler_targets)
+    # Versão mais recente registrada para este ticker e conjunto de colunas
+    scaler_features = carregar_scaler(ultimo_scaler('features', colunas_features))
+    scaler_targets = carregar_scaler(ultimo_scaler('targets', colunas_targets))
     print("\n[Info] Scalers carregados com sucesso.")
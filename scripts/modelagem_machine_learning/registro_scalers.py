@@ -0,0 +1,111 @@
+
+# @title Registro de scalers versionados por ticker, conjunto de colunas e dados de treino
+
+import hashlib
+import json
+import os
+import threading
+
+import joblib
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from scripts.pipeline.armazenamento import TICKER_PADRAO
+from scripts.pipeline.manifesto_pipeline import trava_arquivo
+
+"""
+Os scalers são ajustados apenas com as linhas do conjunto de treino e gravados com um nome que
+identifica exatamente o que foi usado no ajuste:
+
+    <dir_scalers>/<ticker>/<tipo>-<hash das colunas>-<hash dos dados de treino>.pkl
+
+- Preparar de novo com os mesmos dados de treino encontra o arquivo e não reajusta nada.
+- Dados de treino diferentes geram uma nova versão, sem sobrescrever a usada por modelos anteriores.
+- O caminho do scaler vai para o manifesto do dataset (`dataset_mmap.py`), então a avaliação e a
+  inferência carregam o scaler que corresponde ao dataset, em vez de um caminho fixo.
+- `registro.json` guarda a última versão por ticker/tipo/colunas.
+"""
+
+DIR_SCALERS = '/content/Piloto_Day_Trade/models/LSTM/scalers'
+
+_TRAVA = threading.Lock()
+_CARREGADOS = {}
+
+
+def _hash_colunas(colunas):
+    return hashlib.sha1('|'.join(colunas).encode('utf-8')).hexdigest()[:8]
+
+
+def _hash_dados(df):
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:12]
+
+
+def _atualizar_registro(dir_scalers, ticker, tipo, colunas, caminho):
+    arquivo = os.path.join(dir_scalers, 'registro.json')
+    with _TRAVA, trava_arquivo(arquivo):
+        registro = {}
+        if os.path.exists(arquivo):
+            with open(arquivo, encoding='utf-8') as f:
+                registro = json.load(f)
+        registro.setdefault(ticker, {})[f"{tipo}-{_hash_colunas(colunas)}"] = {
+            'colunas': list(colunas), 'caminho': caminho
+        }
+        temporario = f"{arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(registro, f, indent=2)
+        os.replace(temporario, arquivo)
+
+
+def ajustar_scaler(df_treino, colunas, tipo, ticker=TICKER_PADRAO, dir_scalers=DIR_SCALERS):
+    """
+    Scaler (MinMaxScaler) das `colunas` ajustado só com `df_treino`, reaproveitado se já existir.
+
+    Parâmetros:
+    df_treino (pd.DataFrame): Linhas do período de treino.
+    tipo (str): 'features' ou 'targets' (ou outro rótulo do modelo).
+
+    Retorna:
+    (MinMaxScaler, str): scaler e caminho do arquivo.
+    """
+    colunas = list(colunas)
+    dados = df_treino[colunas]
+    nome = f"{tipo}-{_hash_colunas(colunas)}-{_hash_dados(dados)}.pkl"
+    caminho = os.path.join(dir_scalers, ticker, nome)
+
+    if os.path.exists(caminho):
+        scaler = carregar_scaler(caminho)
+        print(f"[Info] Scaler de {tipo} reaproveitado: {caminho}")
+    else:
+        scaler = MinMaxScaler().fit(dados)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        joblib.dump(scaler, temporario)
+        os.replace(temporario, caminho)
+        _CARREGADOS[caminho] = scaler
+        print(f"[Info] Scaler de {tipo} ajustado com {len(dados)} linhas de treino: {caminho}")
+
+    _atualizar_registro(dir_scalers, ticker, tipo, colunas, caminho)
+    return scaler, caminho
+
+
+def carregar_scaler(caminho):
+    """Scaler gravado (mantido em memória após a primeira leitura)."""
+    if caminho not in _CARREGADOS:
+        _CARREGADOS[caminho] = joblib.load(caminho)
+    return _CARREGADOS[caminho]
+
+
+def ultimo_scaler(tipo, colunas, ticker=TICKER_PADRAO, dir_scalers=DIR_SCALERS):
+    """Caminho da versão mais recente registrada para o ticker/tipo/colunas (ou None)."""
+    arquivo = os.path.join(dir_scalers, 'registro.json')
+    if not os.path.exists(arquivo):
+        return None
+    with open(arquivo, encoding='utf-8') as f:
+        registro = json.load(f)
+    entrada = registro.get(ticker, {}).get(f"{tipo}-{_hash_colunas(list(colunas))}")
+    return entrada['caminho'] if entrada else None
+
+
+def scalers_do_dataset(manifesto):
+    """Scalers de features e targets referenciados no manifesto de um dataset."""
+    return {tipo: carregar_scaler(caminho) for tipo, caminho in manifesto.get('scalers', {}).items()}
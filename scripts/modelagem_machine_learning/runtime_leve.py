@@ -0,0 +1,216 @@
+
+# @title Execução dos modelos exportados só com NumPy (sem TensorFlow/XGBoost)
+
+import json
+import os
+
+import numpy as np
+
+"""
+Carrega os modelos gravados por `exportar_modelos.py` e prevê apenas com NumPy, para workers de CPU
+que não devem pagar o import do TensorFlow (segundos e centenas de MB) a cada início:
+
+- LSTM: `modelo.json` com a arquitetura (camadas LSTM, Dense e Reshape; Dropout não atua na inferência) e
+  `pesos.npz` com os pesos do Keras. As entradas de todos os timesteps são projetadas de uma vez
+  (uma multiplicação de matrizes) e só a parte recorrente roda passo a passo, com o lote inteiro.
+- Scalers: `scalers.npz` com o `min_` e o `scale_` dos MinMaxScaler do dataset de treino (features e
+  targets), aplicados por `EscalaNumpy` sem importar scikit-learn/joblib.
+- XGBoost: um booster JSON nativo por target (`<target>.json`, o mesmo arquivo que
+  `xgboost.Booster.load_model` lê). As árvores são achatadas em arrays e percorridas nível a nível
+  para todas as linhas e árvores ao mesmo tempo.
+
+Uso:
+    modelo = carregar_modelo_leve('/content/Piloto_Day_Trade/models/exportados/LSTM')
+    y = modelo.predict(X)
+    escalas, colunas = carregar_escalas('/content/Piloto_Day_Trade/models/exportados/LSTM')
+"""
+
+_ATIVACOES = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+}
+
+
+def _ativacao(nome):
+    if nome not in _ATIVACOES:
+        raise ValueError(f"Ativação não suportada no runtime leve: {nome}")
+    return _ATIVACOES[nome]
+
+
+class LSTMNumpy:
+    """Sequência de camadas LSTM/Dense/Reshape com os pesos do Keras (ordem das portas: i, f, c, o)."""
+
+    def __init__(self, camadas, pesos, input_shape=None):
+        self.camadas = camadas
+        self.pesos = pesos
+        self.input_shape = tuple(input_shape) if input_shape is not None else None
+
+    def _lstm(self, x, camada, indice):
+        kernel, recorrente, bias = (self.pesos[f"{indice}_{nome}"] for nome in ('kernel', 'recurrent_kernel', 'bias'))
+        unidades = camada['units']
+        ativacao, ativacao_recorrente = _ativacao(camada['activation']), _ativacao(camada['recurrent_activation'])
+
+        n, passos, _ = x.shape
+        entradas = x @ kernel + bias
+        h = np.zeros((n, unidades), dtype=x.dtype)
+        c = np.zeros((n, unidades), dtype=x.dtype)
+        saidas = np.empty((n, passos, unidades), dtype=x.dtype) if camada['return_sequences'] else None
+
+        for t in range(passos):
+            z = entradas[:, t] + h @ recorrente
+            i = ativacao_recorrente(z[:, :unidades])
+            f = ativacao_recorrente(z[:, unidades:2 * unidades])
+            g = ativacao(z[:, 2 * unidades:3 * unidades])
+            o = ativacao_recorrente(z[:, 3 * unidades:])
+            c = f * c + i * g
+            h = o * ativacao(c)
+            if saidas is not None:
+                saidas[:, t] = h
+        return saidas if saidas is not None else h
+
+    def predict(self, X):
+        x = np.asarray(X, dtype=np.float32)
+        for indice, camada in enumerate(self.camadas):
+            if camada['tipo'] == 'lstm':
+                x = self._lstm(x, camada, indice)
+            elif camada['tipo'] == 'reshape':
+                # Como no Keras, o formato não inclui o eixo do lote
+                x = x.reshape((len(x), *camada['target_shape']))
+            else:
+                # Dense no último eixo equivale a TimeDistributed(Dense)
+                x = _ativacao(camada['activation'])(x @ self.pesos[f"{indice}_kernel"] + self.pesos[f"{indice}_bias"])
+        return x
+
+
+def _base_score(parametros):
+    # Gravado como "5E-1" ou, em versões recentes, "[5E-1]"
+    return float(str(parametros['base_score']).strip('[]'))
+
+
+class FlorestaNumpy:
+    """Árvores de um booster XGBoost (gbtree, objetivo de regressão) achatadas em arrays."""
+
+    OBJETIVOS = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:quantileerror')
+
+    def __init__(self, booster):
+        aprendiz = booster['learner']
+        objetivo = aprendiz['objective']['name']
+        if aprendiz['gradient_booster']['name'] != 'gbtree' or objetivo not in self.OBJETIVOS:
+            raise ValueError(f"Booster não suportado no runtime leve: {aprendiz['gradient_booster']['name']} / {objetivo}")
+
+        self.base = _base_score(aprendiz['learner_model_param'])
+        arvores = aprendiz['gradient_booster']['model']['trees']
+
+        esquerda, direita, feature, limiar, padrao_esquerda, raizes = [], [], [], [], [], []
+        deslocamento = 0
+        for arvore in arvores:
+            esq = np.asarray(arvore['left_children'], dtype=np.int64)
+            dir_ = np.asarray(arvore['right_children'], dtype=np.int64)
+            folha = esq == -1
+            proprios = np.arange(len(esq)) + deslocamento
+            # Folhas apontam para si mesmas: percorrer mais níveis não muda o resultado
+            esquerda.append(np.where(folha, proprios, esq + deslocamento))
+            direita.append(np.where(folha, proprios, dir_ + deslocamento))
+            feature.append(np.where(folha, 0, arvore['split_indices']))
+            # Nas folhas, `split_conditions` guarda o valor da folha
+            limiar.append(np.asarray(arvore['split_conditions'], dtype=np.float32))
+            padrao_esquerda.append(np.asarray(arvore['default_left'], dtype=bool))
+            raizes.append(deslocamento)
+            deslocamento += len(esq)
+
+        self.esquerda = np.concatenate(esquerda)
+        self.direita = np.concatenate(direita)
+        self.feature = np.concatenate(feature)
+        self.limiar = np.concatenate(limiar)
+        self.padrao_esquerda = np.concatenate(padrao_esquerda)
+        self.raizes = np.asarray(raizes, dtype=np.int64)
+        self.profundidade = self._profundidade_maxima()
+
+    def _profundidade_maxima(self):
+        nos = self.raizes
+        profundidade = 0
+        while True:
+            filhos = np.concatenate([self.esquerda[nos], self.direita[nos]])
+            filhos = filhos[filhos != np.concatenate([nos, nos])]
+            if len(filhos) == 0:
+                return profundidade
+            nos = filhos
+            profundidade += 1
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        linhas = np.arange(len(X))[:, None]
+        nos = np.broadcast_to(self.raizes, (len(X), len(self.raizes)))
+        for _ in range(self.profundidade):
+            valores = X[linhas, self.feature[nos]]
+            ir_esquerda = np.where(np.isnan(valores), self.padrao_esquerda[nos], valores < self.limiar[nos])
+            nos = np.where(ir_esquerda, self.esquerda[nos], self.direita[nos])
+        return self.base + self.limiar[nos].sum(axis=1, dtype=np.float64)
+
+
+class XGBoostNumpy:
+    """Um booster por target; `predict` devolve (amostras, targets) na ordem do manifesto."""
+
+    def __init__(self, florestas, features, targets):
+        self.florestas = florestas
+        self.features = features
+        self.targets = targets
+
+    def predict(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.features].to_numpy()
+        return np.column_stack([self.florestas[target].predict(X) for target in self.targets])
+
+
+class EscalaNumpy:
+    """`transform`/`inverse_transform` de um MinMaxScaler a partir dos seus `min_` e `scale_`."""
+
+    def __init__(self, minimo, escala):
+        self.minimo = np.asarray(minimo, dtype=np.float64)
+        self.escala = np.asarray(escala, dtype=np.float64)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.escala + self.minimo
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.minimo) / self.escala
+
+
+def carregar_escalas(diretorio):
+    """
+    Scalers exportados com o modelo.
+
+    Retorna:
+    (dict, dict) ou None: `EscalaNumpy` por tipo ('features'/'targets') e as colunas de cada tipo na
+    ordem do treino; None se o modelo foi exportado sem scalers.
+    """
+    with open(os.path.join(diretorio, 'modelo.json'), encoding='utf-8') as f:
+        manifesto = json.load(f)
+    if 'scalers' not in manifesto:
+        return None
+
+    with np.load(os.path.join(diretorio, manifesto['scalers'])) as arquivo:
+        escalas = {tipo: EscalaNumpy(arquivo[f"{tipo}_min"], arquivo[f"{tipo}_scale"]) for tipo in ('features', 'targets')}
+    return escalas, {tipo: manifesto[tipo] for tipo in ('features', 'targets')}
+
+
+def carregar_modelo_leve(diretorio):
+    """Modelo exportado (`LSTMNumpy` ou `XGBoostNumpy`) a partir do diretório do manifesto."""
+    with open(os.path.join(diretorio, 'modelo.json'), encoding='utf-8') as f:
+        manifesto = json.load(f)
+
+    if manifesto['tipo'] == 'lstm':
+        with np.load(os.path.join(diretorio, manifesto['pesos'])) as arquivo:
+            pesos = {nome: arquivo[nome] for nome in arquivo.files}
+        return LSTMNumpy(manifesto['camadas'], pesos, manifesto.get('input_shape'))
+
+    if manifesto['tipo'] == 'xgboost':
+        florestas = {}
+        for target, arquivo in manifesto['arquivos'].items():
+            with open(os.path.join(diretorio, arquivo), encoding='utf-8') as f:
+                florestas[target] = FlorestaNumpy(json.load(f))
+        return XGBoostNumpy(florestas, manifesto['features'], manifesto['targets'])
+
+    raise ValueError(f"Tipo de modelo exportado desconhecido: {manifesto['tipo']}")
@@ -0,0 +1,155 @@
+
+# @title Montagem vetorizada de sequências por dia para os modelos LSTM
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+Funções compartilhadas pelas preparações de dados do LSTM para montar amostras a partir de dias
+inteiros de candles sem filtrar o DataFrame dia a dia:
+
+- `indice_dias`: ordena as linhas por dia uma única vez e devolve, para cada dia, a posição inicial
+  e final das suas linhas (índice de deslocamentos);
+- `montar_cubo_dias`: copia as colunas para um array contíguo (dias, n_pontos_dia, colunas) e indica
+  quais dias estão completos;
+- `janelas_de_dias`: janelas de `dias_entrada` dias consecutivos como views do cubo
+  (`sliding_window_view`), sem copiar os dados; a cópia só acontece quando as amostras válidas são
+  selecionadas;
+- `posicoes_proximo_dia` / `amostras_proximo_dia` / `lotes_proximo_dia`: amostras do LSTM global
+  (fim de um dia -> primeiro candle do dia seguinte) montadas por fatias do índice de deslocamentos,
+  de uma vez ou em lotes.
+"""
+
+
+def indice_dias(datas):
+    """
+    Índice de deslocamentos por dia.
+
+    Parâmetros:
+    datas (array-like): Data de cada linha (qualquer ordem).
+
+    Retorna:
+    (np.ndarray, np.ndarray, np.ndarray, np.ndarray): ordem estável das linhas por dia, dias únicos
+    (ordenados), posição inicial e posição final (exclusiva) de cada dia na ordem.
+    """
+    datas = np.asarray(datas)
+    ordem = np.argsort(datas, kind='stable')
+    dias, inicios, contagens = np.unique(datas[ordem], return_index=True, return_counts=True)
+    return ordem, dias, inicios, inicios + contagens
+
+
+def montar_cubo_dias(df, colunas, n_pontos_dia, coluna_data='data', dtype=np.float64, indice=None):
+    """
+    Cubo (dias, n_pontos_dia, colunas) com os candles de cada dia, na ordem em que aparecem no DataFrame.
+
+    Dias com quantidade de candles diferente de `n_pontos_dia` são marcados como incompletos
+    (as posições que sobram ficam com NaN). `indice` reaproveita um `indice_dias` já calculado.
+
+    Retorna:
+    (np.ndarray, np.ndarray, np.ndarray): dias, cubo e máscara de dias completos.
+    """
+    ordem, dias, inicios, fins = indice if indice is not None else indice_dias(df[coluna_data].to_numpy())
+    valores = df[colunas].to_numpy(dtype=dtype)[ordem]
+
+    contagens = fins - inicios
+    completos = contagens == n_pontos_dia
+
+    # Posição de cada linha dentro do seu dia
+    dia_da_linha = np.repeat(np.arange(len(dias)), contagens)
+    posicao = np.arange(len(valores)) - np.repeat(inicios, contagens)
+    cabe = posicao < n_pontos_dia
+
+    cubo = np.full((len(dias), n_pontos_dia, len(colunas)), np.nan, dtype=dtype)
+    cubo[dia_da_linha[cabe], posicao[cabe]] = valores[cabe]
+    return dias, cubo, completos
+
+
+def janelas_de_dias(cubo, dias_entrada):
+    """
+    Views (sem cópia) com `dias_entrada` dias consecutivos concatenados no eixo do tempo.
+
+    Retorna:
+    np.ndarray: shape (n_dias - dias_entrada + 1, dias_entrada * n_pontos_dia, colunas); a janela `i`
+    cobre os dias `i` a `i + dias_entrada - 1`.
+    """
+    n_dias, n_pontos, n_colunas = cubo.shape
+    planos = cubo.reshape(n_dias, n_pontos * n_colunas)
+    janelas = sliding_window_view(planos, (dias_entrada, n_pontos * n_colunas))[:, 0]
+    return janelas.reshape(-1, dias_entrada * n_pontos, n_colunas)
+
+
+def sequencias_intradiarias(df, colunas_features, colunas_targets, dias_entrada, n_pontos_dia):
+    """
+    Amostras do LSTM intradiário: `dias_entrada` dias completos de features como entrada e todos os
+    candles do dia seguinte (targets) como saída.
+
+    Retorna:
+    (np.ndarray, np.ndarray, np.ndarray, np.ndarray): views X (n_janelas, dias_entrada * n_pontos_dia,
+    features) e y (n_janelas, n_pontos_dia, targets), dia alvo de cada janela e máscara das janelas
+    válidas (todos os dias completos). `X[validas]` e `y[validas]` materializam as amostras.
+    """
+    indice = indice_dias(df['data'].to_numpy())
+    dias, cubo_features, completos = montar_cubo_dias(df, colunas_features, n_pontos_dia, indice=indice)
+    _, cubo_targets, _ = montar_cubo_dias(df, colunas_targets, n_pontos_dia, indice=indice)
+
+    if len(dias) <= dias_entrada:
+        vazio = np.empty((0, dias_entrada * n_pontos_dia, len(colunas_features)))
+        return vazio, np.empty((0, n_pontos_dia, len(colunas_targets))), dias[:0], np.zeros(0, dtype=bool)
+
+    X = janelas_de_dias(cubo_features, dias_entrada)[:-1]
+    y = cubo_targets[dias_entrada:]
+
+    entradas_completas = sliding_window_view(completos[:-1], dias_entrada).all(axis=1)
+    validas = entradas_completas & completos[dias_entrada:]
+    return X, y, dias[dias_entrada:], validas
+
+
+def memoria_mb(*arrays):
+    """Memória ocupada pelos arrays (em MB)."""
+    return sum(np.asarray(a).nbytes for a in arrays) / 1e6
+
+
+def posicoes_proximo_dia(inicios, fins, janela):
+    """
+    Posições das amostras "dia -> próximo dia" do LSTM global, a partir do índice de deslocamentos.
+
+    Cada amostra usa os últimos `janela` candles de um dia (dias com menos candles são ignorados) e o
+    primeiro candle do dia seguinte como alvo.
+
+    Retorna:
+    (np.ndarray, np.ndarray): posição final (exclusiva) da entrada e posição do alvo de cada amostra.
+    """
+    validos = (fins[:-1] - inicios[:-1]) >= janela
+    return fins[:-1][validos], inicios[1:][validos]
+
+
+def amostras_proximo_dia(features, targets, fins_entrada, posicoes_alvo, janela):
+    """X (amostras, janela, features) e y (amostras, targets) com uma única indexação vetorizada."""
+    linhas = fins_entrada[:, None] - janela + np.arange(janela)
+    return features[linhas], targets[posicoes_alvo]
+
+
+def lotes_proximo_dia(features, targets, fins_entrada, posicoes_alvo, janela, tamanho_lote=1024):
+    """Gera (X, y) em lotes de até `tamanho_lote` amostras, sem montar o conjunto inteiro na memória."""
+    for inicio in range(0, len(fins_entrada), tamanho_lote):
+        fim = inicio + tamanho_lote
+        yield amostras_proximo_dia(features, targets, fins_entrada[inicio:fim], posicoes_alvo[inicio:fim], janela)
+
+
+def posicoes_intradiarias(inicios, fins, dias_entrada, n_pontos_dia):
+    """
+    Posições das amostras do LSTM intradiário na tabela de candles ordenada por dia, para montar as
+    janelas sob demanda: a entrada são as `dias_entrada * n_pontos_dia` linhas a partir de
+    `inicio_entrada` e o alvo as `n_pontos_dia` linhas a partir de `inicio_alvo`.
+
+    Retorna:
+    (np.ndarray, np.ndarray, np.ndarray): início da entrada, início do alvo e índice do dia alvo
+    de cada amostra válida (todos os dias completos).
+    """
+    completos = (fins - inicios) == n_pontos_dia
+    if len(completos) <= dias_entrada:
+        vazio = np.zeros(0, dtype=np.int64)
+        return vazio, vazio, vazio
+    entradas_completas = sliding_window_view(completos[:-1], dias_entrada).all(axis=1)
+    dias_alvo = np.flatnonzero(entradas_completas & completos[dias_entrada:]) + dias_entrada
+    return inicios[dias_alvo - dias_entrada], inicios[dias_alvo], dias_alvo
@@ -0,0 +1,287 @@
+
+# @title Serviço HTTP de previsão com modelo e scalers carregados uma vez e lotes dinâmicos
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from scripts.modelagem_machine_learning.dataset_mmap import (
+    carregar_manifesto_dataset, dataset_do_modelo, formato_janela, verificar_entrada_modelo
+)
+from scripts.pipeline.armazenamento import TICKER_PADRAO, eh_csv, ler_etapa, listar_dias
+from scripts.pipeline.manifesto_pipeline import caminho_manifesto_padrao, obter_marca
+
+"""
+Previsões sem recarregar o `.keras` e sem refazer a preparação dos dados a cada chamada:
+
+- `ModeloServido`: modelo, scalers (os do manifesto do dataset usado no treino ou, no modelo exportado
+  para o runtime leve, os `min_`/`scale_` gravados com ele) e colunas, carregados uma vez e mantidos
+  em memória; normaliza as janelas, prevê e volta os alvos à escala original;
+- `FonteJanelas`: última janela de candles de cada ticker lida da etapa `transformado` (no Parquet, só
+  os últimos dias e as colunas de features) e mantida em cache até a marca d'água do ticker mudar;
+- `LoteadorPrevisoes`: uma thread junta as requisições que chegam ao mesmo tempo (até `tamanho_max_lote`
+  ou `espera_max_ms`) em uma única chamada ao modelo;
+- `criar_servidor`: HTTP local com `POST /prever` e `GET /saude`.
+
+Requisição: {"ticker": "BBDC4.SA"} usa a última janela gravada do ticker; {"ticker": ..., "janela":
+[[...], ...]} prevê a partir de uma janela enviada (linhas de candles com as features na ordem do
+manifesto). Resposta: {"ticker", "previsao": {coluna: valor ou lista por candle}, "lote", "latencia_ms"}.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.modelagem_machine_learning.servico_previsao
+"""
+
+CAMINHO_MODELO = '/content/Piloto_Day_Trade/models/LSTM/modelo_LSTM_v1.keras'
+CAMINHO_DADOS = '/content/Piloto_Day_Trade/data/transformed/dados_transformados'
+
+
+class ModeloServido:
+    """Modelo com os scalers e colunas do dataset de treino, pronto para prever lotes de janelas."""
+
+    def __init__(self, prever, scaler_features, scaler_targets, features, targets):
+        self.prever = prever
+        self.scaler_features = scaler_features
+        self.scaler_targets = scaler_targets
+        self.features = list(features)
+        self.targets = list(targets)
+
+    def prever_lote(self, janelas):
+        """
+        Parâmetros:
+        janelas (np.ndarray): (n, linhas, features) na escala original.
+
+        Retorna:
+        np.ndarray: previsões na escala original, (n, targets) ou (n, candles, targets).
+        """
+        n, linhas, n_features = janelas.shape
+        planas = pd.DataFrame(janelas.reshape(-1, n_features), columns=self.features)
+        X = self.scaler_features.transform(planas).reshape(n, linhas, n_features).astype(np.float32)
+
+        saida = np.asarray(self.prever(X))
+        planas = pd.DataFrame(saida.reshape(-1, len(self.targets)), columns=self.targets)
+        return self.scaler_targets.inverse_transform(planas).reshape(saida.shape)
+
+    def para_json(self, previsao):
+        """{coluna: valor} (alvos do dia) ou {coluna: [valor por candle]} (alvos intradiários)."""
+        return {coluna: previsao[..., i].tolist() for i, coluna in enumerate(self.targets)}
+
+
+def carregar_modelo_servido(caminho_modelo=CAMINHO_MODELO, caminho_dataset=None):
+    """
+    Carrega o modelo e os scalers/colunas registrados no manifesto do dataset de treino (por padrão,
+    o registrado com o modelo: `dataset_mmap.dataset_do_modelo`), confere que a entrada do modelo é a
+    janela desse dataset e faz uma previsão de aquecimento para a primeira requisição não pagar a
+    inicialização.
+
+    `caminho_modelo` pode ser o `.keras` (TensorFlow) ou um diretório exportado por
+    `exportar_modelos.py`, executado pelo runtime leve só com NumPy. No diretório exportado os
+    scalers também vêm do export (`scalers.npz`), então o worker não importa scikit-learn/joblib.
+    """
+    caminho_dataset = caminho_dataset or dataset_do_modelo(caminho_modelo)
+    manifesto = carregar_manifesto_dataset(caminho_dataset)
+
+    if os.path.isdir(caminho_modelo):
+        from scripts.modelagem_machine_learning.runtime_leve import carregar_escalas, carregar_modelo_leve
+        modelo = carregar_modelo_leve(caminho_modelo)
+        verificar_entrada_modelo(modelo.input_shape, manifesto, caminho_modelo)
+        prever = modelo.predict
+        exportados = carregar_escalas(caminho_modelo)
+        if exportados is None:
+            raise ValueError(f"{caminho_modelo} foi exportado sem scalers; exporte de novo informando o "
+                             f"dataset de treino (`exportar_lstm(..., caminho_dataset=...)`).")
+        scalers, colunas = exportados
+        if colunas['features'] != manifesto['features'] or colunas['targets'] != manifesto['targets']:
+            raise ValueError(f"As colunas dos scalers de {caminho_modelo} não são as do dataset {caminho_dataset}.")
+    else:
+        from tensorflow.keras.models import load_model
+        from scripts.modelagem_machine_learning.registro_scalers import scalers_do_dataset
+        scalers = scalers_do_dataset(manifesto)
+        modelo = load_model(caminho_modelo)
+        verificar_entrada_modelo(modelo.input_shape[1:], manifesto, caminho_modelo)
+        # Chamar o modelo direto evita o custo fixo de `predict` (criação de dataset/loop) a cada lote
+        prever = lambda X: modelo(X, training=False).numpy()
+
+    servido = ModeloServido(
+        prever, scalers['features'], scalers['targets'], manifesto['features'], manifesto['targets']
+    )
+    linhas, _, _ = formato_janela(manifesto)
+    servido.prever(np.zeros((1, linhas, len(servido.features)), dtype=np.float32))
+    return servido, manifesto
+
+
+class FonteJanelas:
+    """Últimas `linhas` linhas de features de cada ticker, com cache invalidado pela marca d'água."""
+
+    def __init__(self, caminho_dados, features, linhas, dias=None, n_pontos_dia=None):
+        self.caminho_dados = caminho_dados
+        self.features = list(features)
+        self.linhas = linhas
+        self.dias = dias
+        self.n_pontos_dia = n_pontos_dia
+        self.manifesto = caminho_manifesto_padrao(caminho_dados)
+        self._cache = {}
+        self._trava = threading.Lock()
+
+    def _versao(self, ticker):
+        marca = obter_marca(self.manifesto, 'transformado', ticker)
+        if marca is not None and 'hash' in marca:
+            return marca['hash']
+        caminho = self.caminho_dados if eh_csv(self.caminho_dados) else os.path.join(self.caminho_dados, f"ticker={ticker}")
+        return os.path.getmtime(caminho) if os.path.exists(caminho) else None
+
+    def _ler(self, ticker):
+        # No Parquet só os últimos dias são lidos (filtro pelas partições)
+        desde = None
+        if self.dias is not None:
+            dias_gravados = listar_dias(self.caminho_dados, ticker)
+            desde = dias_gravados[-self.dias] if len(dias_gravados) >= self.dias else None
+        df = ler_etapa(self.caminho_dados, 'transformado', ticker, colunas=['data', 'hora'] + self.features, desde=desde)
+        if df.empty:
+            raise ValueError(f"Sem dados transformados para {ticker}.")
+
+        if self.dias is not None:
+            ultimos = df['data'].drop_duplicates().iloc[-self.dias:]
+            df = df[df['data'].isin(ultimos)]
+            if self.n_pontos_dia is not None and (df.groupby('data').size() != self.n_pontos_dia).any():
+                raise ValueError(f"Os últimos {self.dias} dias de {ticker} não estão completos.")
+
+        janela = df[self.features].to_numpy(dtype=np.float64)[-self.linhas:]
+        if len(janela) < self.linhas:
+            raise ValueError(f"{ticker} tem {len(janela)} linhas; a janela precisa de {self.linhas}.")
+        return janela
+
+    def janela(self, ticker):
+        versao = self._versao(ticker)
+        with self._trava:
+            em_cache = self._cache.get(ticker)
+        if em_cache is not None and em_cache[0] == versao:
+            return em_cache[1]
+
+        janela = self._ler(ticker)
+        with self._trava:
+            self._cache[ticker] = (versao, janela)
+        return janela
+
+
+class LoteadorPrevisoes:
+    """Junta requisições concorrentes em lotes: uma chamada ao modelo por lote, em uma única thread."""
+
+    def __init__(self, modelo_servido, tamanho_max_lote=32, espera_max_ms=2.0):
+        self.modelo = modelo_servido
+        self.tamanho_max_lote = tamanho_max_lote
+        self.espera_max = espera_max_ms / 1000
+        self._fila = queue.Queue()
+        threading.Thread(target=self._executar, daemon=True).start()
+
+    def prever(self, janela):
+        """Future com (previsão na escala original, tamanho do lote em que foi calculada)."""
+        futuro = Future()
+        self._fila.put((np.asarray(janela, dtype=np.float64), futuro))
+        return futuro
+
+    def _coletar(self):
+        lote = [self._fila.get()]
+        limite = time.perf_counter() + self.espera_max
+        while len(lote) < self.tamanho_max_lote:
+            restante = limite - time.perf_counter()
+            try:
+                lote.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self):
+        while True:
+            lote = self._coletar()
+            # Janelas de formatos diferentes (ex.: enviadas pelo cliente) vão em chamadas separadas
+            grupos = {}
+            for janela, futuro in lote:
+                grupos.setdefault(janela.shape, []).append((janela, futuro))
+            for itens in grupos.values():
+                try:
+                    previsoes = self.modelo.prever_lote(np.stack([janela for janela, _ in itens]))
+                except Exception as erro:
+                    for _, futuro in itens:
+                        futuro.set_exception(erro)
+                    continue
+                for (_, futuro), previsao in zip(itens, previsoes):
+                    futuro.set_result((previsao, len(itens)))
+
+
+def criar_servidor(loteador, fonte, host='127.0.0.1', porta=8000, timeout=30):
+    """Servidor HTTP (uma thread por conexão, conexões persistentes) sobre o loteador."""
+    modelo = loteador.modelo
+
+    class Manipulador(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Cabeçalho e corpo saem em escritas separadas; sem TCP_NODELAY o ACK atrasado soma ~40 ms
+        disable_nagle_algorithm = True
+
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            if self.path == '/saude':
+                self._responder(200, {'status': 'ok', 'features': modelo.features, 'targets': modelo.targets})
+            else:
+                self._responder(404, {'erro': 'rota inexistente'})
+
+        def do_POST(self):
+            if self.path != '/prever':
+                self._responder(404, {'erro': 'rota inexistente'})
+                return
+            inicio = time.perf_counter()
+            try:
+                corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                ticker = corpo.get('ticker', TICKER_PADRAO)
+                janela = corpo['janela'] if 'janela' in corpo else fonte.janela(ticker)
+                janela = np.asarray(janela, dtype=np.float64)
+                if janela.ndim != 2 or janela.shape[1] != len(modelo.features):
+                    raise ValueError(f"A janela deve ter formato (linhas, {len(modelo.features)}).")
+                previsao, tamanho_lote = loteador.prever(janela).result(timeout)
+            except (ValueError, KeyError, json.JSONDecodeError) as erro:
+                self._responder(400, {'erro': str(erro)})
+                return
+            except Exception as erro:
+                self._responder(500, {'erro': str(erro)})
+                return
+            self._responder(200, {
+                'ticker': ticker,
+                'previsao': modelo.para_json(previsao),
+                'lote': tamanho_lote,
+                'latencia_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            })
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), Manipulador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+if __name__ == "__main__":
+    # Dataset em que o modelo foi treinado (o manifesto traz os scalers, as colunas e o formato da janela)
+    caminho_dataset = dataset_do_modelo(CAMINHO_MODELO)
+
+    modelo_servido, manifesto = carregar_modelo_servido(CAMINHO_MODELO, caminho_dataset)
+    linhas, dias, n_pontos_dia = formato_janela(manifesto)
+    fonte = FonteJanelas(CAMINHO_DADOS, manifesto['features'], linhas, dias, n_pontos_dia)
+    servidor = criar_servidor(LoteadorPrevisoes(modelo_servido), fonte)
+
+    print(f"[Info] Modelo: {CAMINHO_MODELO}")
+    print(f"[Info] Dataset: {caminho_dataset}")
+    print(f"[Info] Servindo em http://{servidor.server_address[0]}:{servidor.server_address[1]}/prever")
+    servidor.serve_forever()
@@ -2,88 +2,182 @@
 import sqlite3
 import os
 
+from scripts.pipeline.armazenamento import TICKER_PADRAO
+
+# Versão do esquema: muda quando criar_banco passa a migrar bancos existentes (2: ticker em dim_tempo)
+VERSAO_ESQUEMA = 2
+
+sql_tabelas = """
+-- Tabela Fato: fato_precos
+CREATE TABLE IF NOT EXISTS fato_precos (
+    id_fato_precos INTEGER PRIMARY KEY,
+    id_tempo INTEGER,
+    abertura REAL,
+    minimo REAL,
+    maximo REAL,
+    fechamento REAL,
+    FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
+);
+
+-- Dimensão: dim_tempo
+CREATE TABLE IF NOT EXISTS dim_tempo (
+    id_tempo INTEGER PRIMARY KEY,
+    ticker TEXT,
+    data TEXT,
+    hora TEXT,
+    dia_da_semana_entrada INTEGER,
+    hora_num INTEGER,
+    minuto INTEGER
+);
+
+-- Dimensão: dim_indicadores
+CREATE TABLE IF NOT EXISTS dim_indicadores (
+    id_indicadores INTEGER PRIMARY KEY,
+    id_tempo INTEGER,
+    SMA_10 REAL,
+    EMA_10 REAL,
+    MACD REAL,
+    Signal_Line REAL,
+    rsi REAL,
+    OBV REAL,
+    CCI REAL,
+    ATR REAL,
+    retorno REAL,
+    volatilidade REAL,
+    FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
+);
+
+-- Dimensão: dim_lags
+CREATE TABLE IF NOT EXISTS dim_lags (
+    id_lags INTEGER PRIMARY KEY,
+    id_tempo INTEGER,
+    fechamento_lag1 REAL,
+    retorno_lag1 REAL,
+    volume_lag1 REAL,
+    fechamento_lag2 REAL,
+    retorno_lag2 REAL,
+    volume_lag2 REAL,
+    fechamento_lag3 REAL,
+    retorno_lag3 REAL,
+    volume_lag3 REAL,
+    FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
+);
+
+-- Dimensão: dim_operacional
+CREATE TABLE IF NOT EXISTS dim_operacional (
+    id_operacional INTEGER PRIMARY KEY,
+    id_tempo INTEGER,
+    data_previsao TEXT,
+    dia_da_semana_previsao INTEGER,
+    hora_num INTEGER,
+    minuto INTEGER,
+    mercado_aberto INTEGER,
+    fechamento_dia REAL,
+    volume_dia REAL,
+    maximo_dia REAL,
+    minimo_dia REAL,
+    fechamento_dia_anterior REAL,
+    volume_dia_anterior REAL,
+    maximo_dia_anterior REAL,
+    minimo_dia_anterior REAL,
+    FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
+);
+"""
+
+TABELAS_POR_ID_TEMPO = ['fato_precos', 'dim_indicadores', 'dim_lags', 'dim_operacional']
+
+sql_chaves = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_tempo_data_hora_ticker ON dim_tempo (data, hora, ticker);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fato_precos_id_tempo ON fato_precos (id_tempo);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_indicadores_id_tempo ON dim_indicadores (id_tempo);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_lags_id_tempo ON dim_lags (id_tempo);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_operacional_id_tempo ON dim_operacional (id_tempo);
+"""
+
+# Índices de consulta: o índice único de dim_tempo(data, hora, ticker) já inclui o id_tempo (rowid) e
+# cobre os filtros por data/hora (com ou sem ticker); o índice de fato_precos cobre o OHLC para que o join não leia a tabela.
+sql_indices = """
+CREATE INDEX IF NOT EXISTS ix_fato_precos_id_tempo_ohlc
+    ON fato_precos (id_tempo, abertura, minimo, maximo, fechamento);
+"""
+
+# Visão "larga" com uma linha por candle, no formato das colunas de dados_transformados.csv
+# armazenadas no banco (os indicadores fora do esquema, como ADX e Bollinger, não fazem parte dela).
+sql_views = """
+CREATE VIEW IF NOT EXISTS vw_candles AS
+SELECT
+    t.id_tempo,
+    t.ticker, t.data, t.hora,
+    f.abertura, f.minimo, f.maximo, f.fechamento,
+    i.retorno, i.SMA_10, i.EMA_10, i.MACD, i.Signal_Line, i.rsi, i.OBV, i.CCI, i.ATR,
+    l.fechamento_lag1, l.retorno_lag1, l.volume_lag1,
+    l.fechamento_lag2, l.retorno_lag2, l.volume_lag2,
+    l.fechamento_lag3, l.retorno_lag3, l.volume_lag3,
+    t.dia_da_semana_entrada, o.data_previsao, o.dia_da_semana_previsao, t.hora_num, t.minuto,
+    o.mercado_aberto,
+    o.fechamento_dia, o.volume_dia, o.maximo_dia, o.minimo_dia,
+    o.fechamento_dia_anterior, o.volume_dia_anterior, o.maximo_dia_anterior, o.minimo_dia_anterior,
+    i.volatilidade
+FROM dim_tempo t
+JOIN fato_precos f ON f.id_tempo = t.id_tempo
+LEFT JOIN dim_indicadores i ON i.id_tempo = t.id_tempo
+LEFT JOIN dim_lags l ON l.id_tempo = t.id_tempo
+LEFT JOIN dim_operacional o ON o.id_tempo = t.id_tempo;
+"""
+
+def adicionar_ticker(cursor):
+    """
+    Bancos criados antes da coluna `ticker` em dim_tempo: acrescenta a coluna, atribui os candles já
+    gravados ao ticker padrão (o único carregado até então) e remove a chave e a visão antigas,
+    recriadas em seguida com o ticker.
+    """
+    colunas = [linha[1] for linha in cursor.execute("PRAGMA table_info(dim_tempo)")]
+    if 'ticker' in colunas:
+        return
+    cursor.execute("ALTER TABLE dim_tempo ADD COLUMN ticker TEXT")
+    cursor.execute("UPDATE dim_tempo SET ticker = ?", (TICKER_PADRAO,))
+    cursor.execute("DROP INDEX IF EXISTS ux_dim_tempo_data_hora")
+    cursor.execute("DROP VIEW IF EXISTS vw_candles")
+    print(f"Coluna ticker adicionada a dim_tempo (candles existentes atribuídos a {TICKER_PADRAO}).")
+
+def remover_duplicatas(cursor):
+    """
+    Remove os candles repetidos acumulados por cargas anteriores (sem chave natural),
+    mantendo o registro mais recente de cada (ticker, data, hora), para que as chaves únicas possam ser criadas.
+    """
+    cursor.execute("""
+        DELETE FROM dim_tempo
+        WHERE id_tempo NOT IN (SELECT MAX(id_tempo) FROM dim_tempo GROUP BY ticker, data, hora)
+    """)
+    removidos = cursor.rowcount
+
+    for tabela in TABELAS_POR_ID_TEMPO:
+        cursor.execute(f"""
+            DELETE FROM {tabela}
+            WHERE id_tempo NOT IN (SELECT id_tempo FROM dim_tempo)
+               OR rowid NOT IN (SELECT MAX(rowid) FROM {tabela} GROUP BY id_tempo)
+        """)
+
+    if removidos > 0:
+        print(f"{removidos} candles duplicados removidos do banco.")
+
 def criar_banco(db_path):
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    sql_script = """
-    -- Tabela Fato: fato_precos
-    CREATE TABLE IF NOT EXISTS fato_precos (
-        id_fato_precos INTEGER PRIMARY KEY,
-        id_tempo INTEGER,
-        abertura REAL,
-        minimo REAL,
-        maximo REAL,
-        fechamento REAL,
-        FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
-    );
-
-    -- Dimensão: dim_tempo
-    CREATE TABLE IF NOT EXISTS dim_tempo (
-        id_tempo INTEGER PRIMARY KEY,
-        data TEXT,
-        hora TEXT,
-        dia_da_semana_entrada INTEGER,
-        hora_num INTEGER,
-        minuto INTEGER
-    );
-
-    -- Dimensão: dim_indicadores
-    CREATE TABLE IF NOT EXISTS dim_indicadores (
-        id_indicadores INTEGER PRIMARY KEY,
-        id_tempo INTEGER,
-        SMA_10 REAL,
-        EMA_10 REAL,
-        MACD REAL,
-        Signal_Line REAL,
-        rsi REAL,
-        OBV REAL,
-        CCI REAL,
-        ATR REAL,
-        retorno REAL,
-        volatilidade REAL,
-        FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
-    );
-
-    -- Dimensão: dim_lags
-    CREATE TABLE IF NOT EXISTS dim_lags (
-        id_lags INTEGER PRIMARY KEY,
-        id_tempo INTEGER,
-        fechamento_lag1 REAL,
-        retorno_lag1 REAL,
-        volume_lag1 REAL,
-        fechamento_lag2 REAL,
-        retorno_lag2 REAL,
-        volume_lag2 REAL,
-        fechamento_lag3 REAL,
-        retorno_lag3 REAL,
-        volume_lag3 REAL,
-        FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
-    );
-
-    -- Dimensão: dim_operacional
-    CREATE TABLE IF NOT EXISTS dim_operacional (
-        id_operacional INTEGER PRIMARY KEY,
-        id_tempo INTEGER,
-        data_previsao TEXT,
-        dia_da_semana_previsao INTEGER,
-        hora_num INTEGER,
-        minuto INTEGER,
-        mercado_aberto INTEGER,
-        fechamento_dia REAL,
-        volume_dia REAL,
-        maximo_dia REAL,
-        minimo_dia REAL,
-        fechamento_dia_anterior REAL,
-        volume_dia_anterior REAL,
-        maximo_dia_anterior REAL,
-        minimo_dia_anterior REAL,
-        FOREIGN KEY (id_tempo) REFERENCES dim_tempo(id_tempo)
-    );
-    """
+    cursor.executescript(sql_tabelas)
+    adicionar_ticker(cursor)
+
+    # Chaves naturais: um único registro por (ticker, data, hora) em dim_tempo e um por id_tempo
+    # nas demais tabelas. São a base do upsert incremental de `carregar_dados`.
+    remover_duplicatas(cursor)
+    cursor.executescript(sql_chaves)
 
-    cursor.executescript(sql_script)
+    # Índices de consulta, estatísticas para o planejador e visão de leitura
+    cursor.executescript(sql_indices)
+    cursor.execute("ANALYZE")
+    cursor.executescript(sql_views)
     conn.commit()
     conn.close()
     print("Banco e tabelas criados com sucesso conforme o esquema dimensional.")
@@ -0,0 +1,372 @@
+
+#@title Camada de armazenamento das etapas do pipeline
+
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+"""
+Camada de armazenamento usada por todas as etapas do pipeline (extração, limpeza, transformação,
+carga e preparação para modelagem) para trocar dados entre si.
+
+O backend é escolhido pelo caminho:
+- caminhos terminados em `.csv` usam o formato original do projeto (um CSV por etapa);
+- qualquer outro caminho é tratado como um dataset Parquet particionado por ticker e dia:
+    <caminho>/ticker=BBDC4.SA/dia=2025-03-05/part-0.parquet
+
+No backend Parquet as colunas são gravadas já tipadas (preços em float32, volume em int64, datas como
+datetime), então a leitura entre etapas não reinterpreta texto, e `ler_etapa(..., colunas=[...])` lê do
+disco apenas as colunas pedidas. Gravações incrementais substituem somente as partições (dias) presentes
+no DataFrame gravado.
+
+Etapas:
+- `bruto`: índice `Datetime` com fuso horário e colunas do yfinance (`Close`, `High`, `Low`, `Open`, `Volume`).
+- `limpo`: colunas `data`, `hora`, `abertura`, `minimo`, `maximo`, `fechamento`, `volume` e `timestamp` (com fuso).
+- `transformado`: saída de `transformar_dados`.
+"""
+
+TICKER_PADRAO = "BBDC4.SA"
+# Linhas por bloco nas leituras em blocos (`ler_etapa_em_blocos`)
+TAMANHO_BLOCO = 500_000
+FUSO_HORARIO = "America/Sao_Paulo"
+ETAPAS = ('bruto', 'limpo', 'transformado')
+
+COLUNAS_PRECO_BRUTO = ['Close', 'High', 'Low', 'Open']
+COLUNAS_PRECO = [
+    'abertura', 'minimo', 'maximo', 'fechamento',
+    'fechamento_lag1', 'fechamento_lag2', 'fechamento_lag3',
+    'fechamento_dia', 'maximo_dia', 'minimo_dia',
+    'fechamento_dia_anterior', 'maximo_dia_anterior', 'minimo_dia_anterior'
+]
+COLUNAS_VOLUME = ['volume', 'Volume', 'volume_dia', 'volume_dia_anterior']
+COLUNAS_DATA = ['data', 'data_previsao']
+
+PARTICIONAMENTO = ds.partitioning(
+    pa.schema([('ticker', pa.string()), ('dia', pa.string())]),
+    flavor='hive'
+)
+# Leituras de um ticker abrem só o diretório dele (`ticker=...`), particionado por dia
+PARTICIONAMENTO_DIA = ds.partitioning(pa.schema([('dia', pa.string())]), flavor='hive')
+
+
+def eh_csv(caminho):
+    return str(caminho).lower().endswith('.csv')
+
+
+def _validar_etapa(etapa):
+    if etapa not in ETAPAS:
+        raise ValueError(f"Etapa inválida: {etapa}. Use uma de {ETAPAS}.")
+
+
+def converter_timestamp(serie):
+    """Converte a coluna `timestamp` (texto ISO com offset ou datetime) para datetime64 no fuso de São Paulo."""
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        return serie.dt.tz_convert(FUSO_HORARIO)
+    return pd.to_datetime(serie, utc=True, format='ISO8601').dt.tz_convert(FUSO_HORARIO)
+
+
+def minuto_do_dia(timestamp):
+    """Minutos desde a meia-noite local (int16), para filtrar janelas de horário sem objetos `time`."""
+    return (timestamp.dt.hour * 60 + timestamp.dt.minute).astype('int16')
+
+
+def tipar_colunas(df):
+    """Aplica os tipos de armazenamento: preços em float32, volume em int64 e datas como datetime."""
+    df = df.copy()
+
+    if 'timestamp' in df.columns:
+        df['timestamp'] = converter_timestamp(df['timestamp'])
+
+    for col in COLUNAS_PRECO + COLUNAS_PRECO_BRUTO:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+
+    for col in COLUNAS_VOLUME:
+        if col in df.columns:
+            volume = pd.to_numeric(df[col], errors='coerce')
+            df[col] = volume.astype('int64') if volume.notna().all() else volume.astype('Int64')
+
+    for col in COLUNAS_DATA:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    if 'hora' in df.columns:
+        df['hora'] = df['hora'].astype(str)
+
+    return df
+
+
+def _dias(df, etapa):
+    """Chave de partição (YYYY-MM-DD) de cada linha."""
+    if etapa == 'bruto':
+        return pd.Series(df.index.strftime('%Y-%m-%d'), index=df.index)
+    return pd.to_datetime(df['data']).dt.strftime('%Y-%m-%d')
+
+
+def _remover_cabecalho_yfinance(df):
+    """Remove as linhas 'Ticker'/'Datetime' do cabeçalho multinível que o yfinance grava no CSV."""
+    if not pd.api.types.is_datetime64_any_dtype(df.index):
+        df = df[~df.index.isin(['Ticker', 'Datetime'])]
+        df.index = pd.to_datetime(df.index, utc=True, format='ISO8601')
+    df.index = pd.to_datetime(df.index, utc=True).tz_convert(FUSO_HORARIO)
+    df.index.name = 'Datetime'
+    return df
+
+
+def normalizar_bruto(df):
+    """Deixa o DataFrame do yfinance com colunas de um nível e índice com fuso de São Paulo."""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+        df.columns.name = None
+    return _remover_cabecalho_yfinance(df)
+
+
+# ---------------------------------------------------------------------------
+# Backend CSV (formato original)
+# ---------------------------------------------------------------------------
+
+def _ler_csv(caminho, etapa, colunas=None):
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        return pd.DataFrame()
+
+    if etapa == 'bruto':
+        df = pd.read_csv(caminho, index_col=0)
+        df = normalizar_bruto(df)
+        df = df.apply(pd.to_numeric, errors='coerce')
+    else:
+        df = pd.read_csv(caminho, parse_dates=['data'], usecols=colunas)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = converter_timestamp(df['timestamp'])
+
+    return df[colunas] if colunas is not None and etapa == 'bruto' else df
+
+
+def _salvar_csv(df, caminho, etapa):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    df.to_csv(caminho, index=(etapa == 'bruto'))
+
+
+# ---------------------------------------------------------------------------
+# Backend Parquet particionado por ticker e dia
+# ---------------------------------------------------------------------------
+
+def _diretorio_ticker(caminho, ticker):
+    return os.path.join(caminho, f"ticker={ticker}")
+
+
+def _ler_parquet(caminho, etapa, ticker=None, colunas=None, desde=None):
+    if not os.path.isdir(caminho):
+        return pd.DataFrame()
+
+    # Com ticker, o dataset é só o diretório do ticker: a descoberta não lista (nem infere o schema
+    # a partir de) arquivos de outros tickers, que podem estar sendo gravados por outro processo
+    if ticker is not None:
+        diretorio = _diretorio_ticker(caminho, ticker)
+        if not os.path.isdir(diretorio):
+            return pd.DataFrame()
+        dataset = ds.dataset(diretorio, format='parquet', partitioning=PARTICIONAMENTO_DIA)
+    else:
+        dataset = ds.dataset(caminho, format='parquet', partitioning=PARTICIONAMENTO)
+    filtro = None if desde is None else ds.field('dia') >= pd.Timestamp(desde).strftime('%Y-%m-%d')
+
+    if colunas is not None:
+        colunas = list(colunas)
+        if etapa == 'bruto' and 'timestamp' not in colunas:
+            colunas = ['timestamp'] + colunas
+        if ticker is None and 'ticker' not in colunas:
+            colunas = colunas + ['ticker']
+
+    tabela = dataset.to_table(columns=colunas, filter=filtro)
+    df = tabela.to_pandas()
+    descartar = ['dia'] + (['ticker'] if ticker is not None else [])
+    df = df.drop(columns=[c for c in descartar if c in df.columns])
+
+    if etapa == 'bruto':
+        df = df.set_index('timestamp').sort_index()
+        df.index.name = 'Datetime'
+    elif 'data' in df.columns and 'hora' in df.columns:
+        df = df.sort_values(['data', 'hora']).reset_index(drop=True)
+
+    return df
+
+
+def _gravar_parquet(df, caminho, etapa, ticker):
+    df = tipar_colunas(df)
+    dias = _dias(df, etapa)
+
+    if etapa == 'bruto':
+        df = df.reset_index().rename(columns={df.index.name or 'index': 'timestamp'})
+        dias = dias.reset_index(drop=True)
+
+    df = df.assign(ticker=ticker, dia=dias.values)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+
+    ds.write_dataset(
+        tabela,
+        caminho,
+        format='parquet',
+        partitioning=PARTICIONAMENTO,
+        existing_data_behavior='delete_matching',
+        basename_template='part-{i}.parquet'
+    )
+
+
+def listar_dias(caminho, ticker=TICKER_PADRAO):
+    """Dias gravados para o ticker, lidos dos nomes das partições (sem abrir arquivos)."""
+    diretorio = _diretorio_ticker(caminho, ticker)
+    if eh_csv(caminho) or not os.path.isdir(diretorio):
+        return []
+    return sorted(nome.split('=', 1)[1] for nome in os.listdir(diretorio) if nome.startswith('dia='))
+
+
+def existe_etapa(caminho, ticker=TICKER_PADRAO):
+    """True se há dados gravados para o ticker (CSV: o arquivo; Parquet: alguma partição de dia), sem abrir arquivos."""
+    if eh_csv(caminho):
+        return os.path.exists(caminho)
+    return bool(listar_dias(caminho, ticker))
+
+
+def contar_linhas(caminho, ticker=TICKER_PADRAO):
+    """Linhas gravadas para o ticker, lidas dos metadados dos arquivos Parquet (0 se não houver)."""
+    diretorio = _diretorio_ticker(caminho, ticker)
+    if eh_csv(caminho) or not os.path.isdir(diretorio):
+        return 0
+    return ds.dataset(diretorio, format='parquet', partitioning=PARTICIONAMENTO_DIA).count_rows()
+
+
+# ---------------------------------------------------------------------------
+# Interface usada pelas etapas
+# ---------------------------------------------------------------------------
+
+def ler_etapa(caminho, etapa, ticker=TICKER_PADRAO, colunas=None, desde=None):
+    """
+    Lê os dados de uma etapa do pipeline.
+
+    Parâmetros:
+    caminho (str): Arquivo `.csv` ou diretório do dataset Parquet.
+    etapa (str): 'bruto', 'limpo' ou 'transformado'.
+    ticker (str): Ticker a ler (apenas Parquet; None lê todos e mantém a coluna `ticker`).
+    colunas (list): Colunas a ler; no Parquet só essas colunas são lidas do disco.
+    desde (str | date): Primeiro dia a ler (apenas Parquet; filtra pelas partições).
+
+    Retorna:
+    pd.DataFrame (vazio se não houver dados).
+    """
+    _validar_etapa(etapa)
+    if eh_csv(caminho):
+        return _ler_csv(caminho, etapa, colunas)
+    return _ler_parquet(caminho, etapa, ticker, colunas, desde)
+
+
+def _blocos_csv(caminho, etapa, tamanho_bloco, colunas=None):
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        return
+
+    if etapa == 'bruto':
+        for bloco in pd.read_csv(caminho, index_col=0, chunksize=tamanho_bloco):
+            # O cabeçalho multinível do yfinance só aparece no primeiro bloco
+            bloco = normalizar_bruto(bloco).apply(pd.to_numeric, errors='coerce')
+            if not bloco.empty:
+                yield bloco[colunas] if colunas is not None else bloco
+    else:
+        for bloco in pd.read_csv(caminho, parse_dates=['data'], usecols=colunas, chunksize=tamanho_bloco):
+            if 'timestamp' in bloco.columns:
+                bloco['timestamp'] = converter_timestamp(bloco['timestamp'])
+            yield bloco
+
+
+def _tabela_para_pandas(lotes, etapa):
+    tabela = pa.concat_tables([pa.Table.from_batches([lote]) for lote in lotes], promote_options='default')
+    df = tabela.to_pandas()
+    if etapa == 'bruto':
+        df = df.set_index('timestamp').sort_index()
+        df.index.name = 'Datetime'
+    return df
+
+
+def _blocos_parquet(caminho, etapa, ticker, tamanho_bloco, colunas=None):
+    diretorio = _diretorio_ticker(caminho, ticker)
+    if not os.path.isdir(diretorio):
+        return
+
+    if colunas is not None and etapa == 'bruto' and 'timestamp' not in colunas:
+        colunas = ['timestamp'] + list(colunas)
+
+    # Partições (dias) em ordem cronológica; os lotes de vários dias pequenos são juntados até
+    # `tamanho_bloco` linhas, para não converter um DataFrame por dia. Cada arquivo é aberto e fechado
+    # em seguida: os fragmentos do dataset guardam os metadados lidos e a memória cresceria com o histórico
+    arquivos = sorted(ds.dataset(diretorio, format='parquet', partitioning=PARTICIONAMENTO_DIA).files)
+    lotes, linhas = [], 0
+    for arquivo in arquivos:
+        with pq.ParquetFile(arquivo) as parquet:
+            for lote in parquet.iter_batches(batch_size=tamanho_bloco, columns=colunas):
+                lotes.append(lote)
+                linhas += lote.num_rows
+                if linhas >= tamanho_bloco:
+                    yield _tabela_para_pandas(lotes, etapa)
+                    lotes, linhas = [], 0
+    if lotes:
+        yield _tabela_para_pandas(lotes, etapa)
+
+
+def ler_etapa_em_blocos(caminho, etapa, ticker=TICKER_PADRAO, tamanho_bloco=TAMANHO_BLOCO, colunas=None):
+    """
+    Lê uma etapa em blocos de até ~`tamanho_bloco` linhas, em ordem cronológica de gravação, sem
+    carregar o histórico inteiro: no CSV, `read_csv(chunksize=...)`; no Parquet, os row groups das
+    partições do ticker, dia a dia. Cada bloco tem o mesmo formato de `ler_etapa`.
+    """
+    _validar_etapa(etapa)
+    if eh_csv(caminho):
+        yield from _blocos_csv(caminho, etapa, tamanho_bloco, colunas)
+    else:
+        yield from _blocos_parquet(caminho, etapa, ticker, tamanho_bloco, colunas)
+
+
+def salvar_etapa(df, caminho, etapa, ticker=TICKER_PADRAO):
+    """Grava o conjunto completo de uma etapa, substituindo o que existia para o ticker."""
+    _validar_etapa(etapa)
+    if eh_csv(caminho):
+        _salvar_csv(df, caminho, etapa)
+        return
+
+    diretorio = _diretorio_ticker(caminho, ticker)
+    if os.path.isdir(diretorio):
+        shutil.rmtree(diretorio)
+    if not df.empty:
+        _gravar_parquet(df, caminho, etapa, ticker)
+
+
+def acrescentar_etapa(df_novo, caminho, etapa, ticker=TICKER_PADRAO):
+    """
+    Acrescenta dados novos a uma etapa.
+
+    No Parquet apenas as partições (dias) presentes em `df_novo` são gravadas/substituídas.
+    No CSV o arquivo existente é lido, concatenado, deduplicado (pelo índice no bruto, por data e hora
+    nas demais etapas, mantendo a versão nova) e regravado.
+    Retorna o DataFrame gravado.
+    """
+    _validar_etapa(etapa)
+    if df_novo.empty:
+        return df_novo
+
+    if not eh_csv(caminho):
+        _gravar_parquet(df_novo, caminho, etapa, ticker)
+        return df_novo
+
+    df_antigo = _ler_csv(caminho, etapa)
+    if df_antigo.empty:
+        df_total = df_novo
+    elif etapa == 'bruto':
+        df_total = pd.concat([df_antigo, df_novo])
+        df_total = df_total[~df_total.index.duplicated(keep='last')]
+    else:
+        df_total = pd.concat([df_antigo, df_novo], ignore_index=True)
+        if 'data' in df_total.columns and 'hora' in df_total.columns:
+            df_total = df_total.drop_duplicates(subset=['data', 'hora'], keep='last', ignore_index=True)
+    _salvar_csv(df_total, caminho, etapa)
+    return df_total
@@ -1,17 +1,106 @@
 
 import sqlite3
+from contextlib import contextmanager
+
 import pandas as pd
 
-def carregar_dados(df, db_path):
-    conn = sqlite3.connect(db_path)
+from scripts.pipeline.armazenamento import TICKER_PADRAO
+
+"""
+Carga dos dados transformados no banco dimensional (SQLite).
+
+Modos de carga:
+- `incremental` (padrão): grava apenas os candles posteriores ao último (data, hora) do ticker já
+  presente em dim_tempo, com `INSERT ... ON CONFLICT DO UPDATE` sobre as chaves naturais criadas por
+  `criar_banco` (dim_tempo(data, hora, ticker) e id_tempo nas demais tabelas). Reexecutar a carga com
+  o mesmo arquivo não duplica linhas, e uma execução diária grava só o dia novo. Vários tickers
+  dividem o mesmo banco, cada um com a sua marca d'água.
+- `linha`: percorre o DataFrame com `iterrows()` e faz cinco INSERTs por candle,
+  encadeando as tabelas pelo `cursor.lastrowid` (modo original, mantido como referência).
+- `bulk`: pré-atribui a faixa de `id_tempo` a partir do maior id já gravado, monta as
+  colunas de cada tabela uma única vez e grava cada tabela com `executemany` dentro de
+  uma única transação, com PRAGMAs do SQLite ajustados apenas durante a carga.
+  Indicado para a primeira carga de um banco vazio.
+"""
+
+COLUNAS_DIM_TEMPO = ['ticker', 'data', 'hora', 'dia_da_semana_entrada', 'hora_num', 'minuto']
+
+COLUNAS_DIM_INDICADORES = [
+    'SMA_10', 'EMA_10', 'MACD', 'Signal_Line',
+    'rsi', 'OBV', 'CCI', 'ATR', 'retorno', 'volatilidade'
+]
+
+COLUNAS_DIM_LAGS = [
+    'fechamento_lag1', 'retorno_lag1', 'volume_lag1',
+    'fechamento_lag2', 'retorno_lag2', 'volume_lag2',
+    'fechamento_lag3', 'retorno_lag3', 'volume_lag3'
+]
+
+COLUNAS_DIM_OPERACIONAL = [
+    'data_previsao', 'dia_da_semana_previsao', 'hora_num', 'minuto',
+    'mercado_aberto', 'fechamento_dia', 'volume_dia', 'maximo_dia', 'minimo_dia',
+    'fechamento_dia_anterior', 'volume_dia_anterior', 'maximo_dia_anterior', 'minimo_dia_anterior'
+]
+
+COLUNAS_FATO_PRECOS = ['abertura', 'minimo', 'maximo', 'fechamento']
+
+# PRAGMAs aplicados somente durante a carga em lote
+PRAGMAS_CARGA = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': -200000,  # ~200 MB de cache de páginas
+}
+
+
+def _sql_insert(tabela, colunas, chave_conflito=None):
+    marcadores = ', '.join(['?'] * len(colunas))
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})"
+
+    if chave_conflito:
+        atualizacoes = ', '.join(
+            f"{col} = excluded.{col}" for col in colunas if col not in chave_conflito
+        )
+        sql += f" ON CONFLICT ({', '.join(chave_conflito)}) DO UPDATE SET {atualizacoes}"
+    return sql
+
+
+def _preparar_colunas(df):
+    """Converte os tipos do DataFrame para valores aceitos pelo sqlite3 (texto, int, float, None)."""
+    df = df.copy()
+
+    if 'mercado_aberto' not in df.columns:
+        df['mercado_aberto'] = 1  # valor padrão
+
+    for col in ['data', 'data_previsao']:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+        else:
+            df[col] = df[col].astype(str)
+    df['hora'] = df['hora'].astype(str)
+
+    # NaN -> None e tipos numpy -> tipos nativos do Python
+    df = df.astype(object).where(df.notna(), None)
+    return df
+
+
+def _linhas(df, colunas, ids=None):
+    """Monta a lista de tuplas de uma tabela a partir das colunas já preparadas."""
+    valores = [df[col].tolist() for col in colunas]
+    if ids is not None:
+        valores.insert(0, ids)
+    return list(zip(*valores))
+
+
+def _carregar_linha_a_linha(conn, df):
     cursor = conn.cursor()
 
     for _, row in df.iterrows():
         # Inserção em dim_tempo
         cursor.execute("""
-            INSERT INTO dim_tempo (data, hora, dia_da_semana_entrada, hora_num, minuto)
-            VALUES (?, ?, ?, ?, ?)
-        """, (row['data'], row['hora'], row['dia_da_semana_entrada'], row['hora_num'], row['minuto']))
+            INSERT INTO dim_tempo (ticker, data, hora, dia_da_semana_entrada, hora_num, minuto)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (row['ticker'], row['data'], row['hora'], row['dia_da_semana_entrada'], row['hora_num'], row['minuto']))
 
         id_tempo = cursor.lastrowid
 
@@ -64,8 +153,146 @@ def carregar_dados(df, db_path):
         ))
 
     conn.commit()
-    conn.close()
-    print("Dados carregados com sucesso.")
+
+
+@contextmanager
+def _transacao_de_carga(cursor):
+    """Abre uma transação única com os PRAGMAs de carga, restaurando os valores originais ao final."""
+    pragmas_originais = {
+        nome: cursor.execute(f"PRAGMA {nome}").fetchone()[0] for nome in PRAGMAS_CARGA
+    }
+    for nome, valor in PRAGMAS_CARGA.items():
+        cursor.execute(f"PRAGMA {nome} = {valor}")
+
+    try:
+        cursor.execute("BEGIN")
+        yield cursor
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        for nome, valor in pragmas_originais.items():
+            cursor.execute(f"PRAGMA {nome} = {valor}")
+
+
+def _gravar_tabelas_dependentes(cursor, df, ids, upsert=False):
+    """Grava dim_indicadores, dim_lags, dim_operacional e fato_precos para os id_tempo informados."""
+    chave = ['id_tempo'] if upsert else None
+    tabelas = [
+        ('dim_indicadores', COLUNAS_DIM_INDICADORES),
+        ('dim_lags', COLUNAS_DIM_LAGS),
+        ('dim_operacional', COLUNAS_DIM_OPERACIONAL),
+        ('fato_precos', COLUNAS_FATO_PRECOS),
+    ]
+    for tabela, colunas in tabelas:
+        cursor.executemany(
+            _sql_insert(tabela, ['id_tempo'] + colunas, chave),
+            _linhas(df, colunas, ids)
+        )
+
+
+def _carregar_bulk(conn, df):
+    if df.empty:
+        return 0
+
+    df = _preparar_colunas(df)
+    cursor = conn.cursor()
+
+    with _transacao_de_carga(cursor):
+        # Pré-atribui a faixa de id_tempo a partir do maior id já existente
+        id_inicial = cursor.execute("SELECT COALESCE(MAX(id_tempo), 0) + 1 FROM dim_tempo").fetchone()[0]
+        ids = list(range(id_inicial, id_inicial + len(df)))
+
+        cursor.executemany(
+            _sql_insert('dim_tempo', ['id_tempo'] + COLUNAS_DIM_TEMPO),
+            _linhas(df, COLUNAS_DIM_TEMPO, ids)
+        )
+        _gravar_tabelas_dependentes(cursor, df, ids)
+
+    return len(df)
+
+
+def obter_ultimo_candle(conn, ticker=TICKER_PADRAO):
+    """Retorna o último (data, hora) do ticker gravado em dim_tempo, ou None se não houver."""
+    return conn.execute(
+        "SELECT data, hora FROM dim_tempo WHERE ticker = ? ORDER BY data DESC, hora DESC LIMIT 1", (ticker,)
+    ).fetchone()
+
+
+def _carregar_incremental(conn, df, ticker):
+    if df.empty:
+        return 0
+
+    df = _preparar_colunas(df)
+    cursor = conn.cursor()
+
+    # Mantém apenas os candles posteriores ao último (data, hora) já gravado para o ticker
+    ultimo = obter_ultimo_candle(conn, ticker)
+    if ultimo is not None:
+        ultima_data, ultima_hora = ultimo
+        novos = (df['data'] > ultima_data) | ((df['data'] == ultima_data) & (df['hora'] > ultima_hora))
+        df = df[novos]
+        print(f"[{ticker}] Último candle no banco: {ultima_data} {ultima_hora}. Novos candles: {len(df)}")
+
+    # Um candle por (data, hora): a última ocorrência no DataFrame prevalece
+    df = df.drop_duplicates(subset=['data', 'hora'], keep='last')
+    if df.empty:
+        return 0
+
+    with _transacao_de_carga(cursor):
+        cursor.executemany(
+            _sql_insert('dim_tempo', COLUNAS_DIM_TEMPO, ['data', 'hora', 'ticker']),
+            _linhas(df, COLUNAS_DIM_TEMPO)
+        )
+
+        # Recupera os id_tempo (novos ou já existentes) pela chave natural
+        ids_por_chave = dict(
+            ((data, hora), id_tempo) for id_tempo, data, hora in cursor.execute(
+                "SELECT id_tempo, data, hora FROM dim_tempo WHERE data >= ? AND ticker = ?",
+                (df['data'].min(), ticker)
+            )
+        )
+        ids = [ids_por_chave[chave] for chave in zip(df['data'], df['hora'])]
+
+        _gravar_tabelas_dependentes(cursor, df, ids, upsert=True)
+
+    return len(df)
+
+
+def carregar_dados(df, db_path, modo='incremental', ticker=TICKER_PADRAO):
+    """
+    Carrega o DataFrame transformado nas tabelas do banco dimensional.
+
+    Parâmetros:
+    df (pd.DataFrame): Dados transformados (saída de `transformar_dados`).
+    db_path (str): Caminho do banco SQLite criado por `criar_banco`.
+    modo (str): 'incremental' (padrão, upsert apenas dos candles novos), 'bulk' (executemany
+        de todo o DataFrame em uma única transação) ou 'linha' (INSERT por candle).
+    ticker (str): Ticker dos candles (parte da chave natural de dim_tempo).
+
+    Retorna:
+    int: Quantidade de candles gravados.
+    """
+    if modo not in ('incremental', 'bulk', 'linha'):
+        raise ValueError(f"Modo de carga inválido: {modo}. Use 'incremental', 'bulk' ou 'linha'.")
+    df = df.assign(ticker=ticker)
+
+    # isolation_level=None: o controle da transação fica explícito (BEGIN/COMMIT) nos modos em lote
+    conn = sqlite3.connect(db_path, isolation_level='' if modo == 'linha' else None)
+    try:
+        if modo == 'incremental':
+            gravados = _carregar_incremental(conn, df, ticker)
+        elif modo == 'bulk':
+            gravados = _carregar_bulk(conn, df)
+        else:
+            _carregar_linha_a_linha(conn, df)
+            gravados = len(df)
+    finally:
+        conn.close()
+
+    print(f"Dados carregados com sucesso ({gravados} registros, modo {modo}).")
+    return gravados
 
 if __name__ == "__main__":
     df = pd.read_csv('/content/Piloto_Day_Trade/data/transformed/dados_transformados.csv')
@@ -1,59 +1,159 @@
 
 import os
+import sys
 import pandas as pd
 
+from scripts.pipeline.armazenamento import TAMANHO_BLOCO, eh_csv, ler_etapa
 from scripts.pipeline.extracao_dados import extrair_dados
-from scripts.pipeline.limpeza_dados import limpeza_dados
+from scripts.pipeline.limpeza_dados import limpeza_dados, limpeza_dados_em_blocos
 from scripts.pipeline.transformacao_dados import transformar_dados
 from scripts.pipeline.carga_dados import carregar_dados
-from scripts.pipeline.criar_banco_dimensional import criar_banco
-from scripts.modelagem_machine_learning.preparar_dados_modelagem_LSTM import preparar_dados_lstm
-
-def executar_pipeline(ticker, intervalo, dias, caminho_bruto, caminho_limpo, caminho_transformado, db_path, tam_seq, tx_treino):
-    print("\nIniciando execução completa do pipeline...")
-
-    # Etapa 1: Extração
-    print("Executando: Extração de dados")
-    extrair_dados(ticker, dias, intervalo, caminho_bruto)
-
-    # Etapa 2: Limpeza
-    print("Executando: Limpeza de dados")
-    df_bruto = pd.read_csv(caminho_bruto, index_col=0, parse_dates=True, dayfirst=True)
-    limpeza_dados(df_bruto, caminho_limpo)
-
-    # Etapa 3: Transformação
-    print("Executando: Transformação de dados")
-    transformar_dados(caminho_limpo, caminho_transformado)
-
-    # Etapa 4: Criar banco dimensional
-    print("Executando: Criação do banco dimensional")
-    criar_banco(db_path)  # Passando db_path para a função
-
-    # Etapa 5: Carga de dados
-    print("Executando: Carga de dados")
-    df_transformado = pd.read_csv(caminho_transformado)
-    carregar_dados(df_transformado)
-
-    # Etapa 7: Preparação dos dados para modelagem
-    print("Executando: Preparação de dados para LSTM")
-    preparar_dados_lstm(
-        path_dados=caminho_transformado,
-        tam_seq=tam_seq,
-        tx_treino=tx_treino
+from scripts.pipeline.executor_dag import Arquivo, Dados, Etapa, executar_dag
+from scripts.pipeline.instrumentacao import Instrumentacao
+from scripts.pipeline.manifesto_pipeline import marca_vigente
+from scripts.operacional.criar_banco_dimensional import VERSAO_ESQUEMA, criar_banco
+from scripts.operacional.diagnostico_qualidade_dados import diagnosticar_qualidade_dados
+from scripts.modelagem_machine_learning.dataset_mmap import DIR_DATASETS
+
+ARQUIVO_METRICAS = '/content/Piloto_Day_Trade/reports/metricas_pipeline.jsonl'
+ARQUIVO_ESTADO = '/content/Piloto_Day_Trade/reports/estado_pipeline.json'
+DIR_RELATORIOS = '/content/Piloto_Day_Trade/reports/qualidade'
+
+# Funções das etapas: no nível do módulo para serem executadas nos processos do `executor_dag`
+
+def etapa_extracao(ticker, dias, intervalo, caminho_bruto):
+    df_extraido = extrair_dados(ticker, dias, intervalo, caminho_bruto)
+    return {'saida': df_extraido}
+
+def etapa_limpeza(ticker, caminho_bruto, caminho_limpo, tamanho_bloco=None):
+    marca_bruto = marca_vigente(caminho_bruto, 'bruto', ticker)
+    if tamanho_bloco:
+        # Histórico longo: lido e gravado em blocos, sem carregar o bruto inteiro
+        resumo = limpeza_dados_em_blocos(caminho_bruto, caminho_limpo, ticker, tamanho_bloco,
+                                         hash_entrada=(marca_bruto or {}).get('hash'))
+        return {'entrada': resumo['linhas_brutas'], 'saida': resumo['linhas_limpas']}
+    df_bruto = ler_etapa(caminho_bruto, 'bruto', ticker)
+    df_limpo = limpeza_dados(df_bruto, caminho_limpo, ticker, hash_entrada=(marca_bruto or {}).get('hash'))
+    return {'entrada': df_bruto, 'saida': df_limpo}
+
+def etapa_transformacao(ticker, caminho_limpo, caminho_transformado):
+    df_novos = transformar_dados(caminho_limpo, caminho_transformado, ticker)
+    return {'saida': df_novos}
+
+def etapa_banco(db_path, versao_esquema):
+    # `versao_esquema` só entra na impressão da etapa: um esquema novo migra bancos já existentes
+    criar_banco(db_path)
+
+def etapa_carga(ticker, caminho_transformado, db_path):
+    df_transformado = ler_etapa(caminho_transformado, 'transformado', ticker)
+    gravados = carregar_dados(df_transformado, db_path, ticker=ticker)
+    return {'entrada': df_transformado, 'saida': gravados}
+
+def etapa_preparacao_lstm(ticker, caminho_transformado, janela, test_size, dir_datasets):
+    # Importado aqui: só o processo que prepara o dataset carrega o scikit-learn
+    from scripts.modelagem_machine_learning.preparar_dados_modelagem_LSTM_global import preparar_dados_lstm_global
+
+    df_transformado = ler_etapa(caminho_transformado, 'transformado', ticker)
+    X_train, X_val, X_test, *_ = preparar_dados_lstm_global(
+        df_transformado, janela=janela, test_size=test_size, dir_datasets=dir_datasets, ticker=ticker
     )
+    return {'entrada': df_transformado, 'saida': len(X_train) + len(X_val) + len(X_test)}
+
+def etapa_diagnostico(ticker, caminho_transformado, caminho_relatorio):
+    df_transformado = ler_etapa(caminho_transformado, 'transformado', ticker)
+    diagnosticar_qualidade_dados(df_transformado, caminho_relatorio.format(ticker=ticker))
+    return {'entrada': df_transformado}
+
+def montar_etapas(intervalo, dias, caminho_bruto, caminho_limpo, caminho_transformado, db_path, tam_seq, tx_treino,
+                  dir_datasets=DIR_DATASETS, dir_relatorios=DIR_RELATORIOS, tamanho_bloco=None):
+    """
+    Grafo do pipeline: extração -> limpeza -> transformação -> (carga | preparação LSTM | diagnóstico).
+    Com `tamanho_bloco`, a limpeza lê o bruto em blocos dessa quantidade de linhas.
+    """
+    bruto, limpo, transformado = Dados(caminho_bruto, 'bruto'), Dados(caminho_limpo, 'limpo'), Dados(caminho_transformado, 'transformado')
+    banco = Arquivo(db_path)
+    relatorio = Arquivo(os.path.join(dir_relatorios, 'diagnostico_qualidade_{ticker}.csv'))
+
+    return [
+        # A fonte é externa: a extração sempre roda (ela mesma só baixa o que falta)
+        Etapa('extracao', etapa_extracao, saidas=[bruto], sempre_executar=True,
+              parametros={'dias': dias, 'intervalo': intervalo, 'caminho_bruto': caminho_bruto}),
+        Etapa('limpeza', etapa_limpeza, entradas=[bruto], saidas=[limpo],
+              parametros={'caminho_bruto': caminho_bruto, 'caminho_limpo': caminho_limpo,
+                          'tamanho_bloco': tamanho_bloco}),
+        Etapa('transformacao', etapa_transformacao, entradas=[limpo], saidas=[transformado],
+              parametros={'caminho_limpo': caminho_limpo, 'caminho_transformado': caminho_transformado}),
+        Etapa('banco_dimensional', etapa_banco, saidas=[banco], por_ticker=False,
+              parametros={'db_path': db_path, 'versao_esquema': VERSAO_ESQUEMA}),
+        # O banco não entra como entrada da carga (a própria carga o altera); só a ordem é declarada e,
+        # quando o banco é (re)criado nesta execução, a carga de todos os tickers roda de novo
+        Etapa('carga', etapa_carga, entradas=[transformado], depende_de=['banco_dimensional'], serial=True,
+              parametros={'caminho_transformado': caminho_transformado, 'db_path': db_path}),
+        Etapa('preparacao_lstm', etapa_preparacao_lstm, entradas=[transformado],
+              parametros={'caminho_transformado': caminho_transformado, 'janela': tam_seq,
+                          'test_size': round(1 - tx_treino, 6), 'dir_datasets': dir_datasets}),
+        Etapa('diagnostico_qualidade', etapa_diagnostico, entradas=[transformado], saidas=[relatorio],
+              parametros={'caminho_transformado': caminho_transformado, 'caminho_relatorio': relatorio.caminho}),
+    ]
+
+def executar_pipeline(ticker, intervalo, dias, caminho_bruto, caminho_limpo, caminho_transformado, db_path, tam_seq, tx_treino,
+                      perfilar=False, arquivo_metricas=ARQUIVO_METRICAS, arquivo_estado=ARQUIVO_ESTADO,
+                      max_processos=None, forcar=False, dir_datasets=DIR_DATASETS, dir_relatorios=DIR_RELATORIOS,
+                      tamanho_bloco=None):
+    """
+    Executa o grafo de etapas (`executor_dag.py`) para um ticker ou uma lista de tickers: etapas com
+    entradas inalteradas desde a última execução são puladas, os ramos independentes rodam em processos
+    separados e a falha de um ticker não interrompe os demais (`forcar=True` executa tudo).
+
+    Cada etapa é medida (`instrumentacao.py`): tempo, CPU, pico de memória, linhas e bytes vão para
+    `arquivo_metricas` (JSON lines) e para o resumo impresso no fim. Com `perfilar=True`
+    (`--profile` na linha de comando), grava também um perfil cProfile por etapa.
+
+    Com `tamanho_bloco` (`--em-blocos`), a limpeza lê o bruto em blocos e grava cada bloco limpo em
+    seguida, com memória limitada pelo bloco (backfills longos).
+
+    Retorna:
+    (dict, Instrumentacao): situação de cada (etapa, ticker) e as medições.
+    """
+    tickers = [ticker] if isinstance(ticker, str) else list(ticker)
+    if eh_csv(caminho_bruto) and len(tickers) > 1:
+        raise ValueError("O CSV bruto guarda um único ticker; use um diretório Parquet para vários tickers.")
+
+    print(f"\nIniciando execução do pipeline ({', '.join(tickers)})...")
+    instrumentacao = Instrumentacao(arquivo_metricas, perfilar=perfilar)
+    etapas = montar_etapas(intervalo, dias, caminho_bruto, caminho_limpo, caminho_transformado, db_path,
+                           tam_seq, tx_treino, dir_datasets, dir_relatorios, tamanho_bloco)
 
-    print("\nPipeline finalizado com sucesso.")
+    situacao = {}
+    try:
+        situacao = executar_dag(etapas, tickers, max_processos, arquivo_estado, instrumentacao, forcar)
+        falhas = sorted({ticker for (_, ticker), status in situacao.items() if status == 'erro' and ticker})
+        if falhas:
+            print(f"\nPipeline finalizado com erros nos tickers: {', '.join(falhas)}.")
+        else:
+            print("\nPipeline finalizado com sucesso.")
+    finally:
+        instrumentacao.imprimir_resumo()
+        if arquivo_metricas:
+            print(f"Métricas das etapas em: {arquivo_metricas}")
+    return situacao, instrumentacao
 
 if __name__ == "__main__":
     # Chamada com parâmetros do projeto
     ticker = "BBDC4.SA"
     intervalo = "5m"
     dias = 45
-    caminho_bruto = "/content/Piloto_Day_Trade/data/raw/dados_brutos.csv"
-    caminho_limpo = "/content/Piloto_Day_Trade/data/cleaned/dados_limpos.csv"
-    caminho_transformado = "/content/Piloto_Day_Trade/data/transformed/dados_transformados.csv"
+    # Datasets Parquet particionados por ticker/dia (use caminhos .csv para o formato antigo)
+    caminho_bruto = "/content/Piloto_Day_Trade/data/raw/dados_brutos"
+    caminho_limpo = "/content/Piloto_Day_Trade/data/cleaned/dados_limpos"
+    caminho_transformado = "/content/Piloto_Day_Trade/data/transformed/dados_transformados"
     db_path = "/content/Piloto_Day_Trade/modelagem/database/banco_dimensional.db"
     tam_seq = 96
     tx_treino = 0.8
 
-    executar_pipeline(ticker, intervalo, dias, caminho_bruto, caminho_limpo, caminho_transformado, db_path, tam_seq, tx_treino)
+    # `--profile` grava um perfil cProfile por etapa ao lado do arquivo de métricas;
+    # `--forcar` executa todas as etapas mesmo com entradas inalteradas;
+    # `--em-blocos` limpa o bruto em blocos de TAMANHO_BLOCO linhas (históricos longos)
+    executar_pipeline(ticker, intervalo, dias, caminho_bruto, caminho_limpo, caminho_transformado, db_path, tam_seq, tx_treino,
+                      perfilar='--profile' in sys.argv, forcar='--forcar' in sys.argv,
+                      tamanho_bloco=TAMANHO_BLOCO if '--em-blocos' in sys.argv else None)
@@ -0,0 +1,282 @@
+
+#@title Executor do pipeline como grafo de etapas (dependências, etapas puladas e ramos em paralelo)
+
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from scripts.pipeline.instrumentacao import Instrumentacao
+from scripts.pipeline.manifesto_pipeline import marca_vigente
+
+"""
+Cada etapa declara o que lê e o que grava; as dependências entre etapas saem dessas declarações
+(uma etapa depende de quem produz as suas entradas) e de `depende_de`, para ordens sem artefato
+rastreável (ex.: criar o banco antes da carga).
+
+    Etapa('limpeza', etapa_limpeza, entradas=[Dados(caminho_bruto, 'bruto')],
+          saidas=[Dados(caminho_limpo, 'limpo')], parametros={...})
+
+- Etapa pulada: a impressão de uma unidade (etapa, ticker) é o hash das impressões das entradas
+  (hash da marca d'água do manifesto para `Dados`, tamanho + data de modificação para `Arquivo`)
+  e dos parâmetros. Se é a mesma da última execução bem-sucedida (`arquivo_estado`) e as saídas
+  existem, a unidade não roda. `sempre_executar=True` é para etapas com fonte externa (extração).
+  Uma dependência só de ordem (`depende_de`) não tem impressão: se ela rodou nesta execução, a
+  unidade roda também (ex.: banco recriado vazio -> carga refeita).
+- Ramos em paralelo: unidades cujas dependências terminaram são enviadas a um `ProcessPoolExecutor`;
+  depois da transformação, carga no banco, preparação do dataset e diagnóstico rodam ao mesmo tempo.
+  `serial=True` limita a etapa a uma unidade por vez (ex.: gravações no mesmo SQLite).
+- Falhas isoladas por ticker: o erro de uma unidade bloqueia só as unidades do mesmo ticker que
+  dependem dela; etapas globais que dependem de etapas por ticker rodam se algum ticker concluiu.
+
+As funções das etapas ficam no nível do módulo (são enviadas aos processos) e recebem o ticker
+(etapas por ticker) e os `parametros`; podem retornar {'entrada': ..., 'saida': ...} para a contagem
+de linhas. Cada unidade é medida no processo que a executa (`instrumentacao.py`) e o registro volta
+para a instrumentação da execução, junto com as unidades puladas e bloqueadas.
+"""
+
+
+class Dados:
+    """
+    Etapa gravada pela camada de armazenamento; impressão = hash da marca d'água do ticker (None se os
+    dados foram apagados: a marca é descartada e a unidade que os grava volta a ser executada).
+    """
+
+    def __init__(self, caminho, etapa):
+        self.caminho = caminho
+        self.etapa = etapa
+        self.chave = f"{etapa}:{caminho}"
+
+    def impressao(self, ticker):
+        marca = marca_vigente(self.caminho, self.etapa, ticker)
+        return marca.get('hash') if marca else None
+
+
+class Arquivo:
+    """Arquivo comum (`{ticker}` no caminho é substituído); impressão = tamanho + data de modificação."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.chave = caminho
+
+    def impressao(self, ticker):
+        try:
+            info = os.stat(self.caminho.format(ticker=ticker))
+        except OSError:
+            return None
+        return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+class Etapa:
+    """
+    Parâmetros:
+    nome (str): Nome da etapa (também no log de métricas).
+    funcao (callable): `funcao(ticker, **parametros)` ou, se `por_ticker=False`, `funcao(**parametros)`.
+    entradas, saidas (list): Artefatos (`Dados`/`Arquivo`) lidos e gravados.
+    depende_de (list): Etapas que precisam terminar antes, além das derivadas das entradas.
+    """
+
+    def __init__(self, nome, funcao, entradas=(), saidas=(), depende_de=(), parametros=None,
+                 por_ticker=True, sempre_executar=False, serial=False):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.saidas = list(saidas)
+        self.depende_de = list(depende_de)
+        self.parametros = parametros or {}
+        self.por_ticker = por_ticker
+        self.sempre_executar = sempre_executar
+        self.serial = serial
+
+
+def ordenar_etapas(etapas):
+    """
+    Dependências de cada etapa e ordem topológica (Kahn).
+
+    Retorna:
+    (list, dict): etapas em ordem de execução e {nome: nomes das etapas das quais depende}.
+    """
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    if len(por_nome) != len(etapas):
+        raise ValueError("Nomes de etapas repetidos.")
+    produtores = {}
+    for etapa in etapas:
+        for saida in etapa.saidas:
+            if saida.chave in produtores:
+                raise ValueError(f"'{saida.chave}' é gravado por '{produtores[saida.chave]}' e '{etapa.nome}'.")
+            produtores[saida.chave] = etapa.nome
+
+    dependencias = {}
+    for etapa in etapas:
+        desconhecidas = set(etapa.depende_de) - set(por_nome)
+        if desconhecidas:
+            raise ValueError(f"'{etapa.nome}' depende de etapas inexistentes: {sorted(desconhecidas)}")
+        dependencias[etapa.nome] = set(etapa.depende_de) | {
+            produtores[entrada.chave] for entrada in etapa.entradas if entrada.chave in produtores
+        }
+
+    ordem, restantes = [], {nome: set(deps) for nome, deps in dependencias.items()}
+    while restantes:
+        prontas = [etapa.nome for etapa in etapas if etapa.nome in restantes and not restantes[etapa.nome]]
+        if not prontas:
+            raise ValueError(f"Dependência circular entre as etapas: {sorted(restantes)}")
+        for nome in prontas:
+            ordem.append(por_nome[nome])
+            del restantes[nome]
+        for deps in restantes.values():
+            deps.difference_update(prontas)
+    return ordem, dependencias
+
+
+def _impressao(etapa, ticker):
+    conteudo = {
+        'funcao': f"{etapa.funcao.__module__}.{etapa.funcao.__qualname__}",
+        'parametros': etapa.parametros,
+        'entradas': {entrada.chave: entrada.impressao(ticker) for entrada in etapa.entradas},
+    }
+    return hashlib.sha1(json.dumps(conteudo, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _chave_estado(nome, ticker):
+    return f"{nome}|{ticker or '*'}"
+
+
+def _carregar_estado(caminho):
+    if not caminho or not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _salvar_estado(estado, caminho):
+    if not caminho:
+        return
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporario, caminho)
+
+
+def _executar_unidade(funcao, nome, ticker, parametros, perfilar, dir_perfis):
+    """Roda uma unidade no processo de trabalho; retorna (registro da medição, erro ou None)."""
+    instrumentacao = Instrumentacao(perfilar=perfilar, dir_perfis=dir_perfis)
+    contexto = {'ticker': ticker} if ticker is not None else {}
+    erro = None
+    try:
+        with instrumentacao.etapa(nome, **contexto) as medicao:
+            linhas = funcao(ticker, **parametros) if ticker is not None else funcao(**parametros)
+            if linhas:
+                medicao.linhas(**linhas)
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+    return instrumentacao.registros[-1], erro
+
+
+def executar_dag(etapas, tickers, max_processos=None, arquivo_estado=None, instrumentacao=None, forcar=False):
+    """
+    Executa as etapas para todos os tickers respeitando as dependências.
+
+    Parâmetros:
+    etapas (list): `Etapa`s (em qualquer ordem).
+    tickers (list): Tickers das etapas por ticker.
+    max_processos (int): Unidades simultâneas (None = número de CPUs).
+    arquivo_estado (str): JSON com a impressão da última execução bem-sucedida de cada unidade
+        (None desativa o pulo de etapas).
+    instrumentacao (Instrumentacao): Recebe a medição de cada unidade.
+    forcar (bool): Executa todas as unidades, mesmo com entradas inalteradas.
+
+    Retorna:
+    dict: {(etapa, ticker): 'ok' | 'ignorada' | 'erro' | 'bloqueada'} (ticker None nas etapas globais).
+    """
+    ordem, dependencias = ordenar_etapas(etapas)
+    por_nome = {etapa.nome: etapa for etapa in ordem}
+    instrumentacao = instrumentacao or Instrumentacao()
+    estado = _carregar_estado(arquivo_estado)
+
+    def dependencias_unidade(nome, ticker):
+        for dependencia in dependencias[nome]:
+            if not por_nome[dependencia].por_ticker:
+                yield dependencia, None
+            elif ticker is not None:
+                yield dependencia, ticker
+            else:
+                yield from ((dependencia, outro) for outro in tickers)
+
+    def concluir(unidade, status, registro, impressao=None):
+        nome, ticker = unidade
+        situacao[unidade] = status
+        instrumentacao.registrar(registro)
+        if status == 'ok' and impressao is not None:
+            estado[_chave_estado(nome, ticker)] = {
+                'impressao': impressao, 'concluida_em': datetime.now().isoformat(timespec='seconds')
+            }
+        elif status == 'erro':
+            estado.pop(_chave_estado(nome, ticker), None)
+        _salvar_estado(estado, arquivo_estado)
+
+        rotulo = f"[{ticker}] " if ticker else ""
+        detalhe = registro.get('erro') or registro.get('motivo') or f"{registro.get('wall_s', 0):.2f} s"
+        print(f"{rotulo}{nome}: {status} ({detalhe})")
+
+    situacao = {}
+    pendentes = [(etapa.nome, ticker) for etapa in ordem for ticker in (tickers if etapa.por_ticker else [None])]
+    em_execucao = {}
+
+    with ProcessPoolExecutor(max_workers=max_processos) as executor:
+        while pendentes or em_execucao:
+            progresso = True
+            while progresso:
+                progresso = False
+                for unidade in list(pendentes):
+                    nome, ticker = unidade
+                    etapa = por_nome[nome]
+                    deps = list(dependencias_unidade(nome, ticker))
+                    if any(dep not in situacao for dep in deps):
+                        continue
+                    if etapa.serial and any(outra[0] == nome for outra, _ in em_execucao.values()):
+                        continue
+                    pendentes.remove(unidade)
+                    progresso = True
+
+                    falhas = [dep for dep in deps if situacao[dep] in ('erro', 'bloqueada')]
+                    # Etapa global com dependências por ticker só é bloqueada se nenhum ticker concluiu
+                    if falhas and (ticker is not None or len(falhas) == len(deps)):
+                        motivo = 'dependência com erro: ' + ', '.join(
+                            f"{dep_nome}[{dep_ticker}]" if dep_ticker else dep_nome for dep_nome, dep_ticker in falhas
+                        )
+                        concluir(unidade, 'bloqueada', {'etapa': nome, 'ticker': ticker, 'status': 'bloqueada', 'motivo': motivo})
+                        continue
+
+                    impressao = _impressao(etapa, ticker) if arquivo_estado else None
+                    anterior = estado.get(_chave_estado(nome, ticker), {})
+                    ordem_executada = any(situacao[dep] == 'ok' for dep in deps if dep[0] in etapa.depende_de)
+                    if (not forcar and not etapa.sempre_executar and not ordem_executada and impressao is not None
+                            and anterior.get('impressao') == impressao
+                            and all(saida.impressao(ticker) is not None for saida in etapa.saidas)):
+                        concluir(unidade, 'ignorada', {'etapa': nome, 'ticker': ticker, 'status': 'ignorada',
+                                                       'motivo': 'entradas inalteradas', 'wall_s': 0.0})
+                        continue
+
+                    futuro = executor.submit(
+                        _executar_unidade, etapa.funcao, nome, ticker, etapa.parametros,
+                        instrumentacao.perfilar, instrumentacao.dir_perfis
+                    )
+                    em_execucao[futuro] = (unidade, impressao)
+
+            if not em_execucao:
+                if pendentes:
+                    raise RuntimeError(f"Unidades sem como executar: {pendentes}")
+                break
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                unidade, impressao = em_execucao.pop(futuro)
+                try:
+                    registro, erro = futuro.result()
+                except Exception as e:  # processo de trabalho encerrado, argumentos não serializáveis...
+                    registro, erro = {'etapa': unidade[0], 'ticker': unidade[1]}, f"{type(e).__name__}: {e}"
+                    registro.update(status='erro', erro=erro)
+                concluir(unidade, 'erro' if erro else 'ok', registro, impressao)
+
+    return situacao
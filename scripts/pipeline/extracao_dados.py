@@ -1,13 +1,20 @@
 
 #@title  Extração de dados
 
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import os
+import time
 import dotenv
 import logging
 
+from scripts.pipeline.armazenamento import (
+    acrescentar_etapa, contar_linhas, eh_csv, ler_etapa_em_blocos, listar_dias, normalizar_bruto
+)
+from scripts.pipeline.manifesto_pipeline import caminho_manifesto_padrao, marca_vigente, registrar_marca
+from scripts.pipeline.provedores_dados import CacheRespostas, ProvedorYahoo
+
 logging.getLogger("yfinance").setLevel(logging.CRITICAL)
 dotenv.load_dotenv()
 
@@ -18,89 +25,156 @@ Etapas:
 - Define intervalo de coleta:
 - Início: hoje menos dias
 - Fim: ontem às 18:10 (ajustado para o fechamento)
-- Verifica se já existem dados anteriores salvos (dados_brutos.csv):
+- Verifica se já existem dados anteriores salvos (dados_brutos.csv ou dataset Parquet):
 - Se sim, tenta encontrar a última data registrada válida e usa como novo início e(xtração incremental).
-- Faz a requisição ao Yahoo Finance (yf.download), no intervalo necessário.
+  A data vem do manifesto da etapa (`manifesto_pipeline.py`); sem manifesto, no Parquet vem do nome
+  da última partição e no CSV da leitura do arquivo em blocos.
+- Faz a requisição ao provedor (Yahoo Finance por padrão, ver `provedores_dados.py`), no intervalo
+  necessário, com novas tentativas e espera exponencial em caso de falha. Com `cache`, a resposta
+  fica gravada em disco e reexecuções com o mesmo intervalo não voltam a chamar o provedor.
 - Ajusta o fuso horário dos dados para "America/Sao_Paulo".
-- Mescla os dados novos aos antigos (se houver), remove duplicatas e linhas com muitos nulos.
-- Salva o conjunto atualizado no CSV.
-- Retorna o conjunto de dados atualizado.
-
+- Remove duplicatas e linhas com muitos nulos e grava pela camada de armazenamento
+  (CSV: mescla com os antigos e regrava; Parquet: grava só as partições dos dias novos).
+- Atualiza a marca d'água do ticker no manifesto (última data, linhas e hash do conteúdo).
+- Retorna o conjunto de dados gravado (no Parquet, apenas os dias novos).
+
+`extrair_varios_tickers` faz o mesmo para uma lista de tickers em paralelo (threads, com limite de
+concorrência), gravando cada ticker nas suas partições do dataset Parquet. A falha de um ticker não
+interrompe os demais.
 """
 
-def extrair_dados(ticker, dias, intervalo, dados_brutos):
-    """Extrai e organiza dados do Yahoo Finance no intervalo correto."""
+def obter_ultima_data_extraida(dados_brutos, ticker):
+    """Última data com dados brutos gravados para o ticker (ou None)."""
+    # Manifesto: a marca d'água da última extração, sem ler os dados (descartada se o bruto foi apagado)
+    marca = marca_vigente(dados_brutos, 'bruto', ticker)
+    if marca is not None and 'ultima_data' in marca:
+        return pd.Timestamp(marca['ultima_data']).date()
+
+    if eh_csv(dados_brutos):
+        # CSV sem manifesto: percorre o arquivo em blocos (só o índice e uma coluna ficam em memória)
+        ultima = None
+        for bloco in ler_etapa_em_blocos(dados_brutos, 'bruto', ticker, colunas=['Close']):
+            if ultima is None or bloco.index.max() > ultima:
+                ultima = bloco.index.max()
+        return ultima.date() if ultima is not None else None
+
+    # Parquet: a última partição já indica a data, sem abrir nenhum arquivo
+    dias_gravados = listar_dias(dados_brutos, ticker)
+    return pd.Timestamp(dias_gravados[-1]).date() if dias_gravados else None
+
+def baixar_com_retentativas(provedor, ticker, inicio, fim, intervalo, tentativas=3, espera=1.0):
+    """Chama o provedor, repetindo com espera exponencial (espera, 2*espera, ...) se houver erro."""
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return provedor.baixar(ticker, inicio, fim, intervalo)
+        except Exception as e:
+            if tentativa == tentativas:
+                raise
+            print(f"[{ticker}] Falha na tentativa {tentativa}/{tentativas}: {e}. "
+                  f"Nova tentativa em {espera:.1f} s.")
+            time.sleep(espera)
+            espera *= 2
+
+def extrair_dados(ticker, dias, intervalo, dados_brutos, provedor=None, cache=None, tentativas=3):
+    """Extrai e organiza dados do provedor (Yahoo Finance por padrão) no intervalo correto."""
+    provedor = provedor or ProvedorYahoo()
     df_total = pd.DataFrame()
-    data_inicio = data_inicio = (datetime.today() - timedelta(days=dias)).date()
+    data_inicio = (datetime.today() - timedelta(days=dias)).date()
     data_fim = datetime.now().replace(hour=18, minute=10, second=0, microsecond=0) - timedelta(days=1)
 
     primeira_extracao = True
 
-    if os.path.exists(dados_brutos) and os.path.getsize(dados_brutos) > 0:
-        df_temp = pd.read_csv(
-            dados_brutos,
-            index_col=0,
-            parse_dates=True,
-            date_format="%Y-%m-%d %H:%M:%S"
-        )
-        if not df_temp.empty:
-            df_temp = df_temp.iloc[2:].copy()
-            df_temp.index.name = 'data'
-            df_temp = df_temp.reset_index()
-            df_temp['data'] = pd.to_datetime(df_temp['data']).dt.date
-            ultima_data = pd.to_datetime(df_temp['data'], errors='coerce').max()
-            print(f"Última data encontrada: {ultima_data}")
-
-            if pd.notnull(ultima_data):
-                data_inicio = ultima_data + timedelta(days=1)
-                primeira_extracao = False
+    ultima_data = obter_ultima_data_extraida(dados_brutos, ticker)
+    if ultima_data is not None:
+        print(f"[{ticker}] Última data encontrada: {ultima_data}")
+        data_inicio = ultima_data + timedelta(days=1)
+        primeira_extracao = False
 
     if primeira_extracao:
-        print(f"\nPrimeira extração de dados.")
+        print(f"\n[{ticker}] Primeira extração de dados.")
         print(f"Data de início: {data_inicio.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"Data de fim: {data_fim.strftime('%Y-%m-%d %H:%M:%S')}\n")
     else:
-        print(f"\nExtração complementar a partir de {data_inicio.strftime('%Y-%m-%d %H:%M:%S')}.")
+        print(f"\n[{ticker}] Extração complementar a partir de {data_inicio.strftime('%Y-%m-%d %H:%M:%S')}.")
         print(f"Data de fim: {data_fim.strftime('%Y-%m-%d %H:%M:%S')}\n")
 
-    df_novo = yf.download(
-        ticker,
-        start=data_inicio.strftime("%Y-%m-%d"),
-        end=data_fim.strftime("%Y-%m-%d"),
-        interval=intervalo,
-        progress=False
-    )
-
+    df_novo = cache.obter(ticker, data_inicio, data_fim, intervalo) if cache is not None else None
+    if df_novo is not None:
+        print(f"[{ticker}] Resposta lida do cache local.")
+    else:
+        df_novo = baixar_com_retentativas(provedor, ticker, data_inicio, data_fim, intervalo, tentativas)
+        if cache is not None:
+            cache.guardar(df_novo, ticker, data_inicio, data_fim, intervalo)
 
     if not df_novo.empty:
-        df_novo.index = (
-            df_novo.index.tz_convert("America/Sao_Paulo")
-            if df_novo.index.tz is not None
-            else df_novo.index.tz_localize("UTC").tz_convert("America/Sao_Paulo")
-        )
-
-        if os.path.exists(dados_brutos) and not primeira_extracao:
-            df_antigo = pd.read_csv(dados_brutos, index_col=0, parse_dates=True)
-            df_total = pd.concat([df_antigo, df_novo])
-        else:
-            df_total = df_novo
-
-        df_total = (
-            df_total.drop_duplicates()
-            .dropna(thresh=df_total.shape[1] * 0.5)
+        # Colunas de um nível e índice no fuso "America/Sao_Paulo"
+        df_novo = normalizar_bruto(df_novo)
 
+        df_novo = (
+            df_novo.drop_duplicates()
+            .dropna(thresh=df_novo.shape[1] * 0.5)
         )
 
-        df_total.to_csv(dados_brutos)
-        print("Dados somados e salvos com sucesso.")
+        # CSV: soma aos dados antigos e regrava; Parquet: grava apenas as partições dos dias novos
+        linhas_anteriores = contar_linhas(dados_brutos, ticker)
+        df_total = acrescentar_etapa(df_novo, dados_brutos, 'bruto', ticker)
+
+        # Marca d'água da extração (última data, linhas e hash) para a próxima execução
+        manifesto = caminho_manifesto_padrao(dados_brutos)
+        if eh_csv(dados_brutos):
+            registrar_marca(manifesto, 'bruto', ticker, df_total)
+        else:
+            registrar_marca(manifesto, 'bruto', ticker, df_novo, acrescimo=True, linhas_anteriores=linhas_anteriores)
+        print(f"[{ticker}] Dados somados e salvos com sucesso.")
     else:
-        print("Nenhum dado complementar foi adicionado.")
+        print(f"[{ticker}] Nenhum dado complementar foi adicionado.")
 
     return df_total
 
+def extrair_varios_tickers(tickers, dias, intervalo, dados_brutos, provedor=None, dir_cache=None,
+                           max_concorrencia=4, tentativas=3):
+    """
+    Extrai vários tickers em paralelo, cada um gravado nas suas partições do dataset Parquet.
+
+    Parâmetros:
+    tickers (list): Tickers da B3 (ex.: ['BBDC4.SA', 'ITUB4.SA']).
+    provedor: Objeto com `baixar(ticker, inicio, fim, intervalo)`; padrão `ProvedorYahoo()`.
+    dir_cache (str): Diretório do cache de respostas (None desativa o cache).
+    max_concorrencia (int): Máximo de requisições simultâneas ao provedor.
+
+    Retorna:
+    (dict, dict): linhas gravadas por ticker e erros por ticker (tickers que falharam em todas as tentativas).
+    """
+    if eh_csv(dados_brutos) and len(tickers) > 1:
+        raise ValueError("O CSV bruto guarda um único ticker; use um diretório Parquet para vários tickers.")
+
+    provedor = provedor or ProvedorYahoo()
+    cache = CacheRespostas(dir_cache) if dir_cache else None
+
+    def extrair(ticker):
+        return extrair_dados(ticker, dias, intervalo, dados_brutos, provedor, cache, tentativas)
+
+    gravados, erros = {}, {}
+    with ThreadPoolExecutor(max_workers=max_concorrencia) as executor:
+        futuros = {ticker: executor.submit(extrair, ticker) for ticker in tickers}
+        for ticker, futuro in futuros.items():
+            try:
+                gravados[ticker] = len(futuro.result())
+            except Exception as e:
+                print(f"[{ticker}] Extração falhou: {e}")
+                erros[ticker] = str(e)
+
+    print(f"\nExtração concluída: {len(gravados)} tickers ok, {len(erros)} com erro.")
+    return gravados, erros
+
 if __name__ == "__main__":
     ticker = "BBDC4.SA"
     intervalo = "5m"
     dias = 45
     dados_brutos = "/content/Piloto_Day_Trade/data/raw/dados_brutos.csv"
     df = extrair_dados(ticker, dias, intervalo, dados_brutos)
+
+    # Universo de tickers da B3 no dataset Parquet, com cache das respostas
+    # tickers = ["BBDC4.SA", "ITUB4.SA", "PETR4.SA", "VALE3.SA"]
+    # extrair_varios_tickers(tickers, dias, intervalo, "/content/Piloto_Day_Trade/data/raw/dados_brutos",
+    #                        dir_cache="/content/Piloto_Day_Trade/data/raw/cache")
@@ -0,0 +1,174 @@
+
+#@title Estado dos indicadores para a transformação incremental
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.pipeline.manifesto_pipeline import trava_arquivo
+
+"""
+Estado persistido entre execuções de `transformar_dados`, por ticker, para que os indicadores de um dia
+novo sejam calculados continuando o histórico em vez de recomeçar do zero:
+
+- `cauda`: últimos `JANELA_ESTADO` candles limpos, suficientes para todas as janelas móveis
+  (a maior é o ADX, média de 14 sobre médias de 14 das diferenças: 28 candles);
+- `ewm`: acumuladores das médias exponenciais (EMA_10, EMAs 12/26 do MACD, linha de sinal e
+  médias de ganho/perda do RSI);
+- `obv`: OBV acumulado até o último candle processado.
+
+Com esse estado, processar um dia novo custa O(candles novos) e produz os mesmos valores que
+recalcular todo o histórico.
+"""
+
+JANELA_ESTADO = 40
+
+COLUNAS_BASE = ['data', 'hora', 'abertura', 'minimo', 'maximo', 'fechamento', 'volume']
+
+# Abaixo disso `EstadoEWM.aplicar` usa o laço: o custo fixo de duas chamadas ao `ewm` do pandas
+# (~0,2 ms) só compensa a partir de algumas centenas de valores (um dia tem ~100 candles)
+MIN_VALORES_VETORIZADO = 512
+
+# Spans das médias exponenciais usadas em `calcular_indicadores`
+SPANS_EWM = {
+    'EMA_10': 10,
+    'ema_12': 12,
+    'ema_26': 26,
+    'Signal_Line': 9,
+    'ganho_rsi': 14,
+    'perda_rsi': 14,
+}
+
+
+class EstadoEWM:
+    """
+    Média exponencial com o mesmo cálculo de `Series.ewm(span=...).mean()` (adjust=True,
+    ignore_na=False), mas retomável: guarda a média e o peso acumulado entre chamadas.
+    """
+
+    __slots__ = ('alfa', 'fator', 'media', 'peso', 'n_obs')
+
+    def __init__(self, span, media=math.nan, peso=1.0, n_obs=0):
+        self.alfa = 2.0 / (span + 1.0)
+        self.fator = 1.0 - self.alfa
+        self.media = media
+        self.peso = peso
+        self.n_obs = n_obs
+
+    def atualizar(self, valor):
+        observado = valor == valor
+        self.n_obs += observado
+
+        if self.media == self.media:
+            self.peso *= self.fator
+            if observado:
+                if self.media != valor:
+                    self.media = (self.peso * self.media + valor) / (self.peso + 1.0)
+                self.peso += 1.0
+        elif observado:
+            self.media = valor
+
+        return self.media if self.n_obs > 0 else math.nan
+
+    def aplicar(self, valores):
+        """
+        Atualiza o estado com uma sequência de valores e devolve a média após cada um. Sequências
+        longas não passam pelo laço em Python: a média e o peso só dos valores novos vêm do `ewm` do
+        pandas e o estado anterior entra em forma fechada, com peso `peso * fator**k` no k-ésimo valor.
+        """
+        valores = np.asarray(valores, dtype=float)
+        if len(valores) < MIN_VALORES_VETORIZADO:
+            atualizar = self.atualizar
+            return np.array([atualizar(v) for v in valores.tolist()], dtype=float)
+
+        media_nova = pd.Series(valores).ewm(alpha=self.alfa).mean().to_numpy()
+        observados = ~np.isnan(valores)
+        peso_novo = pd.Series(observados, dtype=float).ewm(alpha=self.alfa).sum().to_numpy()
+
+        if self.media == self.media:
+            peso_anterior = self.peso * self.fator ** np.arange(1, len(valores) + 1)
+            peso = peso_anterior + peso_novo
+            # Antes do primeiro valor novo observado a média é a anterior (o peso só decai)
+            com_novos = peso_novo > 0
+            medias = np.full(len(valores), self.media)
+            medias[com_novos] = (
+                peso_anterior[com_novos] * self.media + peso_novo[com_novos] * media_nova[com_novos]
+            ) / peso[com_novos]
+        else:
+            peso, medias = peso_novo, media_nova
+
+        self.n_obs += int(observados.sum())
+        if self.n_obs > 0:
+            self.media, self.peso = float(medias[-1]), float(peso[-1])
+        return medias
+
+    def para_dict(self):
+        return {'media': self.media, 'peso': self.peso, 'n_obs': int(self.n_obs)}
+
+    @classmethod
+    def de_dict(cls, span, dados):
+        return cls(span, dados['media'], dados['peso'], dados['n_obs'])
+
+
+def novos_estados_ewm(estado=None):
+    """Acumuladores EWM do estado salvo (ou zerados, na primeira execução)."""
+    salvos = (estado or {}).get('ewm', {})
+    return {
+        nome: EstadoEWM.de_dict(span, salvos[nome]) if nome in salvos else EstadoEWM(span)
+        for nome, span in SPANS_EWM.items()
+    }
+
+
+def cauda_do_estado(estado=None):
+    """DataFrame com os candles limpos guardados no estado."""
+    cauda = pd.DataFrame((estado or {}).get('cauda', {}), columns=COLUNAS_BASE)
+    if not cauda.empty:
+        cauda['data'] = pd.to_datetime(cauda['data'])
+    return cauda
+
+
+def montar_estado(base, estados_ewm, obv):
+    """Estado serializável a partir dos candles processados e dos acumuladores atualizados."""
+    cauda = base[COLUNAS_BASE].iloc[-JANELA_ESTADO:].copy()
+    cauda['data'] = pd.to_datetime(cauda['data']).dt.strftime('%Y-%m-%d')
+    cauda['hora'] = cauda['hora'].astype(str)
+
+    return {
+        'cauda': {col: cauda[col].tolist() for col in COLUNAS_BASE},
+        'ewm': {nome: ewm.para_dict() for nome, ewm in estados_ewm.items()},
+        'obv': float(obv),
+    }
+
+
+def caminho_estado_padrao(dados_transformados):
+    """Arquivo de estado ao lado dos dados transformados (CSV ou diretório Parquet)."""
+    raiz, extensao = os.path.splitext(str(dados_transformados).rstrip('/'))
+    raiz = raiz if extensao.lower() == '.csv' else str(dados_transformados).rstrip('/')
+    return f"{raiz}_estado_indicadores.json"
+
+
+def carregar_estados(caminho):
+    """Estados por ticker ({} se o arquivo não existir)."""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_estados(estados, caminho):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estados, f)
+    os.replace(temporario, caminho)
+
+
+def atualizar_estado(caminho, ticker, estado):
+    """Grava o estado de um ticker relendo o arquivo sob trava (tickers transformados em paralelo)."""
+    with trava_arquivo(caminho):
+        estados = carregar_estados(caminho)
+        estados[ticker] = estado
+        salvar_estados(estados, caminho)
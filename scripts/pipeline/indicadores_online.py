@@ -0,0 +1,241 @@
+
+#@title Motor de indicadores candle a candle (uso intradiário ao vivo)
+
+import math
+from collections import deque
+
+import pandas as pd
+
+from scripts.pipeline.indicadores_incrementais import EstadoEWM, SPANS_EWM
+
+"""
+Versão online dos indicadores de `calcular_indicadores` e `calcular_volatilidade`: a cada candle novo
+de 5 minutos, `MotorIndicadoresOnline.atualizar(candle)` devolve a linha de features correspondente
+em O(1), sem recalcular o histórico com `rolling`/`ewm` do pandas.
+
+Estruturas usadas (todas com `__slots__`):
+- `JanelaMovel`: buffer circular com média e desvio padrão (Welford) de janela fixa, ignorando NaN
+  como o `rolling` do pandas;
+- `ExtremoMovel`: mínimo/máximo de janela fixa com deque monotônica (O(1) amortizado);
+- `EstadoEWM`: média exponencial retomável, a mesma usada na transformação incremental.
+
+Os valores coincidem com os da versão em lote (ver `scripts/benchmarks/benchmark_indicadores_online.py`).
+"""
+
+
+class JanelaMovel:
+    """Média e desvio padrão amostral (ddof=1) de uma janela de tamanho fixo."""
+
+    __slots__ = ('tamanho', 'min_periodos', 'valores', 'posicao', 'n_validos', 'media', 'm2')
+
+    def __init__(self, tamanho, min_periodos=None):
+        self.tamanho = tamanho
+        self.min_periodos = tamanho if min_periodos is None else min_periodos
+        self.valores = [math.nan] * tamanho
+        self.posicao = 0
+        self.n_validos = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def _remover(self, valor):
+        self.n_validos -= 1
+        if self.n_validos == 0:
+            self.media = 0.0
+            self.m2 = 0.0
+            return
+        delta = valor - self.media
+        self.media -= delta / self.n_validos
+        self.m2 -= delta * (valor - self.media)
+
+    def _adicionar(self, valor):
+        self.n_validos += 1
+        delta = valor - self.media
+        self.media += delta / self.n_validos
+        self.m2 += delta * (valor - self.media)
+
+    def atualizar(self, valor):
+        antigo = self.valores[self.posicao]
+        if antigo == antigo:
+            self._remover(antigo)
+        if valor == valor:
+            self._adicionar(valor)
+
+        self.valores[self.posicao] = valor
+        self.posicao = (self.posicao + 1) % self.tamanho
+
+    def obter_media(self):
+        return self.media if self.n_validos >= self.min_periodos else math.nan
+
+    def obter_desvio(self):
+        if self.n_validos < max(self.min_periodos, 2):
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.n_validos - 1))
+
+
+class ExtremoMovel:
+    """Mínimo ou máximo de uma janela de tamanho fixo (deque monotônica)."""
+
+    __slots__ = ('tamanho', 'maximo', 'fila', 'contador')
+
+    def __init__(self, tamanho, maximo=True):
+        self.tamanho = tamanho
+        self.maximo = maximo
+        self.fila = deque()  # pares (índice, valor)
+        self.contador = 0
+
+    def atualizar(self, valor):
+        fila = self.fila
+        if self.maximo:
+            while fila and fila[-1][1] <= valor:
+                fila.pop()
+        else:
+            while fila and fila[-1][1] >= valor:
+                fila.pop()
+        fila.append((self.contador, valor))
+
+        if fila[0][0] <= self.contador - self.tamanho:
+            fila.popleft()
+        self.contador += 1
+
+    def obter(self):
+        return self.fila[0][1] if self.contador >= self.tamanho else math.nan
+
+
+class MotorIndicadoresOnline:
+    """
+    Mantém o estado de todos os indicadores de um ticker e calcula a linha de features de cada
+    candle novo em O(1).
+
+    Uso:
+        motor = MotorIndicadoresOnline()
+        motor.aquecer(df_historico)            # opcional: candles anteriores do mesmo ticker
+        linha = motor.atualizar({'abertura': ..., 'minimo': ..., 'maximo': ...,
+                                 'fechamento': ..., 'volume': ...})
+    """
+
+    __slots__ = (
+        'ewm', 'sma_10', 'bb_20', 'cci_20', 'atr_14', 'plus_dm_14', 'minus_dm_14', 'adx_14',
+        'k_3', 'minimo_14', 'maximo_14', 'volatilidade', 'lags', 'obv',
+        'fechamento_anterior', 'maximo_anterior', 'minimo_anterior'
+    )
+
+    def __init__(self, janela_volatilidade=20):
+        self.ewm = {nome: EstadoEWM(span) for nome, span in SPANS_EWM.items()}
+        self.sma_10 = JanelaMovel(10)
+        self.bb_20 = JanelaMovel(20)
+        self.cci_20 = JanelaMovel(20)
+        self.atr_14 = JanelaMovel(14)
+        self.plus_dm_14 = JanelaMovel(14)
+        self.minus_dm_14 = JanelaMovel(14)
+        self.adx_14 = JanelaMovel(14)
+        self.k_3 = JanelaMovel(3)
+        self.minimo_14 = ExtremoMovel(14, maximo=False)
+        self.maximo_14 = ExtremoMovel(14, maximo=True)
+        self.volatilidade = JanelaMovel(janela_volatilidade, min_periodos=1)
+        self.lags = deque([(math.nan, math.nan, math.nan)] * 3, maxlen=3)  # (fechamento, retorno, volume)
+        self.obv = 0.0
+        self.fechamento_anterior = math.nan
+        self.maximo_anterior = math.nan
+        self.minimo_anterior = math.nan
+
+    def atualizar(self, candle):
+        """Processa um candle (dict ou Series com abertura, minimo, maximo, fechamento e volume)."""
+        maximo = float(candle['maximo'])
+        minimo = float(candle['minimo'])
+        fechamento = float(candle['fechamento'])
+        volume = candle['volume']
+        anterior = self.fechamento_anterior
+
+        retorno = fechamento / anterior - 1 if anterior == anterior else math.nan
+        retorno_log = math.log(fechamento / anterior) if anterior == anterior else math.nan
+
+        # Médias móveis e MACD
+        self.sma_10.atualizar(fechamento)
+        ema_10 = self.ewm['EMA_10'].atualizar(fechamento)
+        macd = self.ewm['ema_12'].atualizar(fechamento) - self.ewm['ema_26'].atualizar(fechamento)
+        sinal = self.ewm['Signal_Line'].atualizar(macd)
+
+        # RSI
+        ganho = max(retorno, 0.0) if retorno == retorno else math.nan
+        perda = -min(retorno, 0.0) if retorno == retorno else math.nan
+        media_ganho = self.ewm['ganho_rsi'].atualizar(ganho)
+        media_perda = self.ewm['perda_rsi'].atualizar(perda) + 1e-10
+        rsi = 100 - (100 / (1 + media_ganho / media_perda))
+
+        # OBV
+        if anterior == anterior and fechamento != anterior:
+            self.obv += volume if fechamento > anterior else -volume
+
+        # ADX e ATR
+        delta_high = maximo - self.maximo_anterior
+        delta_low = self.minimo_anterior - minimo
+        plus_dm = delta_high if (delta_high > delta_low and delta_high > 0) else 0.0
+        minus_dm = delta_low if (delta_low > delta_high and delta_low > 0) else 0.0
+        self.plus_dm_14.atualizar(plus_dm)
+        self.minus_dm_14.atualizar(minus_dm)
+        media_plus, media_minus = self.plus_dm_14.obter_media(), self.minus_dm_14.obter_media()
+        self.adx_14.atualizar(100 * abs((media_plus - media_minus) / (media_plus + media_minus + 1e-10)))
+
+        tr = max(maximo - minimo, abs(maximo - anterior), abs(minimo - anterior))
+        self.atr_14.atualizar(tr if anterior == anterior else math.nan)
+
+        # Bandas de Bollinger
+        self.bb_20.atualizar(fechamento)
+        bb_media, bb_desvio = self.bb_20.obter_media(), self.bb_20.obter_desvio()
+
+        # Estocástico %K e %D
+        self.minimo_14.atualizar(minimo)
+        self.maximo_14.atualizar(maximo)
+        minimo_14, maximo_14 = self.minimo_14.obter(), self.maximo_14.obter()
+        k = 100 * ((fechamento - minimo_14) / (maximo_14 - minimo_14 + 1e-10))
+        self.k_3.atualizar(k)
+
+        # CCI
+        tp = (maximo + minimo + fechamento) / 3
+        self.cci_20.atualizar(tp)
+        cci = (tp - self.cci_20.obter_media()) / (0.015 * self.cci_20.obter_desvio() + 1e-10)
+
+        # Volatilidade dos retornos logarítmicos
+        self.volatilidade.atualizar(retorno_log)
+
+        linha = {
+            'retorno': retorno,
+            'SMA_10': self.sma_10.obter_media(),
+            'EMA_10': ema_10,
+            'MACD': macd,
+            'Signal_Line': sinal,
+            'rsi': rsi,
+            'OBV': self.obv,
+            'ADX': self.adx_14.obter_media(),
+            'BB_MA20': bb_media,
+            'BB_STD20': bb_desvio,
+            'BB_upper': bb_media + 2 * bb_desvio,
+            'BB_lower': bb_media - 2 * bb_desvio,
+            '%K': k,
+            '%D': self.k_3.obter_media(),
+            'CCI': cci,
+            'ATR': self.atr_14.obter_media(),
+        }
+        for lag, (fech_lag, ret_lag, vol_lag) in enumerate(reversed(self.lags), start=1):
+            linha[f'fechamento_lag{lag}'] = fech_lag
+            linha[f'retorno_lag{lag}'] = ret_lag
+            linha[f'volume_lag{lag}'] = vol_lag
+        linha['retorno_log'] = retorno_log
+        linha['volatilidade'] = self.volatilidade.obter_desvio()
+
+        self.lags.append((fechamento, retorno, volume))
+        self.fechamento_anterior = fechamento
+        self.maximo_anterior = maximo
+        self.minimo_anterior = minimo
+        return linha
+
+    def aquecer(self, df):
+        """Alimenta o motor com candles históricos (em ordem cronológica), descartando as saídas."""
+        for candle in df.sort_values(['data', 'hora']).to_dict('records'):
+            self.atualizar(candle)
+
+    def processar(self, df):
+        """Processa um DataFrame de candles e devolve as linhas de features (útil para comparar com o lote)."""
+        df = df.sort_values(['data', 'hora']).reset_index(drop=True)
+        linhas = [self.atualizar(candle) for candle in df.to_dict('records')]
+        return pd.concat([df, pd.DataFrame(linhas)], axis=1)
@@ -0,0 +1,206 @@
+
+#@title Instrumentação das etapas do pipeline (tempo, CPU, memória, linhas, bytes e perfis)
+
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+"""
+Mede cada etapa de `executar_pipeline` e grava uma linha JSON por etapa:
+
+    {"execucao": "...", "etapa": "transformacao", "status": "ok", "inicio": "...",
+     "wall_s": 1.93, "cpu_s": 1.71, "rss_inicio_mb": 180.2, "rss_pico_mb": 412.7,
+     "linhas_entrada": 2364, "linhas_saida": 2364, "bytes_lidos": 1048576, "bytes_gravados": 524288}
+
+- `wall_s` / `cpu_s`: tempo de relógio e de CPU do processo (todas as threads) durante a etapa;
+- `rss_pico_mb`: maior memória residente observada durante a etapa (amostrada em uma thread a cada
+  `intervalo_rss_s`; sem /proc, o pico do processo até o fim da etapa);
+- `bytes_lidos` / `bytes_gravados`: bytes de leitura/escrita do processo (/proc/self/io, rchar/wchar);
+- `linhas_entrada` / `linhas_saida`: informadas pela etapa (`medicao.linhas(entrada=..., saida=...)`);
+- com `perfilar=True`, um perfil por etapa em `dir_perfis` (`<etapa>.prof`, para `pstats`/snakeviz;
+  `perfilador='pyinstrument'` grava `<etapa>.html`, se o pyinstrument estiver instalado).
+
+`imprimir_resumo()` mostra a tabela das etapas da execução com os totais.
+"""
+
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_atual_mb():
+    """Memória residente atual do processo (MB); sem /proc, o pico até agora."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGINA / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bytes_io():
+    """(lidos, gravados) pelo processo até agora, ou (None, None) sem /proc/self/io."""
+    try:
+        with open('/proc/self/io') as f:
+            campos = dict(linha.split(':') for linha in f.read().splitlines() if ':' in linha)
+        return int(campos['rchar']), int(campos['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class _AmostradorRSS:
+    """Thread que guarda o maior RSS observado até ser parada."""
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.pico = rss_atual_mb()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_atual_mb())
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        return max(self.pico, rss_atual_mb())
+
+
+class MedicaoEtapa:
+    """Medição de uma etapa; a etapa informa linhas/bytes ou se foi ignorada."""
+
+    def __init__(self, nome, contexto):
+        self.registro = {'etapa': nome, **contexto}
+
+    def linhas(self, entrada=None, saida=None):
+        """Aceita contagens ou DataFrames."""
+        if entrada is not None:
+            self.registro['linhas_entrada'] = len(entrada) if hasattr(entrada, '__len__') else int(entrada)
+        if saida is not None:
+            self.registro['linhas_saida'] = len(saida) if hasattr(saida, '__len__') else int(saida)
+
+    def ignorar(self, motivo):
+        self.registro['status'] = 'ignorada'
+        self.registro['motivo'] = motivo
+
+    def anotar(self, **valores):
+        self.registro.update(valores)
+
+
+class Instrumentacao:
+    """
+    Parâmetros:
+    arquivo_log (str): Arquivo JSON lines (acrescentado a cada execução); None não grava.
+    perfilar (bool): Grava um perfil por etapa em `dir_perfis`.
+    perfilador (str): 'cprofile' ou 'pyinstrument'.
+    """
+
+    def __init__(self, arquivo_log=None, perfilar=False, dir_perfis=None, perfilador='cprofile', intervalo_rss_s=0.01):
+        self.execucao = datetime.now().strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        self.arquivo_log = arquivo_log
+        self.perfilar = perfilar
+        self.perfilador = perfilador
+        self.dir_perfis = dir_perfis or os.path.join(os.path.dirname(arquivo_log or '.') or '.', 'perfis', self.execucao)
+        self.intervalo_rss_s = intervalo_rss_s
+        self.registros = []
+
+    def _iniciar_perfil(self):
+        if not self.perfilar:
+            return None
+        if self.perfilador == 'pyinstrument':
+            from pyinstrument import Profiler
+            perfil = Profiler()
+            perfil.start()
+            return perfil
+        perfil = cProfile.Profile()
+        perfil.enable()
+        return perfil
+
+    def _gravar_perfil(self, perfil, nome):
+        os.makedirs(self.dir_perfis, exist_ok=True)
+        if self.perfilador == 'pyinstrument':
+            perfil.stop()
+            caminho = os.path.join(self.dir_perfis, f"{nome}.html")
+            with open(caminho, 'w', encoding='utf-8') as f:
+                f.write(perfil.output_html())
+        else:
+            perfil.disable()
+            caminho = os.path.join(self.dir_perfis, f"{nome}.prof")
+            perfil.dump_stats(caminho)
+        return caminho
+
+    @contextmanager
+    def etapa(self, nome, **contexto):
+        """Mede o bloco `with` como a etapa `nome`; exceções são registradas e propagadas."""
+        medicao = MedicaoEtapa(nome, contexto)
+        lidos, gravados = bytes_io()
+        rss_inicio = rss_atual_mb()
+        amostrador = _AmostradorRSS(self.intervalo_rss_s)
+        perfil = self._iniciar_perfil()
+        inicio_wall, inicio_cpu = time.perf_counter(), time.process_time()
+        inicio = datetime.now().isoformat(timespec='seconds')
+
+        try:
+            yield medicao
+            medicao.registro.setdefault('status', 'ok')
+        except BaseException as erro:
+            medicao.registro['status'] = 'erro'
+            medicao.registro['erro'] = f"{type(erro).__name__}: {erro}"
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - inicio_wall, time.process_time() - inicio_cpu
+            rss_pico = amostrador.parar()
+            lidos_fim, gravados_fim = bytes_io()
+            registro = {
+                'execucao': self.execucao, 'inicio': inicio, **medicao.registro,
+                'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+                'rss_inicio_mb': round(rss_inicio, 1), 'rss_pico_mb': round(rss_pico, 1),
+            }
+            if lidos is not None:
+                registro['bytes_lidos'] = lidos_fim - lidos
+                registro['bytes_gravados'] = gravados_fim - gravados
+            if perfil is not None:
+                arquivo = '-'.join(str(valor) for valor in (nome, contexto.get('ticker')) if valor)
+                registro['perfil'] = self._gravar_perfil(perfil, arquivo)
+            self.registrar(registro)
+
+    def registrar(self, registro):
+        """Acrescenta um registro (também os medidos em outros processos ou de etapas não executadas)."""
+        registro = {**registro, 'execucao': self.execucao}
+        self.registros.append(registro)
+        if self.arquivo_log:
+            os.makedirs(os.path.dirname(self.arquivo_log) or '.', exist_ok=True)
+            with open(self.arquivo_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, default=str) + '\n')
+
+    def resumo(self):
+        """DataFrame com uma linha por etapa da execução."""
+        colunas = ['etapa', 'status', 'wall_s', 'cpu_s', 'rss_pico_mb', 'linhas_entrada', 'linhas_saida',
+                   'bytes_lidos', 'bytes_gravados']
+        tabela = pd.DataFrame(self.registros).reindex(columns=colunas)
+        contagens = ['linhas_entrada', 'linhas_saida', 'bytes_lidos', 'bytes_gravados']
+        tabela[contagens] = tabela[contagens].astype('Int64')
+        return tabela
+
+    def imprimir_resumo(self):
+        tabela = self.resumo()
+        if tabela.empty:
+            return tabela
+        total_wall = tabela['wall_s'].sum()
+        tabela['% tempo'] = (100 * tabela['wall_s'] / total_wall).round(1) if total_wall > 0 else 0.0
+        for coluna in ('bytes_lidos', 'bytes_gravados'):
+            tabela[coluna] = (tabela[coluna].astype(float) / 1e6).round(2)
+        tabela = tabela.rename(columns={'bytes_lidos': 'MB_lidos', 'bytes_gravados': 'MB_gravados'})
+
+        print(f"\nResumo da execução {self.execucao}:")
+        print(tabela.to_string(index=False, na_rep='-'))
+        print(f"Total: {total_wall:.2f} s de relógio, {tabela['cpu_s'].sum():.2f} s de CPU, "
+              f"pico de {tabela['rss_pico_mb'].max():.0f} MB")
+        return tabela
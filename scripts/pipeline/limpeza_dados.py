@@ -1,18 +1,35 @@
 
+import os
+
+import numpy as np
 import pandas as pd
 
+from scripts.pipeline.armazenamento import (
+    FUSO_HORARIO, TAMANHO_BLOCO, TICKER_PADRAO, acrescentar_etapa, eh_csv, ler_etapa, ler_etapa_em_blocos,
+    normalizar_bruto, salvar_etapa
+)
+from scripts.pipeline.manifesto_pipeline import caminho_manifesto_padrao, registrar_marca
+
+COLUNAS_LIMPAS = ['data', 'hora', 'abertura', 'minimo', 'maximo', 'fechamento', 'volume']
+
+# Mapeamento das colunas do yfinance para os nomes padronizados (na ordem de COLUNAS_LIMPAS)
+MAPEAMENTO_COLUNAS = {'Open': 'abertura', 'Low': 'minimo', 'High': 'maximo', 'Close': 'fechamento', 'Volume': 'volume'}
+
+VERBOSIDADE_PADRAO = 1
+
 """
 A função recebe um csv com os dados brutos e segue as seguintes etapas:
 
-- Verificações Iniciais
-  - Exibe as 5 primeiras linhas e o resumo das colunas com `df.head()` e `df.info()`.
+- Verificações (conforme `verbosidade`)
+  - 0: nenhum print; 1: uma linha com as linhas removidas por critério; 2: também `df.head()` e
+    `df.info()` da entrada e da saída.
 - Ajustes Estruturais
-  - Remove as duas primeiras linhas do DataFrame (provavelmente metadados).
-  - Converte o índice em `datetime` no fuso UTC, depois para `America/Sao_Paulo`, e remove a referência de fuso.
-  - Extrai o horário (`%H:%M:%S`) e cria a coluna `hora`.
-  - Transforma o índice (datetime) em coluna chamada `data`.
+  - Remove as linhas 'Ticker'/'Datetime' do cabeçalho multinível do yfinance, quando presentes
+    (dados vindos do CSV bruto antigo; o dataset Parquet já chega com colunas de um nível).
+  - Converte o índice em `datetime` no fuso UTC, depois para `America/Sao_Paulo`, mantendo o fuso.
+  - Transforma o índice em uma coluna `timestamp` (datetime64 com fuso), de onde saem as demais.
+  - Cria `data` (datetime64, só a data) e `hora` (`%H:%M:%S`) a partir do `timestamp`.
 - Padronização e Conversões
-  - Remove a parte do horário da coluna `data`, mantendo só a data (`yyyy-mm-dd`).
   - Renomeia colunas com nomes padronizados:
     - `Open → abertura`
     - `High → maximo`
@@ -20,14 +37,20 @@ A função recebe um csv com os dados brutos e segue as seguintes etapas:
     - `Close → fechamento`
     - `Volume → volume`
   - Converte colunas numéricas para `float` arredondado e `volume` para `int`.
-- Organização e Filtros
-    - Reorganiza as colunas na ordem: `['data', 'hora', 'abertura', 'minimo', 'maximo', 'fechamento', 'volume']`.
+- Organização e Filtros (uma única máscara, aplicada de uma vez)
+    - Reorganiza as colunas na ordem: `['data', 'hora', 'abertura', 'minimo', 'maximo', 'fechamento', 'volume', 'timestamp']`.
     - Remove duplicatas e linhas com mais de 50% de valores nulos.
-    - Converte `data` e `hora` para formatos adequados (`datetime` e `time`).
-    - Filtra apenas dias úteis (segunda a sexta).
-    - Filtra registros entre 09:55 e 18:05.
+    - Filtra apenas dias úteis (segunda a sexta), pelo `timestamp`.
+    - Filtra registros entre 09:55 e 18:05, pelo minuto do dia (inteiro) do `timestamp`.
+    - As colunas são montadas só para as linhas mantidas (`hora` formatada uma vez por horário distinto).
 - Ordena o DataFrame por `data` decrescente e `hora` crescente.
-- Salva o resultado limpo em CSV no caminho definido.
+- Salva o resultado limpo pela camada de armazenamento (CSV ou dataset Parquet tipado).
+- Registra a marca d'água da etapa no manifesto (última data, linhas, hash do conteúdo e, se
+  informado, o hash dos dados brutos usados).
+
+`limpeza_dados_em_blocos` faz a mesma limpeza lendo o bruto em blocos (CSV em `chunksize`, Parquet
+dia a dia) e gravando cada bloco limpo assim que fica pronto, com a memória limitada pelo tamanho do
+bloco e não pelo histórico (backfills longos de candles de 1 minuto).
 
 Saida esperadsa:
 - DataFrame padronizado, sem duplicatas, com datas válidas e horários filtrados no intervalo de negociação.
@@ -35,120 +58,215 @@ Saida esperadsa:
 
 """
 
-def limpeza_dados(df, path_dados_limpos):
-    # Verificar se os dados estão corretos
-    print("Dados originais:")
-    print(df.head())
-    print(df.info())
-
-    # Remover as primeiras duas linhas (com 'Ticker' e 'Datetime')
-    df = df.iloc[2:].copy()
-
-    # Verificar após a remoção
-    print("Após remoção das duas primeiras linhas:")
-    print(df.head())
-
-    # Garantir que o índice esteja no formato de data e hora (timezone UTC)
-    df.index = pd.to_datetime(df.index, utc=True)
-
-    # Definir o fuso horário como "America/Sao_Paulo"
-    df.index = df.index.tz_convert("America/Sao_Paulo")
-
-    # Remover a referência de fuso horário
-    df.index = df.index.tz_localize(None)
-
-    # Criar a coluna 'hora' com base no índice
-    df['hora'] = df.index.strftime('%H:%M:%S')
-
-    # Renomear o índice para 'data'
-    df.index.name = 'data'
-
-    # Resetar o índice para transformar o Datetime em uma coluna normal
-    df = df.reset_index()
-
-    # Verificar após a transformação do índice
-    print("\nApós conversão de índice:")
-    print(df.head())
-
-    # Remover o horário da coluna 'data', mantendo apenas a data
-    df['data'] = df['data'].dt.date
-
-    # Mapeamento das colunas para nomes padronizados
-    mapeamento_colunas = {
-        'Close': 'fechamento',
-        'High': 'maximo',
-        'Low': 'minimo',
-        'Open': 'abertura',
-        'Volume': 'volume'
-    }
-
-    # Renomear as colunas
-    df.rename(columns=mapeamento_colunas, inplace=True)
-
-    # Converte e arredonda as colunas numéricas
+def _hora_texto(segundos):
+    """'HH:MM:SS' a partir dos segundos desde a meia-noite, formatando só os valores distintos."""
+    unicos, posicoes = np.unique(segundos, return_inverse=True)
+    textos = np.array([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in unicos.tolist()], dtype=object)
+    return textos[posicoes.reshape(-1)]
+
+
+def _limpar(df):
+    """
+    Limpeza sem I/O e sem prints: uma única máscara (duplicatas, nulos, dia útil e janela de horário)
+    sobre arrays do bruto e uma única seleção + ordenação no fim.
+
+    Retorna:
+    (pd.DataFrame, dict): candles limpos e linhas removidas por critério.
+    """
+    df = normalizar_bruto(df)
+    timestamp = pd.to_datetime(df.index, utc=True).tz_convert(FUSO_HORARIO)
+    dia = timestamp.tz_localize(None).normalize()  # 'data': horário local, sem fuso, à meia-noite
+    valido = ~np.asarray(dia.isna())
+
+    # 'data' e 'hora' como inteiros (dia em ns e segundos do dia): a deduplicação e a ordenação
+    # usam os inteiros, e o texto de 'hora' só é montado para as linhas mantidas
+    dia_ns = np.where(valido, dia.as_unit('ns').asi8, -1)
+    segundos = np.where(valido, (timestamp.tz_localize(None).as_unit('ns').asi8 - dia_ns) // 1_000_000_000, -1)
+
+    colunas = {}
+    for bruta, limpa in MAPEAMENTO_COLUNAS.items():
+        colunas[limpa] = pd.to_numeric(df[bruta], errors='coerce')
     for col in ['abertura', 'minimo', 'maximo', 'fechamento']:
-        df[col] = pd.to_numeric(df[col], errors='coerce').round(2)
-
-    # Converte a coluna 'volume' para número inteiro
-    df['volume'] = pd.to_numeric(df['volume'], errors='coerce', downcast='integer')
-
-    # Reorganiza as colunas na ordem desejada
-    df = df[['data', 'hora', 'abertura', 'minimo', 'maximo', 'fechamento', 'volume']]
-
-    # Verificar após reorganizar as colunas
-    print("\nApós reorganizar as colunas:")
-    print(df.head())
-
-    # Verificar e remover duplicatas mantendo a primeira ocorrência
-    df = df.drop_duplicates(keep='first')
-
-    # Remover as linhas com 50% ou mais de valores nulos
-    df = df.dropna(thresh=df.shape[1] * 0.5)
-
-    # Verificar após remoção de duplicatas e nulos
-    print("\nApós remover duplicatas e nulos:")
-    print(df.head())
-
-    # Garantir que 'data' e 'hora' estejam no formato datetime
-    df['data'] = pd.to_datetime(df['data'], format='%Y-%m-%d')
-    df['hora'] = pd.to_datetime(df['hora'], format='%H:%M:%S').dt.time
-
-    # Filtra apenas os dias úteis (segunda a sexta)
-    df = df[df['data'].dt.weekday < 5]
+        colunas[col] = colunas[col].round(2)
+    colunas['volume'] = pd.to_numeric(colunas['volume'], errors='coerce', downcast='integer')
+    numericas = [colunas[col] for col in COLUNAS_LIMPAS[2:]]
+
+    # Mesmos critérios e ordem do processo original: duplicatas (mantendo a primeira) sobre todas as
+    # linhas, depois linhas com 50% ou mais de nulos, dias úteis e horário entre 09:55 e 18:05
+    # Só linhas com o mesmo instante ('data' + 'hora') podem ser duplicatas: a comparação das linhas
+    # inteiras fica restrita a elas, sem montar uma tabela de chaves do tamanho do bruto
+    instante = np.where(valido, dia_ns + segundos * 1_000_000_000, -1)
+    unica = np.ones(len(instante), dtype=bool)
+    candidatas = np.flatnonzero(pd.Series(instante).duplicated(keep=False).to_numpy())
+    if len(candidatas):
+        chave = pd.DataFrame({'instante': instante[candidatas],
+                              **{col: serie.to_numpy()[candidatas] for col, serie in zip(COLUNAS_LIMPAS[2:], numericas)}})
+        unica[candidatas] = ~chave.duplicated(keep='first').to_numpy()
+    del instante, candidatas
+    preenchidas = 2 * valido + sum(serie.notna().to_numpy().astype(np.int8) for serie in numericas)
+    com_dados = preenchidas >= len(COLUNAS_LIMPAS) * 0.5
+    dia_util = valido & (np.asarray(timestamp.weekday) < 5)
+    minutos = np.asarray(timestamp.hour) * 60 + np.asarray(timestamp.minute)
+    no_pregao = valido & (minutos >= 9 * 60 + 55) & (minutos <= 18 * 60 + 5)
+    del preenchidas, minutos
+
+    mascara = unica & com_dados & dia_util & no_pregao
+    removidas = {
+        'duplicatas': int((~unica).sum()),
+        'nulos': int((unica & ~com_dados).sum()),
+        'fim_de_semana': int((unica & com_dados & ~dia_util).sum()),
+        'fora_do_pregao': int((unica & com_dados & dia_util & ~no_pregao).sum()),
+    }
 
-    # Verificar após filtrar dias úteis
-    print("\nApós filtrar apenas os dias úteis:")
-    print(df.head())
+    # Data decrescente e hora crescente (ordenação estável, como o sort_values original); o índice
+    # guarda a posição da linha no bruto, como no reset_index + filtros do processo original
+    posicoes = np.flatnonzero(mascara)
+    posicoes = posicoes[np.lexsort((segundos[posicoes], -dia_ns[posicoes]))]
+
+    limpo = pd.DataFrame({
+        'data': dia[posicoes],
+        'hora': pd.array(_hora_texto(segundos[posicoes]), dtype='str'),
+        **{col: colunas[col].to_numpy()[posicoes] for col in COLUNAS_LIMPAS[2:]},
+        'timestamp': timestamp[posicoes],
+    }, index=pd.Index(posicoes), copy=False)
+    return limpo, removidas
+
+
+def limpar_candles(df, verbosidade=VERBOSIDADE_PADRAO, ticker=TICKER_PADRAO):
+    """Candles limpos a partir do bruto (sem gravar), com os prints conforme a `verbosidade`."""
+    if verbosidade >= 2:
+        print("Dados originais:")
+        print(df.head())
+        df.info()
+
+    limpo, removidas = _limpar(df)
+
+    if verbosidade >= 1:
+        detalhe = ', '.join(f"{criterio}: {linhas}" for criterio, linhas in removidas.items())
+        print(f"[{ticker}] Limpeza: {len(df)} linhas brutas -> {len(limpo)} limpas ({detalhe})")
+        if limpo.empty:
+            print("O DataFrame ficou vazio após os filtros. Verifique se os dados estão dentro do intervalo de 09:55-18:05.")
+    if verbosidade >= 2:
+        print("\nDados limpos e ordenados:")
+        print(limpo.head(10))
+        limpo.info()
+    return limpo
+
+
+def limpeza_dados(df, path_dados_limpos, ticker=TICKER_PADRAO, hash_entrada=None, verbosidade=VERBOSIDADE_PADRAO):
+    """
+    Limpa os candles brutos, grava a etapa e registra a marca d'água.
+
+    Parâmetros:
+    verbosidade (int): 0 = sem prints (lotes de tickers), 1 = uma linha de resumo com as linhas
+        removidas por critério, 2 = também `head()`/`info()` da entrada e da saída.
+    """
+    df = limpar_candles(df, verbosidade, ticker)
+
+    # Salva os dados limpos (CSV ou Parquet, conforme o caminho)
+    salvar_etapa(df, path_dados_limpos, 'limpo', ticker)
+    if verbosidade >= 1:
+        print(f"Os dados foram limpos e salvos em {path_dados_limpos}.")
+
+    # Marca d'água da etapa: o hash do conteúdo limpo indica à transformação se há algo novo
+    registrar_marca(caminho_manifesto_padrao(path_dados_limpos), 'limpo', ticker, df, hash_entrada=hash_entrada)
 
-    # Filtra apenas horários entre 09:55 e 18:05
-    df = df[(df['hora'] >= pd.to_datetime('09:55:00').time()) &
-            (df['hora'] <= pd.to_datetime('18:05:00').time())]
+    return df
 
-    # Verificar após filtrar o intervalo de horário
-    print("\nApós filtrar o intervalo de horário (09:55-18:05):")
-    print(df.head())
 
-    # Caso o DataFrame fique vazio, informar o motivo
-    if df.empty:
-        print("O DataFrame ficou vazio após o filtro de horário. Verifique se os dados estão dentro do intervalo de 09:55-18:05.")
+def _gravar_bloco(limpo, path_dados_limpos, ticker, primeiro):
+    if eh_csv(path_dados_limpos):
+        # Acrescentado ao fim do arquivo, sem reler o que já foi gravado: o CSV fica em ordem cronológica
+        limpo = limpo.sort_values(['data', 'hora'], kind='stable')
+        limpo.to_csv(path_dados_limpos, mode='w' if primeiro else 'a', header=primeiro, index=False)
     else:
-        print("\nLimpeza de dados concluída com sucesso.")
-
-    # Ordenar os dados
-    df = df.sort_values(["data", "hora"], ascending=[False, True])
-    print("\nDados limpos e ordenados:")
-    print(df.head(10))
-
-    # Salva os dados limpos em CSV
-    df.to_csv(path_dados_limpos, index=False)
-    print(f"\nOs dados foram limpos e salvos em csv.")
-
-    return df
+        acrescentar_etapa(limpo, path_dados_limpos, 'limpo', ticker)
+
+
+def limpeza_dados_em_blocos(caminho_bruto, path_dados_limpos, ticker=TICKER_PADRAO, tamanho_bloco=TAMANHO_BLOCO,
+                            hash_entrada=None, verbosidade=VERBOSIDADE_PADRAO):
+    """
+    Limpa o bruto gravado em `caminho_bruto` bloco a bloco, sem carregar o histórico inteiro.
+
+    Cada bloco passa pela mesma limpeza de `limpeza_dados` (fuso, nomes, arredondamento, duplicatas,
+    nulos, dias úteis e pregão). Os candles do último dia de um bloco ficam retidos até o bloco
+    seguinte, de modo que cada dia é limpo inteiro uma única vez (as duplicatas são sempre do mesmo
+    instante, portanto do mesmo dia) e o resultado tem as mesmas linhas da limpeza completa.
+
+    Diferenças em relação a `limpeza_dados`:
+    - o bruto precisa estar em ordem cronológica de dias (como a extração grava); um dia que reaparece
+      depois de gravado interrompe a limpeza com ValueError;
+    - o CSV limpo é gravado em ordem cronológica (data e hora crescentes), bloco após bloco;
+    - o hash da marca d'água é encadeado bloco a bloco (muda com o conteúdo, mas não é igual ao da
+      limpeza completa).
+
+    Parâmetros:
+    tamanho_bloco (int): Linhas brutas por bloco lido (a memória de pico acompanha esse valor).
+    verbosidade (int): 0 = sem prints, 1 = uma linha de resumo, 2 = também uma linha por bloco gravado.
+
+    Retorna:
+    dict: linhas brutas, linhas limpas, blocos gravados e linhas removidas por critério.
+    """
+    manifesto = caminho_manifesto_padrao(path_dados_limpos)
+    if eh_csv(path_dados_limpos):
+        os.makedirs(os.path.dirname(path_dados_limpos) or '.', exist_ok=True)
+        if os.path.exists(path_dados_limpos):
+            os.remove(path_dados_limpos)
+    else:
+        salvar_etapa(pd.DataFrame(), path_dados_limpos, 'limpo', ticker)
+
+    resumo = {'linhas_brutas': 0, 'linhas_limpas': 0, 'blocos': 0,
+              'removidas': dict.fromkeys(['duplicatas', 'nulos', 'fim_de_semana', 'fora_do_pregao'], 0)}
+    ultimo_dia = None
+
+    def gravar(bruto):
+        nonlocal ultimo_dia
+        limpo, removidas = _limpar(bruto)
+        for criterio, linhas in removidas.items():
+            resumo['removidas'][criterio] += linhas
+        if limpo.empty:
+            return
+        primeiro = resumo['blocos'] == 0
+        if not primeiro and limpo['data'].min() <= ultimo_dia:
+            raise ValueError(f"[{ticker}] Bruto fora de ordem: o dia {limpo['data'].min():%Y-%m-%d} "
+                             f"aparece depois de {ultimo_dia:%Y-%m-%d} já gravado.")
+        _gravar_bloco(limpo, path_dados_limpos, ticker, primeiro)
+        registrar_marca(manifesto, 'limpo', ticker, limpo, acrescimo=not primeiro, hash_entrada=hash_entrada)
+        ultimo_dia = limpo['data'].max()
+        resumo['linhas_limpas'] += len(limpo)
+        resumo['blocos'] += 1
+        if verbosidade >= 2:
+            print(f"[{ticker}] Bloco {resumo['blocos']}: {len(bruto)} linhas brutas -> {len(limpo)} limpas "
+                  f"(até {ultimo_dia:%Y-%m-%d})")
+
+    pendente = None
+    for bloco in ler_etapa_em_blocos(caminho_bruto, 'bruto', ticker, tamanho_bloco):
+        resumo['linhas_brutas'] += len(bloco)
+        if pendente is not None:
+            bloco = pd.concat([pendente, bloco])
+        dia = pd.to_datetime(bloco.index, utc=True).tz_convert(FUSO_HORARIO).tz_localize(None).normalize()
+        aberto = np.asarray(dia == dia.max())  # último dia do bloco: pode continuar no próximo
+        pendente = bloco[aberto]
+        if not aberto.all():
+            gravar(bloco[~aberto])
+        del bloco, dia, aberto
+    if pendente is not None:
+        gravar(pendente)
+
+    if resumo['blocos'] == 0:
+        registrar_marca(manifesto, 'limpo', ticker, pd.DataFrame(), hash_entrada=hash_entrada)
+
+    if verbosidade >= 1:
+        detalhe = ', '.join(f"{criterio}: {linhas}" for criterio, linhas in resumo['removidas'].items())
+        print(f"[{ticker}] Limpeza em blocos: {resumo['linhas_brutas']} linhas brutas -> {resumo['linhas_limpas']} "
+              f"limpas em {resumo['blocos']} blocos ({detalhe})")
+        print(f"Os dados foram limpos e salvos em {path_dados_limpos}.")
+    return resumo
 
 
 if __name__ == "__main__":
     # Ler os dados brutos
-    dados_brutos = pd.read_csv(f"/content/Piloto_Day_Trade/data/raw/dados_brutos.csv", index_col=0, parse_dates=True, dayfirst=True)
+    dados_brutos = ler_etapa("/content/Piloto_Day_Trade/data/raw/dados_brutos.csv", 'bruto')
     path_dados_limpos = '/content/Piloto_Day_Trade/data/cleaned/dados_limpos.csv'
     # Aplicar limpeza nos dados
     df_limpo = limpeza_dados(dados_brutos, path_dados_limpos)
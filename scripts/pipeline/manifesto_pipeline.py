@@ -0,0 +1,163 @@
+
+#@title Manifesto das etapas do pipeline (marcas d'água por ticker)
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: só a trava entre threads
+    fcntl = None
+
+import pandas as pd
+
+from scripts.pipeline.armazenamento import existe_etapa
+
+"""
+Manifesto gravado ao lado dos dados de cada etapa (`<caminho>_manifesto.json`, como o estado dos
+indicadores), com uma marca d'água por etapa e ticker:
+
+    {"transformado": {"BBDC4.SA": {"ultima_data": "2025-04-14", "ultimo_timestamp": "...",
+                                   "linhas": 2364, "hash": "...", "hash_entrada": "...",
+                                   "atualizado_em": "..."}}}
+
+- `ultima_data` / `ultimo_timestamp`: último candle gravado, para retomar a extração/transformação
+  sem ler o histórico;
+- `linhas`: total de linhas gravadas para o ticker;
+- `hash`: hash do conteúdo gravado (encadeado a cada acréscimo, então custa O(linhas novas));
+- `hash_entrada`: hash da etapa anterior usado nesta execução; se a entrada não mudou, a etapa
+  pode ser pulada.
+
+A marca só vale enquanto os dados existem: `marca_vigente` descarta a marca de uma saída apagada, e
+a etapa volta a ser executada por completo.
+"""
+
+# Extrações de vários tickers rodam em threads e gravam no mesmo manifesto
+_TRAVA = threading.Lock()
+
+
+@contextmanager
+def trava_arquivo(caminho):
+    """
+    Trava exclusiva entre processos (`<caminho>.lock`, flock) para ler-modificar-gravar um arquivo
+    compartilhado por etapas de tickers diferentes que rodam em processos separados (`executor_dag.py`).
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    with open(f"{caminho}.lock", 'a') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def caminho_manifesto_padrao(caminho_etapa):
+    """Arquivo de manifesto ao lado dos dados da etapa (CSV ou diretório Parquet)."""
+    raiz, extensao = os.path.splitext(str(caminho_etapa).rstrip('/'))
+    raiz = raiz if extensao.lower() == '.csv' else str(caminho_etapa).rstrip('/')
+    return f"{raiz}_manifesto.json"
+
+
+def carregar_manifesto(caminho):
+    """Marcas por etapa e ticker ({} se o arquivo não existir)."""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _salvar_manifesto(manifesto, caminho):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f"{caminho}.{threading.get_ident()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2)
+    os.replace(temporario, caminho)
+
+
+def obter_marca(caminho, etapa, ticker):
+    """Marca d'água da etapa para o ticker (ou None)."""
+    return carregar_manifesto(caminho).get(etapa, {}).get(ticker)
+
+
+def remover_marca(caminho, etapa, ticker):
+    """Remove a marca da etapa para o ticker (se existir)."""
+    with _TRAVA, trava_arquivo(caminho):
+        manifesto = carregar_manifesto(caminho)
+        if manifesto.get(etapa, {}).pop(ticker, None) is not None:
+            _salvar_manifesto(manifesto, caminho)
+
+
+def marca_vigente(caminho_etapa, etapa, ticker):
+    """
+    Marca d'água da etapa para o ticker, se os dados ainda existem. A marca de dados apagados é
+    removida do manifesto e o retorno é None (a etapa deve ser refeita por completo).
+    """
+    caminho = caminho_manifesto_padrao(caminho_etapa)
+    marca = obter_marca(caminho, etapa, ticker)
+    if marca is not None and not existe_etapa(caminho_etapa, ticker):
+        print(f"[Aviso] [{ticker}] Dados da etapa '{etapa}' não encontrados em {caminho_etapa}; "
+              f"marca d'água descartada.")
+        remover_marca(caminho, etapa, ticker)
+        return None
+    return marca
+
+
+def hash_dataframe(df, anterior=None):
+    """Hash do conteúdo de um DataFrame (vetorizado), opcionalmente encadeado a um hash anterior."""
+    resumo = hashlib.sha1((anterior or '').encode('utf-8'))
+    if not df.empty:
+        resumo.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return resumo.hexdigest()
+
+
+def registrar_marca(caminho, etapa, ticker, df, acrescimo=False, hash_entrada=None, linhas_anteriores=0):
+    """
+    Atualiza a marca da etapa depois de gravar `df`.
+
+    Parâmetros:
+    df (pd.DataFrame): Dados gravados nesta execução (índice `Datetime` no bruto, coluna `data` nas demais).
+    acrescimo (bool): True se `df` foi acrescentado aos dados existentes; False se os substituiu.
+    hash_entrada (str): Hash da etapa anterior usado para produzir `df`.
+    linhas_anteriores (int): Linhas já gravadas, quando ainda não há marca (dados de antes do manifesto).
+    """
+    with _TRAVA, trava_arquivo(caminho):
+        manifesto = carregar_manifesto(caminho)
+        marcas = manifesto.setdefault(etapa, {})
+        anterior = marcas.get(ticker, {}) if acrescimo else {}
+        marca = dict(anterior)
+
+        if not df.empty:
+            if etapa == 'bruto':
+                ultimo = df.index.max()
+            elif 'timestamp' in df.columns:
+                ultimo = df['timestamp'].max()
+            else:
+                ultimo = pd.Timestamp(df['data'].max())
+            marca['ultima_data'] = ultimo.strftime('%Y-%m-%d')
+            marca['ultimo_timestamp'] = ultimo.isoformat()
+            marca['linhas'] = anterior.get('linhas', linhas_anteriores if acrescimo else 0) + len(df)
+            marca['hash'] = hash_dataframe(df, anterior.get('hash'))
+
+        if hash_entrada is not None:
+            marca['hash_entrada'] = hash_entrada
+        marca['atualizado_em'] = datetime.now().isoformat(timespec='seconds')
+
+        marcas[ticker] = marca
+        _salvar_manifesto(manifesto, caminho)
+        return marca
+
+
+def entrada_inalterada(marca_entrada, marca_saida):
+    """True se a saída já foi produzida a partir do conteúdo atual da entrada."""
+    return (
+        marca_entrada is not None and marca_saida is not None
+        and 'hash' in marca_entrada
+        and marca_saida.get('hash_entrada') == marca_entrada['hash']
+    )
@@ -0,0 +1,161 @@
+
+#@title Limpeza e transformação de vários tickers em paralelo (um processo por ticker, dados via Arrow IPC)
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+from scripts.pipeline.armazenamento import contar_linhas, eh_csv, ler_etapa
+from scripts.pipeline.limpeza_dados import limpeza_dados
+from scripts.pipeline.manifesto_pipeline import marca_vigente
+from scripts.pipeline.transformacao_dados import transformar_dados
+
+"""
+Distribui a limpeza + transformação de um universo de tickers em um `ProcessPoolExecutor`, um ticker
+por tarefa:
+
+- com os dados brutos no dataset Parquet, cada processo lê só as partições do seu ticker e grava as
+  suas partições limpas/transformadas (o dataset é particionado por ticker, então as gravações não
+  disputam arquivos; os manifestos e o estado dos indicadores são atualizados sob trava);
+- dados brutos já em memória (ex.: saída da extração) não são serializados com pickle: o processo
+  principal grava cada ticker como arquivo Arrow IPC sem compressão em `dir_compartilhado`
+  (`/dev/shm`, memória compartilhada, quando existe) e o processo de trabalho o abre mapeado em
+  memória, sem cópia até a conversão para pandas;
+- com `retornar=True`, os candles transformados voltam pelo mesmo caminho (IPC mapeado) em vez de
+  um DataFrame serializado na resposta da tarefa;
+- os tickers com mais linhas são enviados primeiro (os maiores não ficam para o fim da fila) e cada
+  processo usa uma thread do Arrow, para não disputar CPU com os demais processos.
+
+Execução (a partir da raiz do repositório):
+    python -m scripts.pipeline.processamento_paralelo
+"""
+
+DIR_COMPARTILHADO = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def gravar_ipc(df, diretorio, nome):
+    """Grava o DataFrame (com o índice) como arquivo Arrow IPC sem compressão; retorna o caminho."""
+    caminho = os.path.join(diretorio, f"{nome}-{uuid.uuid4().hex[:8]}.arrow")
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(caminho, 'wb') as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return caminho
+
+
+def ler_ipc(caminho, remover=True):
+    """Abre o arquivo IPC mapeado em memória e converte para pandas (removendo o arquivo em seguida)."""
+    with pa.memory_map(caminho, 'r') as origem:
+        df = pa.ipc.open_file(origem).read_all().to_pandas()
+    if remover:
+        os.remove(caminho)
+    return df
+
+
+def _iniciar_processo():
+    # Um processo por ticker: o paralelismo vem dos processos, não das threads do Arrow
+    pa.set_cpu_count(1)
+    pa.set_io_thread_count(1)
+
+
+def _processar_ticker(ticker, caminho_bruto, caminho_limpo, caminho_transformado, arquivo_bruto=None,
+                      retornar=False, dir_compartilhado=DIR_COMPARTILHADO, silencioso=True):
+    """Limpeza + transformação de um ticker no processo de trabalho; retorna um resumo (e o IPC, se pedido)."""
+    inicio = time.perf_counter()
+    saida = contextlib.redirect_stdout(io.StringIO()) if silencioso else contextlib.nullcontext()
+    with saida:
+        if arquivo_bruto is not None:
+            df_bruto, hash_entrada = ler_ipc(arquivo_bruto), None
+        else:
+            df_bruto = ler_etapa(caminho_bruto, 'bruto', ticker)
+            marca_bruto = marca_vigente(caminho_bruto, 'bruto', ticker)
+            hash_entrada = (marca_bruto or {}).get('hash')
+        df_limpo = limpeza_dados(df_bruto, caminho_limpo, ticker, hash_entrada=hash_entrada,
+                                 verbosidade=0 if silencioso else 1)
+        df_transformado = transformar_dados(caminho_limpo, caminho_transformado, ticker)
+
+    resumo = {
+        'ticker': ticker, 'linhas_brutas': len(df_bruto), 'linhas_limpas': len(df_limpo),
+        'linhas_transformadas': len(df_transformado), 'tempo_s': time.perf_counter() - inicio, 'pid': os.getpid(),
+    }
+    if retornar and not df_transformado.empty:
+        resumo['arquivo_transformado'] = gravar_ipc(df_transformado, dir_compartilhado, f"transformado-{ticker}")
+    return resumo
+
+
+def processar_tickers_paralelo(tickers, caminho_bruto, caminho_limpo, caminho_transformado, dados_brutos=None,
+                               max_processos=None, retornar=False, dir_compartilhado=DIR_COMPARTILHADO):
+    """
+    Limpa e transforma os tickers em paralelo, gravando no dataset particionado de cada etapa.
+
+    Parâmetros:
+    tickers (list): Tickers a processar.
+    dados_brutos (dict): {ticker: DataFrame bruto} já em memória; sem ele, cada processo lê o
+        ticker de `caminho_bruto`.
+    max_processos (int): Processos de trabalho (None = número de CPUs).
+    retornar (bool): Devolve também os candles transformados de cada ticker.
+
+    Retorna:
+    (pd.DataFrame, dict, dict): resumo por ticker (linhas, tempo, processo), erros por ticker e,
+    com `retornar=True`, {ticker: DataFrame transformado}.
+    """
+    if len(tickers) > 1 and any(eh_csv(caminho) for caminho in (caminho_bruto, caminho_limpo, caminho_transformado)):
+        raise ValueError("O CSV guarda um único ticker por etapa; use diretórios Parquet para vários tickers.")
+
+    # Maiores primeiro: o tempo total não fica preso a um ticker grande enviado por último
+    if dados_brutos is not None:
+        tamanhos = {ticker: len(dados_brutos[ticker]) for ticker in tickers}
+    else:
+        tamanhos = {ticker: contar_linhas(caminho_bruto, ticker) for ticker in tickers}
+    ordem = sorted(tickers, key=tamanhos.get, reverse=True)
+
+    resumos, erros, transformados = [], {}, {}
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_processos, initializer=_iniciar_processo) as executor:
+        futuros = {}
+        for ticker in ordem:
+            arquivo_bruto = None
+            if dados_brutos is not None:
+                arquivo_bruto = gravar_ipc(dados_brutos[ticker], dir_compartilhado, f"bruto-{ticker}")
+            futuros[ticker] = (executor.submit(
+                _processar_ticker, ticker, caminho_bruto, caminho_limpo, caminho_transformado,
+                arquivo_bruto, retornar, dir_compartilhado
+            ), arquivo_bruto)
+
+        for ticker, (futuro, arquivo_bruto) in futuros.items():
+            try:
+                resumo = futuro.result()
+            except Exception as e:
+                print(f"[{ticker}] Limpeza/transformação falhou: {e}")
+                erros[ticker] = str(e)
+                continue
+            finally:
+                # O processo remove o IPC que leu; sobra apenas o de tarefas que falharam antes da leitura
+                if arquivo_bruto is not None and os.path.exists(arquivo_bruto):
+                    os.remove(arquivo_bruto)
+            arquivo = resumo.pop('arquivo_transformado', None)
+            if arquivo is not None:
+                transformados[ticker] = ler_ipc(arquivo)
+            resumos.append(resumo)
+
+    tabela = pd.DataFrame(resumos, columns=['ticker', 'linhas_brutas', 'linhas_limpas', 'linhas_transformadas',
+                                            'tempo_s', 'pid'])
+    print(f"\nLimpeza/transformação de {len(tickers)} tickers em {time.perf_counter() - inicio:.2f} s: "
+          f"{len(resumos)} ok, {len(erros)} com erro.")
+    return tabela, erros, transformados
+
+
+if __name__ == "__main__":
+    tickers = ["BBDC4.SA", "ITUB4.SA", "PETR4.SA", "VALE3.SA"]
+    caminho_bruto = "/content/Piloto_Day_Trade/data/raw/dados_brutos"
+    caminho_limpo = "/content/Piloto_Day_Trade/data/cleaned/dados_limpos"
+    caminho_transformado = "/content/Piloto_Day_Trade/data/transformed/dados_transformados"
+
+    resumo, erros, _ = processar_tickers_paralelo(tickers, caminho_bruto, caminho_limpo, caminho_transformado)
+    print(resumo.to_string(index=False))
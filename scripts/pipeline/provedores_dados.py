@@ -0,0 +1,89 @@
+
+#@title Provedores de candles brutos e cache local das respostas
+
+import hashlib
+import os
+
+import pandas as pd
+
+from scripts.pipeline.armazenamento import ler_etapa, normalizar_bruto
+
+COLUNAS_BRUTAS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+"""
+Camada de busca usada por `extracao_dados`. Um provedor é qualquer objeto com o método
+`baixar(ticker, inicio, fim, intervalo) -> pd.DataFrame` que devolve candles no formato da etapa
+`bruto` (índice `Datetime` com fuso de São Paulo e colunas `Close`, `High`, `Low`, `Open`, `Volume`).
+
+- `ProvedorYahoo`: Yahoo Finance (o padrão do pipeline);
+- `ProvedorLocal`: candles já gravados em disco (CSV bruto ou dataset Parquet), sem rede; serve para
+  reprocessar extrações antigas e para rodar o pipeline/benchmarks offline;
+- `CacheRespostas`: guarda cada resposta em disco, com chave (ticker, intervalo, início, fim),
+  para que reexecuções com o mesmo intervalo não voltem a chamar o provedor.
+"""
+
+
+class ProvedorYahoo:
+    """
+    Candles do Yahoo Finance. Usa `yf.Ticker(...).history`, que pode ser chamado de várias threads;
+    `yf.download` guarda os resultados em um dicionário global do yfinance e mistura respostas
+    quando chamado em paralelo.
+    """
+
+    def baixar(self, ticker, inicio, fim, intervalo):
+        import yfinance as yf
+
+        df = yf.Ticker(ticker).history(
+            start=pd.Timestamp(inicio).strftime("%Y-%m-%d"),
+            end=pd.Timestamp(fim).strftime("%Y-%m-%d"),
+            interval=intervalo,
+            auto_adjust=True
+        )
+        if df.empty:
+            return df
+        return normalizar_bruto(df[COLUNAS_BRUTAS])
+
+
+class ProvedorLocal:
+    """Candles lidos de dados brutos já gravados (CSV de um ticker ou dataset Parquet)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def baixar(self, ticker, inicio, fim, intervalo):
+        df = ler_etapa(self.caminho, 'bruto', ticker, desde=inicio)
+        if df.empty:
+            return df
+        # Mesmo recorte do yf.download: [início, fim)
+        dias = df.index.tz_localize(None).normalize()
+        return df[(dias >= pd.Timestamp(inicio)) & (dias < pd.Timestamp(fim))]
+
+
+class CacheRespostas:
+    """Respostas dos provedores gravadas em Parquet, uma por (ticker, intervalo, início, fim)."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    def _arquivo(self, ticker, inicio, fim, intervalo):
+        chave = "|".join([
+            ticker, intervalo,
+            pd.Timestamp(inicio).strftime("%Y-%m-%d"), pd.Timestamp(fim).strftime("%Y-%m-%d")
+        ])
+        resumo = hashlib.sha1(chave.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.diretorio, f"{ticker}_{intervalo}_{resumo}.parquet")
+
+    def obter(self, ticker, inicio, fim, intervalo):
+        """DataFrame em cache ou None."""
+        arquivo = self._arquivo(ticker, inicio, fim, intervalo)
+        return pd.read_parquet(arquivo) if os.path.exists(arquivo) else None
+
+    def guardar(self, df, ticker, inicio, fim, intervalo):
+        # Respostas vazias não são guardadas: podem ser uma falha momentânea do provedor
+        if df.empty:
+            return
+        os.makedirs(self.diretorio, exist_ok=True)
+        arquivo = self._arquivo(ticker, inicio, fim, intervalo)
+        temporario = f"{arquivo}.tmp"
+        df.to_parquet(temporario)
+        os.replace(temporario, arquivo)
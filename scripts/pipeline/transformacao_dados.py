@@ -5,14 +5,23 @@ Relatório do Processo de Transformação de Dados
 O processo de transformação de dados segue as seguintes etapas:
 
 Entrada de Dados
-- Fonte: `/data/cleaned/dados_limpos.csv`
-- Formato: CSV com colunas padrão (`data`, `hora`, `abertura`, `minimo`, `maximo`, `fechamento`, `volume`).
+- Fonte: `/data/cleaned/dados_limpos.csv` (ou o dataset Parquet da etapa `limpo`)
+- Formato: colunas padrão (`data`, `hora`, `abertura`, `minimo`, `maximo`, `fechamento`, `volume`),
+  lidas pela camada de armazenamento (`scripts/pipeline/armazenamento.py`).
 
 Identificação de Novos Dados
 - Os dados transformados previamente são carregados de `/data/transformed/dados_transformados.csv`.
-- A última data registrada nos dados transformados é usada como referência.
+- A última data registrada nos dados transformados é usada como referência. Ela vem da marca d'água
+  do manifesto (`dados_transformados_manifesto.json`), sem ler o histórico; se o hash dos dados limpos
+  não mudou desde a última execução, a transformação é pulada.
 - Somente os registros com `data` posterior são considerados novos e seguem para transformação, com excessão da excecução do primeiro bloco.
 
+Estado Incremental dos Indicadores
+- Cada execução salva, por ticker, a cauda dos últimos candles, os acumuladores das médias
+  exponenciais e o OBV acumulado (`dados_transformados_estado_indicadores.json`).
+- Os candles novos são calculados continuando esse estado (`calcular_indicadores_incremental`),
+  com custo proporcional aos dados novos e valores iguais aos de um recálculo completo.
+
 Cálculo de Indicadores Técnicos
 - Volatilidade (Desvio Padrão 20 períodos)
 - Médias móveis:  
@@ -34,12 +43,15 @@ Cálculo de Indicadores Técnicos
 Geração de Features Temporais
 - Dia da semana da entrada e da previsão
 - Hora do dia e minuto convertidos para numérico
+- Derivados do `timestamp` com fuso vindo da limpeza (ou montado de `data` + `hora` em dados antigos),
+  com acessores `.dt` vetorizados e tipos inteiros compactos (int8)
 
 Geração de Features Diárias
 - Fechamento do dia
 - Volume diário
 - Máximo e mínimo do dia
-- Mesmas variáveis do **dia anterior
+- Mesmas variáveis do **dia anterior (pregão anterior presente nos dados, por ticker)
+- Calculadas com um único groupby por dia, juntado de volta às linhas pela chave do dia
 
 União dos Dados
 - Os novos registros transformados são concatenados com os dados antigos (se existirem).
@@ -47,7 +59,7 @@ União dos Dados
 
 Exportação
 - O resultado final é salvo no caminho especificado:  
-  `/data/transformed/dados_transformados.csv`
+  `/data/transformed/dados_transformados.csv` (ou apenas as partições novas, no dataset Parquet)
 - Log de quantas linhas foram perdidas com `dropna` e quantos registros finais foram salvos.
 
 Esperado:
@@ -60,19 +72,32 @@ import os
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
+from pandas.tseries.offsets import BDay
+
+from scripts.pipeline.armazenamento import (
+    FUSO_HORARIO, TICKER_PADRAO, acrescentar_etapa, contar_linhas, converter_timestamp, eh_csv,
+    ler_etapa, salvar_etapa
+)
+from scripts.pipeline.indicadores_incrementais import (
+    atualizar_estado, caminho_estado_padrao, carregar_estados, cauda_do_estado,
+    montar_estado, novos_estados_ewm
+)
+from scripts.pipeline.manifesto_pipeline import (
+    caminho_manifesto_padrao, entrada_inalterada, marca_vigente, registrar_marca
+)
 
 # Carrega variáveis de ambiente a partir de um arquivo .env
 load_dotenv()
 
-# Função para carregar os dados limpos
-def carregar_dados(arquivo):
+# Função para carregar os dados de uma etapa (CSV ou dataset Parquet)
+def carregar_dados(arquivo, etapa='limpo', ticker=TICKER_PADRAO, desde=None):
     if isinstance(arquivo, pd.DataFrame):
         return arquivo
     if not os.path.exists(arquivo):
         print(f"O arquivo {arquivo} não existe.")
         return pd.DataFrame()
     try:
-        return pd.read_csv(arquivo, parse_dates=["data"])
+        return ler_etapa(arquivo, etapa, ticker, desde=desde)
     except Exception as e:
         print(f"Erro ao carregar {arquivo}: {e}")
         return pd.DataFrame()
@@ -90,7 +115,8 @@ def calcular_indicadores(df):
     if df.empty or not all(c in df.columns for c in ['data', 'hora', 'abertura', 'minimo', 'maximo', 'fechamento', 'volume']):
         return df
 
-    df = df.sort_values(by=['data', 'hora'])
+    # Índice sequencial após a ordenação: ADX e ATR são montados com pd.Series sem índice
+    df = df.sort_values(by=['data', 'hora']).reset_index(drop=True)
 
     # Retorno intradiário
     df['retorno'] = df['fechamento'].pct_change()
@@ -155,8 +181,22 @@ def calcular_indicadores(df):
 
     return df
 
-# Adiciona colunas temporais com base na data e hora dos registros
-from pandas.tseries.offsets import BDay
+# Adiciona colunas temporais com base no timestamp dos registros
+def relogio_local(df):
+    """`data` + `hora` sem fuso (NaT onde alguma das duas é inválida)."""
+    data = pd.to_datetime(df['data'], errors='coerce').dt.normalize()
+    horario = pd.to_timedelta(df['hora'].astype(str), errors='coerce')
+    # `to_timedelta` aceita '25:00:00' (um dia e uma hora); não é um horário do dia
+    return data + horario.where(horario < pd.Timedelta(days=1))
+
+def obter_timestamp(df):
+    """
+    Timestamp com fuso de cada candle: a coluna `timestamp` da limpeza ou, em dados antigos, `data` +
+    `hora` localizados (NaT nos horários inexistentes ou ambíguos da virada do horário de verão).
+    """
+    if 'timestamp' in df.columns:
+        return converter_timestamp(df['timestamp'])
+    return relogio_local(df).dt.tz_localize(FUSO_HORARIO, ambiguous='NaT', nonexistent='NaT')
 
 def adicionar_features_temporais(df):
     if df.empty:
@@ -164,44 +204,98 @@ def adicionar_features_temporais(df):
 
     df['data'] = pd.to_datetime(df['data'], errors='coerce')       
 
+    if 'timestamp' not in df.columns and 'hora' not in df.columns:
+        df['dia_da_semana_entrada'] = df['data'].dt.dayofweek
+        df['data_previsao'] = df['data'] + BDay(1)
+        df['dia_da_semana_previsao'] = df['data_previsao'].dt.dayofweek
+        df['hora_num'] = np.nan
+        df['minuto'] = np.nan
+        return df
+
+    # Todos os campos de calendário saem do relógio local com acessores .dt (sem .apply por linha).
+    # Em dados antigos o relógio é `data` + `hora`, válido mesmo quando o instante não existe ou é
+    # ambíguo no fuso (timestamp NaT na virada do horário de verão)
+    legado = 'timestamp' not in df.columns
+    timestamp = obter_timestamp(df)
+    relogio = relogio_local(df) if legado else timestamp.dt.tz_localize(None)
+
+    invalidos = relogio.isna()
+    if invalidos.any():
+        print(f"[Aviso] {invalidos.sum()} candle(s) com data/hora inválidas descartados na transformação.")
+        df, timestamp, relogio = df[~invalidos].copy(), timestamp[~invalidos], relogio[~invalidos]
+    sem_instante = timestamp.isna().sum()
+    if sem_instante:
+        print(f"[Aviso] {sem_instante} candle(s) em horário inexistente/ambíguo no fuso {FUSO_HORARIO}: timestamp NaT.")
+    df['timestamp'] = timestamp
+
     # Cria o dia da semana da entrada (0 = segunda-feira, 6 = domingo)
-    df['dia_da_semana_entrada'] = df['data'].dt.dayofweek
+    df['dia_da_semana_entrada'] = relogio.dt.dayofweek.astype('int8')
 
     # Novo: cria o dia da semana da previsão (dia útil seguinte)
     df['data_previsao'] = df['data'] + BDay(1)
-    df['dia_da_semana_previsao'] = df['data_previsao'].dt.dayofweek
+    df['dia_da_semana_previsao'] = df['data_previsao'].dt.dayofweek.astype('int8')
 
-    if 'hora' in df.columns:
-        df['hora'] = pd.to_datetime(df['hora'].astype(str), format='%H:%M:%S', errors='coerce').dt.time
-        df['hora_num'] = df['hora'].apply(lambda x: x.hour if pd.notnull(x) else np.nan)
-        df['minuto'] = df['hora'].apply(lambda x: x.minute if pd.notnull(x) else np.nan)
-    else:
-        df['hora_num'] = np.nan
-        df['minuto'] = np.nan
+    df['hora_num'] = relogio.dt.hour.astype('int8')
+    df['minuto'] = relogio.dt.minute.astype('int8')
 
     return df
 
+# Colunas dos agregados diários
+COLUNAS_DIARIAS = ['fechamento_dia', 'volume_dia', 'maximo_dia', 'minimo_dia']
+
+# Agrega os candles por dia (e por ticker, se houver) em uma única passada
+def agregar_dias(df):
+    chaves = ['ticker', 'data'] if 'ticker' in df.columns else ['data']
+    ordenado = df.sort_values(chaves + ['hora'], kind='stable')
+    return ordenado.groupby(chaves, sort=True).agg(
+        fechamento_dia=('fechamento', 'last'),  # fechamento do último horário do dia
+        volume_dia=('volume', 'sum'),
+        maximo_dia=('maximo', 'max'),
+        minimo_dia=('minimo', 'min'),
+    )
+
+# Agregados do último dia já transformado, usados como "dia anterior" do primeiro dia novo
+def agregados_ultimo_dia(df_transformado):
+    if df_transformado.empty or not set(COLUNAS_DIARIAS).issubset(df_transformado.columns):
+        return None
+    if 'ticker' in df_transformado.columns:
+        chaves = ['ticker', 'data']
+        ultimo = df_transformado.sort_values(chaves + ['hora']).groupby('ticker').tail(1)
+    else:
+        chaves = ['data']
+        ultimo = df_transformado.sort_values(chaves + ['hora']).tail(1)
+    return ultimo.set_index(chaves)[COLUNAS_DIARIAS]
+
 # Adiciona agregações diárias como fechamento, volume, máximos e mínimos
-def adicionar_features_diarias(df):
+def adicionar_features_diarias(df, dias_anteriores=None):
+    """
+    Adiciona os agregados do dia (fechamento do último candle, volume total, máximo e mínimo) e os
+    mesmos valores do pregão anterior. Os agregados são calculados com um único groupby por dia e
+    juntados de volta pela chave do dia; o "dia anterior" é o pregão anterior presente nos dados
+    (ou em `dias_anteriores`, agregados de dias já processados em execuções anteriores).
+    """
     if df.empty:
         return df
 
+    df = df.drop(columns=COLUNAS_DIARIAS + [f'{c}_anterior' for c in COLUNAS_DIARIAS], errors='ignore')
     df['volume'] = df['volume'].astype(int)
 
-    # Fechamento do último horário de cada dia
-    fechamento_dia_map = df.groupby('data').apply(lambda x: x.loc[x['hora'].idxmax(), 'fechamento'])
-    df['fechamento_dia'] = df['data'].map(fechamento_dia_map)
+    diarios = agregar_dias(df)
+    chaves = list(diarios.index.names)
+    if dias_anteriores is not None:
+        anteriores = dias_anteriores[~dias_anteriores.index.isin(diarios.index)]
+        diarios = pd.concat([anteriores, diarios]).sort_index()
 
-    # Demais agregações
-    df['volume_dia'] = df.groupby('data')['volume'].transform('sum').fillna(0).astype(int)
-    df['maximo_dia'] = df.groupby('data')['maximo'].transform('max')
-    df['minimo_dia'] = df.groupby('data')['minimo'].transform('min')
+    # Lags por pregão (não por linha): desloca a tabela diária, separadamente por ticker
+    if len(chaves) > 1:
+        lags = diarios.groupby(level=chaves[:-1]).shift(1)
+    else:
+        lags = diarios.shift(1)
+    diarios = diarios.join(lags.add_suffix('_anterior'))
 
-    # Lags dos dados diários
-    df['fechamento_dia_anterior'] = df['fechamento_dia'].shift(1)
-    df['volume_dia_anterior'] = df['volume_dia'].shift(1).fillna(0).astype(int)
-    df['maximo_dia_anterior'] = df['maximo_dia'].shift(1)
-    df['minimo_dia_anterior'] = df['minimo_dia'].shift(1)
+    df = df.join(diarios, on=chaves)
+    df['volume_dia'] = df['volume_dia'].fillna(0).astype(int)
+    df['volume_dia_anterior'] = df['volume_dia_anterior'].fillna(0).astype(int)
 
     return df
 
@@ -215,33 +309,132 @@ def calcular_volatilidade(df, janela=20):
     df['volatilidade'] = df['retorno_log'].rolling(window=janela, min_periods=1).std()    
     return df
 
+# Calcula os indicadores dos candles novos continuando o estado salvo da execução anterior
+def calcular_indicadores_incremental(df_novos, estado=None):
+    """
+    Calcula indicadores e volatilidade apenas para `df_novos`, retomando do `estado` anterior
+    (cauda de candles + acumuladores EWM + OBV). O resultado é igual ao de recalcular todo o
+    histórico com `calcular_indicadores` e `calcular_volatilidade`.
+
+    Retorna:
+    (pd.DataFrame, dict): candles novos com os indicadores e o estado atualizado.
+    """
+    cauda = cauda_do_estado(estado)
+    n_cauda = len(cauda)
+
+    # As janelas móveis (SMA, Bollinger, ADX, CCI, ATR, lags...) enxergam a cauda do histórico
+    # Os preços são gravados em float32 no Parquet; os indicadores são sempre calculados em float64,
+    # como na cauda do estado, para que a execução incremental e a completa coincidam
+    novos = df_novos.sort_values(['data', 'hora'])
+    novos = novos.astype({col: 'float64' for col in ['abertura', 'minimo', 'maximo', 'fechamento'] if col in novos.columns})
+    base = pd.concat([cauda, novos], ignore_index=True) if n_cauda else novos
+    base = calcular_indicadores(base)
+    base = calcular_volatilidade(base)
+
+    # As médias exponenciais e o OBV continuam dos acumuladores salvos
+    estados_ewm = novos_estados_ewm(estado)
+    novos = base.iloc[n_cauda:].copy()
+
+    fechamento = novos['fechamento'].to_numpy(dtype=float)
+    novos['EMA_10'] = estados_ewm['EMA_10'].aplicar(fechamento)
+    novos['MACD'] = estados_ewm['ema_12'].aplicar(fechamento) - estados_ewm['ema_26'].aplicar(fechamento)
+    novos['Signal_Line'] = estados_ewm['Signal_Line'].aplicar(novos['MACD'])
+
+    retorno = novos['retorno'].to_numpy(dtype=float)
+    media_ganho = estados_ewm['ganho_rsi'].aplicar(np.clip(retorno, 0, None))
+    media_perda = estados_ewm['perda_rsi'].aplicar(-np.clip(retorno, None, 0)) + 1e-10
+    novos['rsi'] = 100 - (100 / (1 + media_ganho / media_perda))
+
+    termo_obv = (base['volume'] * np.sign(base['fechamento'].diff())).fillna(0).iloc[n_cauda:]
+    obv_anterior = (estado or {}).get('obv', 0.0)
+    novos['OBV'] = obv_anterior + termo_obv.cumsum().to_numpy()
+
+    obv_final = novos['OBV'].iloc[-1] if not novos.empty else obv_anterior
+    return novos.reset_index(drop=True), montar_estado(base, estados_ewm, obv_final)
+
 # Função principal de transformação de dados: carrega, calcula, junta e salva
-def transformar_dados(dados_limpos, dados_transformados):
-    df_transformado = carregar_dados(dados_transformados)
-    df_limpo = carregar_dados(dados_limpos)
-    ultima_data = obter_ultima_data(df_transformado)
-    novos_dados = filtrar_novos_dados(df_limpo, ultima_data)
+def transformar_dados(dados_limpos, dados_transformados, ticker=TICKER_PADRAO, caminho_estado=None):
+    """
+    Transforma os candles limpos ainda não processados e grava o resultado.
+
+    O manifesto de cada etapa (`manifesto_pipeline.py`) evita leituras completas: se o hash dos dados
+    limpos é o mesmo da última transformação, a etapa é pulada sem ler nada; senão a última data
+    transformada vem da marca d'água e, no Parquet, só a partição do último dia é lida (para os
+    agregados do pregão anterior). Com o estado dos indicadores salvo, os dados limpos também são
+    lidos só a partir desse dia.
+
+    Retorna:
+    pd.DataFrame: no CSV, o histórico transformado completo; no Parquet, o último dia já gravado
+    mais os candles novos (vazio se a etapa foi pulada).
+    """
+    manifesto = caminho_manifesto_padrao(dados_transformados)
+    # Marcas de dados apagados são descartadas: sem a saída, a transformação é refeita por completo
+    marca_limpo = marca_vigente(dados_limpos, 'limpo', ticker) if isinstance(dados_limpos, str) else None
+    marca = marca_vigente(dados_transformados, 'transformado', ticker)
+    hash_entrada = marca_limpo.get('hash') if marca_limpo else None
+
+    if entrada_inalterada(marca_limpo, marca):
+        print("Dados limpos inalterados desde a última transformação; etapa ignorada.")
+        return pd.DataFrame()
+
+    if marca is not None and 'ultima_data' in marca and not eh_csv(dados_transformados):
+        # Parquet com marca d'água: lê apenas o último dia transformado
+        ultima_data = pd.Timestamp(marca['ultima_data'])
+        df_transformado = ler_etapa(dados_transformados, 'transformado', ticker, desde=ultima_data)
+        ultima_data = ultima_data if not df_transformado.empty else None
+    else:
+        df_transformado = carregar_dados(dados_transformados, 'transformado', ticker)
+        ultima_data = obter_ultima_data(df_transformado)
+
+    caminho_estado = caminho_estado or caminho_estado_padrao(dados_transformados)
+    # Estado sem dados transformados correspondentes (saída apagada) é descartado
+    estado = carregar_estados(caminho_estado).get(ticker) if ultima_data is not None else None
+
+    # Com o estado, os indicadores continuam dele: no Parquet só os dias limpos a partir do último
+    # transformado são lidos (o histórico inteiro só é lido para reconstruir o estado)
+    df_limpo = carregar_dados(dados_limpos, 'limpo', ticker, desde=ultima_data if estado is not None else None)
+
+    if estado is None and ultima_data is not None:
+        # Sem estado salvo (dados transformados por uma versão anterior): o estado é reconstruído
+        # uma única vez percorrendo todo o histórico limpo
+        print("Estado dos indicadores não encontrado; reconstruindo a partir do histórico limpo.")
+        novos_dados = df_limpo
+    else:
+        novos_dados = filtrar_novos_dados(df_limpo, ultima_data)
 
     if not novos_dados.empty:
-        novos_dados = calcular_indicadores(novos_dados)
+        novos_dados, estado = calcular_indicadores_incremental(novos_dados, estado)
+        novos_dados = filtrar_novos_dados(novos_dados, ultima_data)
         novos_dados = adicionar_features_temporais(novos_dados)
-        novos_dados = adicionar_features_diarias(novos_dados)
-        novos_dados = calcular_volatilidade(novos_dados)
-
-        df_final = pd.concat([df_transformado, novos_dados], ignore_index=True) if not df_transformado.empty else novos_dados
+        novos_dados = adicionar_features_diarias(novos_dados, agregados_ultimo_dia(df_transformado))
 
-        # Remove linhas com dados essenciais faltando
-        linhas_antes = len(df_final)
-        df_final = df_final.dropna(subset=['fechamento', 'retorno', 'SMA_10', 'EMA_10', 'MACD', 'rsi'])
-        linhas_depois = len(df_final)
+        # Remove linhas com dados essenciais faltando (os dados antigos já passaram por este filtro)
+        linhas_antes = len(novos_dados)
+        novos_dados = novos_dados.dropna(subset=['fechamento', 'retorno', 'SMA_10', 'EMA_10', 'MACD', 'rsi'])
+        linhas_depois = len(novos_dados)
         print(f"Linhas perdidas no dropna: {linhas_antes - linhas_depois}")
 
-        # Garante que o diretório exista e salva o csv de dados transformados
-        os.makedirs(os.path.dirname(dados_transformados), exist_ok=True)
-        df_final.to_csv(dados_transformados, index=False)
+        df_final = pd.concat([df_transformado, novos_dados], ignore_index=True) if not df_transformado.empty else novos_dados
+
+        # Grava: no CSV o arquivo é regravado com o histórico, no Parquet só as partições dos dias novos
+        if eh_csv(dados_transformados):
+            salvar_etapa(df_final, dados_transformados, 'transformado', ticker)
+            registrar_marca(manifesto, 'transformado', ticker, df_final, hash_entrada=hash_entrada)
+        else:
+            linhas_anteriores = 0 if marca is not None else contar_linhas(dados_transformados, ticker)
+            acrescentar_etapa(novos_dados, dados_transformados, 'transformado', ticker)
+            registrar_marca(manifesto, 'transformado', ticker, novos_dados, acrescimo=True,
+                            hash_entrada=hash_entrada, linhas_anteriores=linhas_anteriores)
+
+        # O estado só é salvo depois que os dados correspondentes foram gravados
+        atualizar_estado(caminho_estado, ticker, estado)
         print(f"Dados transformados salvos em {dados_transformados} ({len(df_final)} registros)")
         return df_final
 
+    if marca is not None:
+        # Nada novo, mas a entrada atual já está coberta: a próxima execução pode pular a etapa
+        registrar_marca(manifesto, 'transformado', ticker, pd.DataFrame(), acrescimo=True, hash_entrada=hash_entrada)
+
     print("Nenhum novo dado para processar.")
     return df_transformado
 